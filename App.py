@@ -1,10 +1,17 @@
 import sys
-from app.ModuloProductos import ListaProductos
-from app.ModuloProveedores import ListaProveedores
-from app.ModuloClientes import ListaClientes
-from app.ModuloTransacciones import ListaTransacciones
-from app.ModuloMovimientos import ListaMovimientos
+from itertools import islice
 from app.ModuloRotaciones import ModuloRotaciones
+from app.ModuloAlertas import ServicioAlertas
+from app.ModuloTopVentas import TopVentas
+from app.ModuloStockBajo import IndiceStockBajo
+from app.ModuloBusqueda import BuscadorProductos
+from app.ModuloInstantaneas import guardar_instantanea
+from app.ModuloIntercambio import exportar, importar, formatos_disponibles, ProgresoConsola
+from app.ModuloRegistro import RegistroListas
+from app.ModuloEventos import bus, SumideroConsola
+from app.ModuloMetricas import metricas
+
+TAMANO_PAGINA = 20  # Elementos por página en los listados
 
 def menu_principal():
     print("\n--- SISTEMA DE GESTIÓN DE INVENTARIO ---")
@@ -14,6 +21,8 @@ def menu_principal():
     print("4. Transacciones")
     print("5. Movimientos")
     print("6. Rotaciones")
+    print("7. Estadísticas de rendimiento")
+    print("8. Exportar / importar datos")
     print("0. Salir")
 
 def input_int(prompt, allow_empty=False):
@@ -36,7 +45,34 @@ def input_float(prompt, allow_empty=False):
         except ValueError:
             print("Por favor, ingrese un número válido.")
 
-def menu_productos(lista):
+def mostrar_paginado(elementos, total=None, al_mostrar=None, tamano=TAMANO_PAGINA):
+    # Muestra un iterable (p. ej. un generador iterar_*) página por página: solo la página actual vive en memoria
+    # total: número de elementos si se conoce (p. ej. len(lista)); al_mostrar: función llamada con cada página
+    # Devuelve el número de elementos mostrados
+    elementos = iter(elementos)
+    pagina = list(islice(elementos, tamano + 1))  # Un elemento de más indica si hay otra página
+    mostrados = 0
+    while pagina:
+        siguiente = pagina[tamano:]  # Primer elemento de la página siguiente, si la hay
+        pagina = pagina[:tamano]
+        for elemento in pagina:
+            print(vars(elemento))
+        mostrados += len(pagina)
+        if al_mostrar:
+            al_mostrar(pagina)
+        if not siguiente:
+            break
+        de_total = f" de {total}" if total is not None else ""
+        if input(f"-- {mostrados}{de_total} mostrados. Enter para ver más, 'q' para terminar: ").strip().lower() == "q":
+            break
+        pagina = siguiente + list(islice(elementos, tamano))
+    if hasattr(elementos, "close"):
+        elementos.close()  # Termina el recorrido del generador aunque queden nodos por visitar
+    if mostrados == 0:
+        print("No hay resultados.")
+    return mostrados
+
+def menu_productos(lista, alertas, stock_bajo, buscador):
     while True:
         print("\n--- Gestión de Productos ---")
         print("1. Registrar producto")
@@ -44,6 +80,9 @@ def menu_productos(lista):
         print("3. Actualizar producto")
         print("4. Eliminar producto")
         print("5. Consultar productos por categoría")
+        print("6. Resumen de alertas del catálogo")
+        print("7. Productos con stock bajo")
+        print("8. Buscar por texto (nombre y descripción)")
         print("0. Volver")
         op = input("Seleccione una opción: ")
         if op == "1":
@@ -55,20 +94,23 @@ def menu_productos(lista):
             fecha_expiracion = input("Fecha expiración (YYYY-MM-DD, opcional): ") or None
             temporalidad = input("¿Es de temporada? (s/n): ").strip().lower() == "s"
             rebaja = input_float("Rebaja (0 si no aplica): ", allow_empty=True) or 0
-            lista.registrar_producto(nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja)
+            umbral_stock = input_int(f"Stock mínimo (vacío = {stock_bajo.umbral_por_defecto}): ", allow_empty=True)
+            lista.registrar_producto(nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja, umbral_stock=umbral_stock)
         elif op == "2":
-            criterio = input("Buscar por (1) ID o (2) Nombre: ")
+            criterio = input("Buscar por (1) ID, (2) Nombre o (3) Todos: ")
+            if criterio == "3":
+                mostrar_paginado(lista, total=len(lista))
+                continue
             if criterio == "1":
                 idp = input_int("ID producto: ")
-                res = lista.consultar_producto(id_producto=idp)
+                res = lista.iterar_productos(id_producto=idp)
             else:
                 nombre = input("Nombre producto: ")
-                res = lista.consultar_producto(nombre=nombre)
-            for p in res:
-                print(vars(p))
+                res = lista.iterar_productos(nombre=nombre)
+            mostrar_paginado(res, al_mostrar=lambda pagina: alertas.emitir_resumen([p.id_producto for p in pagina]))
         elif op == "3":
             idp = input_int("ID producto a actualizar: ")
-            campo = input("Campo a actualizar (nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja): ")
+            campo = input("Campo a actualizar (nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja, umbral_stock): ")
             valor = input("Nuevo valor: ")
             if campo in ["precio", "rebaja"]:
                 try:
@@ -76,7 +118,7 @@ def menu_productos(lista):
                 except ValueError:
                     print("Valor inválido para campo numérico.")
                     continue
-            elif campo == "stock":
+            elif campo in ["stock", "umbral_stock"]:
                 try:
                     valor = int(valor)
                 except ValueError:
@@ -112,6 +154,18 @@ def menu_productos(lista):
             else:
                 for p in productos_cat:
                     print(vars(p))
+        elif op == "6":
+            r = alertas.emitir_resumen()
+            if not (r["por_expirar"] or r["temporada"] or r["rebaja"]):
+                print("No hay productos por expirar, de temporada ni con rebaja.")
+        elif op == "7":
+            print(f"{len(stock_bajo)} producto(s) en o por debajo de su stock mínimo (el más comprometido primero):")
+            mostrar_paginado(stock_bajo.bajo_umbral(), total=len(stock_bajo))
+        elif op == "8":
+            texto = input("Texto a buscar: ")
+            categoria = input("Categoría (vacío = todas): ").strip() or None
+            resultados = buscador.buscar(texto, categoria, limite=None)  # Del más al menos relevante
+            mostrar_paginado(resultados, total=len(resultados))
         elif op == "0":
             break
 
@@ -130,6 +184,10 @@ def menu_proveedores(lista):
             direccion = input("Dirección: ")
             lista.registrar_proveedor(nombre, contacto, direccion)
         elif op == "2":
+            criterio = input("Buscar por (1) ID o (2) Todos: ")
+            if criterio == "2":
+                mostrar_paginado(lista, total=len(lista))
+                continue
             idp = input_int("ID proveedor: ")
             p = lista.consultar_proveedor(idp)
             print(vars(p) if p else "No encontrado.")
@@ -161,15 +219,15 @@ def menu_clientes(lista):
             credito = input_float("Crédito (0 si no aplica): ", allow_empty=True) or 0
             lista.registrar_cliente(nombre, contacto, direccion, tipo_cliente, credito)
         elif op == "2":
-            criterio = input("Buscar por (1) ID o (2) Nombre: ")
+            criterio = input("Buscar por (1) ID, (2) Nombre o (3) Todos: ")
             if criterio == "1":
                 idc = input_int("ID cliente: ")
-                res = lista.consultar_cliente(id_cliente=idc)
-            else:
+                mostrar_paginado(lista.iterar_clientes(id_cliente=idc))
+            elif criterio == "2":
                 nombre = input("Nombre cliente: ")
-                res = lista.consultar_cliente(nombre=nombre)
-            for c in res:
-                print(vars(c))
+                mostrar_paginado(lista.iterar_clientes(nombre=nombre))
+            else:
+                mostrar_paginado(lista, total=len(lista))
         elif op == "3":
             idc = input_int("ID cliente a actualizar: ")
             campo = input("Campo a actualizar (nombre, contacto, direccion, tipo_cliente, credito): ")
@@ -209,14 +267,12 @@ def menu_transacciones(lista):
             filtro = input("Filtrar por (1) Cliente, (2) Fecha, (3) Todos: ")
             if filtro == "1":
                 idc = input_int("ID cliente: ")
-                res = lista.consultar_transacciones(id_cliente=idc)
+                mostrar_paginado(lista.iterar_transacciones(id_cliente=idc))
             elif filtro == "2":
                 fecha = input("Fecha (YYYY-MM-DD): ")
-                res = lista.consultar_transacciones(fecha=fecha)
+                mostrar_paginado(lista.iterar_transacciones(fecha=fecha))
             else:
-                res = lista.consultar_transacciones()
-            for t in res:
-                print(vars(t))
+                mostrar_paginado(lista, total=len(lista))
         elif op == "3":
             idt = input_int("ID transacción a actualizar: ")
             campo = input("Campo a actualizar (estado, total, productos, tipo_pago, fecha): ")
@@ -236,12 +292,13 @@ def menu_transacciones(lista):
         elif op == "0":
             break
 
-def menu_movimientos(lista):
+def menu_movimientos(lista, top_ventas):
     while True:
         print("\n--- Gestión de Movimientos ---")
         print("1. Registrar movimiento")
         print("2. Consultar movimientos")
         print("3. Eliminar movimiento por ID transacción")
+        print("4. Más y menos vendidos (últimos N días)")
         print("0. Volver")
         op = input("Seleccione una opción: ")
         if op == "1":
@@ -253,17 +310,25 @@ def menu_movimientos(lista):
             filtro = input("Filtrar por (1) Fecha, (2) Tipo, (3) Todos: ")
             if filtro == "1":
                 fecha = input("Fecha (YYYY-MM-DD): ")
-                res = lista.consultar_movimientos(fecha_consulta=fecha)
+                mostrar_paginado(lista.iterar_movimientos(fecha, fecha))
             elif filtro == "2":
                 tipo = input("Tipo (compra/venta): ")
-                res = lista.consultar_movimientos(tipo_consulta=tipo)
+                mostrar_paginado(lista.iterar_movimientos(tipo=tipo))
             else:
-                res = lista.consultar_movimientos()
-            for m in res:
-                print(vars(m))
+                mostrar_paginado(lista, total=len(lista))
         elif op == "3":
             idt = input_int("ID transacción: ")
             lista.eliminar_movimiento_por_id_transaccion(idt)
+        elif op == "4":
+            dias = input_int(f"Días (1-{top_ventas.ventana_dias}, vacío = {top_ventas.ventana_dias}): ", allow_empty=True)
+            k = input_int("Cantidad de productos (vacío = 10): ", allow_empty=True) or 10
+            print(f"Ventana hasta: {top_ventas.hoy or 'sin ventas'}")
+            print("Más vendidos:")
+            for id_producto, unidades in top_ventas.mas_vendidos(k, dias):
+                print(f"  Producto ID {id_producto}: {unidades} unidades")
+            print("Menos vendidos:")
+            for id_producto, unidades in top_ventas.menos_vendidos(k, dias):
+                print(f"  Producto ID {id_producto}: {unidades} unidades")
         elif op == "0":
             break
 
@@ -275,6 +340,9 @@ def menu_rotaciones(modulo_rotaciones):
         print("3. Listar productos de temporada")
         print("4. Listar productos rebajados")
         print("5. Aplicar rebajas por expiración")
+        print("6. Promociones vigentes en una fecha")
+        print("7. Promociones en un rango de fechas")
+        print("8. Historial de promociones de un producto")
         print("0. Volver")
         op = input("Seleccione una opción: ")
         if op == "1":
@@ -286,43 +354,126 @@ def menu_rotaciones(modulo_rotaciones):
             rebaja = modulo_rotaciones.verificar_rebaja(idp)
             print(f"Rebaja: {rebaja}")
         elif op == "3":
-            lista = modulo_rotaciones.obtener_productos_temporada()
-            for p in lista:
-                print(vars(p))
+            mostrar_paginado(modulo_rotaciones.obtener_productos_temporada())
         elif op == "4":
-            lista = modulo_rotaciones.obtener_productos_rebajados()
-            for p in lista:
-                print(vars(p))
+            mostrar_paginado(modulo_rotaciones.obtener_productos_rebajados())
         elif op == "5":
             n = modulo_rotaciones.aplicar_rebajas_expiracion()
             print(f"Rebajas aplicadas a {n} producto(s).")
+        elif op == "6":
+            fecha = input("Fecha (YYYY-MM-DD, vacío = hoy): ") or None
+            for periodo in modulo_rotaciones.periodos_activos(fecha):
+                print(periodo)
+        elif op == "7":
+            fecha_inicio = input("Fecha inicio (YYYY-MM-DD): ")
+            fecha_fin = input("Fecha fin (YYYY-MM-DD): ")
+            for periodo in modulo_rotaciones.periodos_en_rango(fecha_inicio, fecha_fin):
+                print(periodo)
+        elif op == "8":
+            idp = input_int("ID producto: ")
+            historial = modulo_rotaciones.historial_producto(idp)
+            for periodo in historial:
+                print(periodo)
+            if not historial:
+                print("El producto no tiene promociones registradas.")
+        elif op == "0":
+            break
+
+def menu_metricas():
+    while True:
+        print("\n--- Estadísticas de Rendimiento ---")
+        print("1. Ver estadísticas")
+        print("2. Exportar (JSON o CSV)")
+        print("3. Reiniciar estadísticas")
+        print(f"4. {'Desactivar' if metricas.activo else 'Activar'} métricas")
+        print("0. Volver")
+        op = input("Seleccione una opción: ")
+        if op == "1":
+            print(metricas.resumen_texto())
+        elif op == "2":
+            ruta = input("Archivo de salida (.json o .csv): ").strip() or "metricas.json"
+            try:
+                print(f"Métricas exportadas a {metricas.exportar(ruta)}")
+            except (OSError, ValueError) as e:
+                print(f"No se pudo exportar: {e}")
+        elif op == "3":
+            metricas.reiniciar()
+            print("Estadísticas reiniciadas.")
+        elif op == "4":
+            if metricas.activo:
+                metricas.desactivar()
+            else:
+                metricas.activar()
+            print(f"Métricas {'activadas' if metricas.activo else 'desactivadas'}.")
         elif op == "0":
             break
+        else:
+            print("Opción no válida.")
+
+def menu_intercambio(registro):
+    while True:
+        print("\n--- Exportar / Importar Datos ---")
+        print("1. Exportar todas las tablas")
+        print("2. Importar tablas")
+        print("0. Volver")
+        op = input("Seleccione una opción: ")
+        if op not in ("1", "2"):
+            if op == "0":
+                break
+            print("Opción no válida.")
+            continue
+        directorio = input("Directorio (vacío = exportacion): ").strip() or "exportacion"
+        formatos = formatos_disponibles()
+        formato = input(f"Formato ({', '.join(formatos)}; vacío = csv): ").strip().lower() or "csv"
+        if formato not in formatos:
+            print("Formato no disponible.")
+            continue
+        progreso = ProgresoConsola()
+        if op == "1":
+            exportar(directorio, formato, progreso=progreso)
+            progreso.terminar()  # Por si la exportación se interrumpió a mitad de una tabla
+        else:
+            reemplazar = input("¿Reemplazar los datos actuales? (s/n): ").strip().lower() == "s"
+            registro.esperar()  # Las listas en precarga deben terminar antes de recargarse
+            importados = importar(directorio, formato, reemplazar=reemplazar, progreso=progreso)
+            progreso.terminar()
+            if importados is not None:
+                registro.recargar()  # Las listas ya abiertas reflejan lo importado
+                if registro.construida("rotaciones"):
+                    registro["rotaciones"]._cargar_periodos()
 
 def main():
-    productos = ListaProductos()  # Lista doblemente enlazada de productos
-    proveedores = ListaProveedores()  # Lista doblemente enlazada de proveedores
-    clientes = ListaClientes()  # Lista doblemente enlazada de clientes
-    transacciones = ListaTransacciones()  # Lista doblemente enlazada de transacciones
-    movimientos = ListaMovimientos()  # Lista doblemente enlazada de movimientos
-    rotaciones = ModuloRotaciones(productos)  # Módulo de lógica de rotaciones, recibe la lista de productos
+    bus.suscribir(SumideroConsola())  # Mensajes de las operaciones (registros, avisos de stock, rebajas) a la consola
+    registro = RegistroListas()  # Cada lista se construye al abrir su menú; las demás se precargan en segundo plano
+    registro.definir("rotaciones", lambda r: ModuloRotaciones(r["productos"]))  # Lógica de rotaciones sobre los productos
+    registro.definir("alertas", lambda r: ServicioAlertas(r["productos"]))  # Estados de alerta por producto, calculados una vez por día
+    registro.definir("stock_bajo", lambda r: IndiceStockBajo(r["productos"]))  # Productos en o bajo su stock mínimo, avisados al cruzarlo
+    registro.definir("busqueda", lambda r: BuscadorProductos(r["productos"]))  # Búsqueda de texto (FTS5 o índice invertido)
+    registro.definir("top_ventas", lambda r: TopVentas().observar(r["transacciones"], r["movimientos"]))  # Más/menos vendidos por ventana de días
+    registro.calentar()
 
     while True:
         menu_principal()
         op = input("Seleccione una opción: ")  # Variable de opción principal del menú
         if op == "1":
-            menu_productos(productos)
+            menu_productos(registro["productos"], registro["alertas"], registro["stock_bajo"], registro["busqueda"])
         elif op == "2":
-            menu_proveedores(proveedores)
+            menu_proveedores(registro["proveedores"])
         elif op == "3":
-            menu_clientes(clientes)
+            menu_clientes(registro["clientes"])
         elif op == "4":
-            menu_transacciones(transacciones)
+            menu_transacciones(registro["transacciones"])
         elif op == "5":
-            menu_movimientos(movimientos)
+            menu_movimientos(registro["movimientos"], registro["top_ventas"])
         elif op == "6":
-            menu_rotaciones(rotaciones)
+            menu_rotaciones(registro["rotaciones"])
+        elif op == "7":
+            menu_metricas()
+        elif op == "8":
+            menu_intercambio(registro)
         elif op == "0":
+            registro.cerrar()
+            guardar_instantanea()  # El próximo arranque parte de este estado
             print("¡Hasta luego!")
             sys.exit()
         else:
@@ -0,0 +1,185 @@
+import json
+from datetime import date
+try:
+    import numpy as np  # Opcional: evaluación vectorizada de las reglas
+except ImportError:
+    np = None
+try:
+    from .ModuloMetricas import medir
+except ImportError:
+    from ModuloMetricas import medir
+from bd.BDSQLite import a_fecha
+
+# Motor columnar del ajuste semanal de precios y política de stock
+# 1. agregar_semana: una sola pasada por movimientos y transacciones de la semana acumula, por producto,
+#    total de ventas, total de compras y rotación (número de ventas) en columnas paralelas
+# 2. evaluar_reglas: aplica las reglas de margen, sobrestock/substock y rebaja a todas las columnas a la vez
+#    (con NumPy si está instalado; si no, con listas de Python)
+# 3. ajustar_precios_stock: genera los mensajes y persiste todos los cambios con un único lote
+
+SIN_EXPIRACION = 10 ** 6  # Días hasta expirar de un producto sin fecha de expiración
+
+def _ids_productos(productos):
+    # IDs de producto de una transacción: lista de dicts {"id": ...} o de enteros, o su texto JSON
+    if isinstance(productos, str):
+        try:
+            productos = json.loads(productos)
+        except json.JSONDecodeError:
+            return set()
+    if not isinstance(productos, list):
+        return set()
+    ids = set()
+    for x in productos:
+        if isinstance(x, dict):
+            ids.add(x.get("id"))
+        elif isinstance(x, int):
+            ids.add(x)
+    return ids
+
+def _dias_para_expirar(fecha_expiracion, hoy):
+    # fecha_expiracion ya es date (o None): la decodificación se hizo al cargar la fila
+    if fecha_expiracion is None:
+        return SIN_EXPIRACION
+    return (fecha_expiracion - hoy).days
+
+@medir("ajustes.agregar_semana")
+def agregar_semana(productos, transacciones, movimientos, semana_inicio, semana_fin, stock_objetivo, umbral_stock, hoy=None):
+    # Construye las columnas del ajuste con una pasada por movimientos y otra por transacciones
+    # stock_objetivo, umbral_stock: valores globales para productos sin política propia
+    # semana_inicio, semana_fin: date o texto ISO (inclusive)
+    # Devuelve un diccionario columna -> lista (una posición por producto, en el orden de la lista)
+    hoy = hoy or date.today()
+    semana_inicio, semana_fin = a_fecha(semana_inicio), a_fecha(semana_fin)
+    columnas = {
+        "productos": [], "precio": [], "stock": [], "stock_objetivo": [], "umbral_stock": [], "dias_expiracion": [],
+        "total_ventas": [], "total_compras": [], "rotacion": [],
+    }
+    posicion = {}  # id_producto -> índice en las columnas
+    nodo = productos.raiz
+    while nodo:
+        p = nodo.producto
+        posicion[p.id_producto] = len(columnas["productos"])
+        columnas["productos"].append(p)
+        columnas["precio"].append(p.precio)
+        columnas["stock"].append(p.stock)
+        columnas["stock_objetivo"].append(p.stock_objetivo if p.stock_objetivo is not None else stock_objetivo)
+        columnas["umbral_stock"].append(p.umbral_stock if p.umbral_stock is not None else umbral_stock)
+        columnas["dias_expiracion"].append(_dias_para_expirar(p.fecha_expiracion, hoy))
+        nodo = nodo.siguiente
+    n = len(columnas["productos"])
+    total_ventas = columnas["total_ventas"] = [0.0] * n
+    total_compras = columnas["total_compras"] = [0.0] * n
+    rotacion = columnas["rotacion"] = [0] * n
+
+    # Tipo de movimiento de cada transacción (el primero registrado, como consultar_movimiento_por_id_transaccion)
+    tipos = {}
+    nodo = movimientos.raiz
+    while nodo:
+        tipos.setdefault(nodo.movimiento.id_transaccion, nodo.movimiento.tipo)
+        nodo = nodo.siguiente
+
+    nodo = transacciones.raiz
+    while nodo:
+        t = nodo.transaccion
+        if semana_inicio <= t.fecha <= semana_fin:
+            tipo = tipos.get(t.id_transaccion)
+            if tipo == "venta" or tipo == "compra":
+                for id_producto in _ids_productos(t.productos):
+                    i = posicion.get(id_producto)
+                    if i is None:
+                        continue
+                    if tipo == "venta":
+                        total_ventas[i] += t.total
+                        rotacion[i] += 1
+                    else:
+                        total_compras[i] += t.total
+        nodo = nodo.siguiente
+    return columnas
+
+def _evaluar_numpy(c, margen_objetivo, rotacion_minima):
+    ventas = np.asarray(c["total_ventas"], dtype=float)
+    compras = np.asarray(c["total_compras"], dtype=float)
+    precio = np.asarray(c["precio"], dtype=float)
+    stock = np.asarray(c["stock"], dtype=float)
+    stock_obj = np.asarray(c["stock_objetivo"], dtype=float)
+    umbral = np.asarray(c["umbral_stock"], dtype=float)
+    rotacion = np.asarray(c["rotacion"], dtype=float)
+    dias = np.asarray(c["dias_expiracion"], dtype=float)
+
+    con_datos = (ventas > 0) & (compras > 0)
+    margen = np.where(con_datos, (ventas - compras) / np.where(ventas > 0, ventas, 1.0), 0.0)
+    sube = margen < margen_objetivo
+    baja = ~sube & (margen > margen_objetivo + 0.15)
+    precio_margen = np.where(sube, np.round(precio * 1.10, 2), np.where(baja, np.round(precio * 0.95, 2), precio))
+    sobrestock = (stock > stock_obj + 20) & (rotacion < rotacion_minima)
+    substock = ~sobrestock & (stock < umbral) & (rotacion >= rotacion_minima)
+    rebaja = (rotacion < rotacion_minima) | (dias <= 2)
+    return {
+        "margen": margen.tolist(), "sube": sube.tolist(), "baja": baja.tolist(), "precio_margen": precio_margen.tolist(),
+        "sobrestock": sobrestock.tolist(), "nuevo_stock_objetivo": np.maximum(10, stock_obj - 10).astype(int).tolist(),
+        "substock": substock.tolist(), "nuevo_umbral": np.maximum(5, umbral - 5).astype(int).tolist(),
+        "rebaja": rebaja.tolist(), "precio_rebaja": np.round(precio_margen * 0.8, 2).tolist(),
+    }
+
+def _evaluar_python(c, margen_objetivo, rotacion_minima):
+    margen = [(v - k) / v if v > 0 and k > 0 else 0.0 for v, k in zip(c["total_ventas"], c["total_compras"])]
+    sube = [m < margen_objetivo for m in margen]
+    baja = [not s and m > margen_objetivo + 0.15 for s, m in zip(sube, margen)]
+    precio_margen = [round(p * 1.10, 2) if s else round(p * 0.95, 2) if b else p for p, s, b in zip(c["precio"], sube, baja)]
+    sobrestock = [st > so + 20 and r < rotacion_minima for st, so, r in zip(c["stock"], c["stock_objetivo"], c["rotacion"])]
+    substock = [not sb and st < u and r >= rotacion_minima for sb, st, u, r in zip(sobrestock, c["stock"], c["umbral_stock"], c["rotacion"])]
+    return {
+        "margen": margen, "sube": sube, "baja": baja, "precio_margen": precio_margen,
+        "sobrestock": sobrestock, "nuevo_stock_objetivo": [max(10, so - 10) for so in c["stock_objetivo"]],
+        "substock": substock, "nuevo_umbral": [max(5, u - 5) for u in c["umbral_stock"]],
+        "rebaja": [r < rotacion_minima or d <= 2 for r, d in zip(c["rotacion"], c["dias_expiracion"])],
+        "precio_rebaja": [round(p * 0.8, 2) for p in precio_margen],
+    }
+
+def evaluar_reglas(columnas, margen_objetivo, rotacion_minima, usar_numpy=None):
+    # Evalúa las reglas del ajuste sobre todas las columnas a la vez
+    # usar_numpy: None = usar NumPy si está instalado; False = forzar la versión en Python puro
+    # Devuelve un diccionario de columnas de decisión (listas del mismo largo que las de entrada)
+    if usar_numpy is None:
+        usar_numpy = np is not None
+    if usar_numpy and columnas["productos"]:
+        return _evaluar_numpy(columnas, margen_objetivo, rotacion_minima)
+    return _evaluar_python(columnas, margen_objetivo, rotacion_minima)
+
+@medir("ajustes.ajustar_precios_stock")
+def ajustar_precios_stock(productos, transacciones, movimientos, semana_inicio, semana_fin, margen_objetivo, rotacion_minima, stock_objetivo, umbral_stock, hoy=None, usar_numpy=None):
+    # Ajusta precios y política de stock según margen y rotación semanal, con una única escritura en lote
+    # Reglas por producto:
+    # - margen < objetivo: precio +10%; margen > objetivo + 0.15: precio -5%
+    # - stock > stock_objetivo + 20 con baja rotación: stock_objetivo -10 (mínimo 10)
+    # - si no, stock < umbral_stock con buena rotación: umbral_stock -5 (mínimo 5)
+    # - baja rotación o expira en <= 2 días: rebaja del 20% sobre el precio resultante (se guarda en 'rebaja')
+    # Devuelve la lista de mensajes de los ajustes realizados
+    c = agregar_semana(productos, transacciones, movimientos, semana_inicio, semana_fin, stock_objetivo, umbral_stock, hoy)
+    r = evaluar_reglas(c, margen_objetivo, rotacion_minima, usar_numpy)
+    ajustes_realizados = []
+    cambios = {}  # id_producto -> campos a actualizar
+    for i, p in enumerate(c["productos"]):
+        datos = {}
+        etiqueta = f"[Ajuste] Producto {p.nombre} (ID {p.id_producto})"
+        if r["sube"][i]:
+            datos["precio"] = r["precio_margen"][i]
+            ajustes_realizados.append(f"{etiqueta}: Precio subido de {p.precio} a {datos['precio']} por margen bajo ({r['margen'][i]:.2f})")
+        elif r["baja"][i]:
+            datos["precio"] = r["precio_margen"][i]
+            ajustes_realizados.append(f"{etiqueta}: Precio bajado de {p.precio} a {datos['precio']} por margen alto ({r['margen'][i]:.2f})")
+        if r["sobrestock"][i]:
+            datos["stock_objetivo"] = r["nuevo_stock_objetivo"][i]
+            ajustes_realizados.append(f"{etiqueta}: Stock objetivo ajustado a {datos['stock_objetivo']} por sobrestock y baja rotación")
+        elif r["substock"][i]:
+            datos["umbral_stock"] = r["nuevo_umbral"][i]
+            ajustes_realizados.append(f"{etiqueta}: Umbral stock ajustado a {datos['umbral_stock']} por substock y alta rotación")
+        if r["rebaja"][i]:
+            # El precio de lista se conserva: la rebaja se aplica al cobrar (app.ModuloPrecios)
+            datos["rebaja"] = 0.2
+            ajustes_realizados.append(f"{etiqueta}: Rebaja aplicada, nuevo precio efectivo {r['precio_rebaja'][i]}")
+        if datos:
+            cambios[p.id_producto] = datos
+    if cambios and productos.actualizar_productos_lote(cambios) is False:
+        return []  # La BD rechazó el lote: no se aplicó ningún ajuste
+    return ajustes_realizados
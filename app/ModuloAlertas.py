@@ -0,0 +1,138 @@
+from datetime import date
+try:
+    from .ModuloEventos import bus, INFO, AVISO
+    from .ModuloMetricas import medir
+except ImportError:
+    from ModuloEventos import bus, INFO, AVISO
+    from ModuloMetricas import medir
+
+# Servicio de alertas de estado de productos (por expirar, de temporada, con rebaja)
+# El estado de cada producto (y el resumen de todo el catálogo) se calcula una vez por día y queda en caché
+# hasta que cambia su nombre, fecha de expiración, temporalidad o rebaja (el servicio se suscribe a los
+# cambios de ListaProductos).
+# Las consultas de productos no emiten avisos: el resumen de alertas se pide explícitamente y sale en un
+# único evento "alertas.resumen" en lugar de un aviso por producto.
+
+DIAS_AVISO_EXPIRACION = 5  # Días antes de expirar en que un producto genera aviso
+CAMPOS_ALERTA = frozenset(("nombre", "fecha_expiracion", "temporalidad", "rebaja"))  # Campos que invalidan el estado
+LINEAS_POR_GRUPO = 10  # Productos listados por grupo en el texto del resumen
+
+class EstadoAlerta:
+    # Estado de alertas de un producto en un día
+    __slots__ = ("id_producto", "nombre", "dias_para_expirar", "temporada", "rebaja")
+
+    def __init__(self, id_producto, nombre, dias_para_expirar, temporada, rebaja):
+        self.id_producto = id_producto
+        self.nombre = nombre
+        self.dias_para_expirar = dias_para_expirar  # Días restantes si expira dentro del aviso; si no, None
+        self.temporada = temporada  # True si es producto de temporada
+        self.rebaja = rebaja  # Rebaja activa (0.0 si no tiene)
+
+    @property
+    def hay_alerta(self):
+        return self.dias_para_expirar is not None or self.temporada or self.rebaja > 0
+
+def calcular_estado(producto, hoy=None, dias_aviso=DIAS_AVISO_EXPIRACION):
+    # Calcula el estado de alertas de un producto (sin efectos secundarios)
+    hoy = hoy or date.today()
+    dias = None
+    if producto.fecha_expiracion is not None:  # Ya es date: se decodificó al cargar la fila
+        restantes = (producto.fecha_expiracion - hoy).days
+        if 0 <= restantes <= dias_aviso:
+            dias = restantes
+    return EstadoAlerta(producto.id_producto, producto.nombre, dias, bool(producto.temporalidad), producto.rebaja or 0.0)
+
+def _texto_resumen(fecha, por_expirar, temporada, rebaja):
+    lineas = [f"🔔 Alertas del {fecha}: {len(por_expirar)} por expirar, {len(temporada)} de temporada, {len(rebaja)} con rebaja"]
+    grupos = (
+        (por_expirar, lambda a: f"  ⚠️ '{a['nombre']}' (ID {a['id']}) expira en {a['dias']} día(s)"),
+        (temporada, lambda a: f"  🌱 '{a['nombre']}' (ID {a['id']}) es de temporada"),
+        (rebaja, lambda a: f"  💸 '{a['nombre']}' (ID {a['id']}) tiene una rebaja del {a['rebaja'] * 100:.0f}%"),
+    )
+    for alertas, formato in grupos:
+        lineas += [formato(a) for a in alertas[:LINEAS_POR_GRUPO]]
+        if len(alertas) > LINEAS_POR_GRUPO:
+            lineas.append(f"  ... y {len(alertas) - LINEAS_POR_GRUPO} más")
+    return "\n".join(lineas)
+
+class ServicioAlertas:
+    def __init__(self, productos, dias_aviso=DIAS_AVISO_EXPIRACION):
+        # productos: ListaProductos observada; dias_aviso: ventana de aviso de expiración
+        self.productos = productos
+        self.dias_aviso = dias_aviso
+        self._dia = None  # Día al que corresponden los estados en caché
+        self._estados = {}  # id_producto -> EstadoAlerta del día
+        self._resumen_catalogo = None  # Resumen de todo el catálogo del día (None = por recalcular)
+        productos.suscribir_cambios(self._al_cambiar)
+
+    def _al_cambiar(self, id_producto, campos):
+        # Observador de ListaProductos: descarta solo los estados afectados por el cambio
+        if id_producto is None:
+            self._estados.clear()
+            self._resumen_catalogo = None
+        elif campos is None or not CAMPOS_ALERTA.isdisjoint(campos):
+            self._estados.pop(id_producto, None)
+            self._resumen_catalogo = None
+
+    def _vigentes(self, hoy):
+        # Al cambiar de día los días para expirar cambian: se recalcula todo
+        if hoy != self._dia:
+            self._dia = hoy
+            self._estados.clear()
+            self._resumen_catalogo = None
+        return self._estados
+
+    def estado(self, id_producto, hoy=None):
+        # EstadoAlerta del producto en el día (por defecto hoy) o None si no existe
+        hoy = hoy or date.today()
+        estados = self._vigentes(hoy)
+        estado = estados.get(id_producto)
+        if estado is None:
+            nodo = self.productos._indice.get(id_producto)
+            if not nodo:
+                return None
+            estado = estados[id_producto] = calcular_estado(nodo.producto, hoy, self.dias_aviso)
+        return estado
+
+    @medir("alertas.resumen")
+    def resumen(self, ids=None, hoy=None):
+        # Resumen de alertas de los productos indicados (por defecto, todo el catálogo)
+        # Devuelve {"fecha", "por_expirar": [{"id", "nombre", "dias"}], "temporada": [{"id", "nombre"}],
+        #           "rebaja": [{"id", "nombre", "rebaja"}]}; por_expirar va ordenado por días restantes
+        hoy = hoy or date.today()
+        catalogo = ids is None
+        if catalogo:
+            self._vigentes(hoy)
+            if self._resumen_catalogo is not None:
+                return self._resumen_catalogo
+            ids = list(self.productos._indice)
+        por_expirar, temporada, rebaja = [], [], []
+        for id_producto in ids:
+            e = self.estado(id_producto, hoy)
+            if e is None or not e.hay_alerta:
+                continue
+            if e.dias_para_expirar is not None:
+                por_expirar.append({"id": e.id_producto, "nombre": e.nombre, "dias": e.dias_para_expirar})
+            if e.temporada:
+                temporada.append({"id": e.id_producto, "nombre": e.nombre})
+            if e.rebaja > 0:
+                rebaja.append({"id": e.id_producto, "nombre": e.nombre, "rebaja": e.rebaja})
+        por_expirar.sort(key=lambda a: a["dias"])
+        r = {"fecha": hoy.isoformat(), "por_expirar": por_expirar, "temporada": temporada, "rebaja": rebaja}
+        if catalogo:
+            self._resumen_catalogo = r
+        return r
+
+    def emitir_resumen(self, ids=None, hoy=None):
+        # Emite el resumen como un único evento "alertas.resumen" (AVISO si hay productos por expirar)
+        # Devuelve el resumen; si no hay alertas no se emite nada
+        r = self.resumen(ids, hoy)
+        if r["por_expirar"] or r["temporada"] or r["rebaja"]:
+            bus.emitir("alertas.resumen", _texto_resumen, AVISO if r["por_expirar"] else INFO, **r)
+        return r
+
+    def cerrar(self):
+        # Deja de observar la lista de productos
+        self.productos.desuscribir_cambios(self._al_cambiar)
+        self._estados.clear()
+        self._resumen_catalogo = None
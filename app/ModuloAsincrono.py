@@ -0,0 +1,73 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class EjecutorBD:
+    # Ejecutor dedicado para el trabajo de BD de las terminales
+    # Los hilos del pool hacen la E/S de SQLite; el semáforo acota cuántas operaciones pueden estar
+    # en cola o en curso a la vez (contrapresión: las terminales extra esperan sin bloquear el loop)
+    def __init__(self, max_hilos=4, max_pendientes=64):
+        self.max_hilos = max_hilos  # Número de hilos del pool dedicado
+        self.max_pendientes = max_pendientes  # Tamaño máximo de la cola de operaciones
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="bd")
+        self._cupos = None  # asyncio.Semaphore; se crea dentro del loop que lo usa
+        self._loop = None  # Loop asociado al semáforo
+
+    async def ejecutar(self, funcion, *args, **kwargs):
+        # Ejecuta funcion(*args, **kwargs) en el pool dedicado y espera su resultado
+        loop = asyncio.get_running_loop()
+        if self._cupos is None or self._loop is not loop:
+            self._cupos = asyncio.Semaphore(self.max_pendientes)
+            self._loop = loop
+        async with self._cupos:
+            return await loop.run_in_executor(self._pool, functools.partial(funcion, *args, **kwargs))
+
+    def cerrar(self):
+        # Espera a que terminen las operaciones en curso y libera los hilos
+        self._pool.shutdown(wait=True)
+
+class ListaAsincrona:
+    # Envoltorio asíncrono de cualquier Lista* (o ModuloRotaciones)
+    # Cada método público se expone como corrutina: await lista.registrar_transaccion(...)
+    # El cerrojo protege la lista enlazada y sus índices en memoria frente a hilos concurrentes;
+    # listas distintas tienen cerrojos distintos y avanzan en paralelo
+    def __init__(self, lista, ejecutor, cerrojo=None):
+        self.lista = lista  # Instancia síncrona envuelta
+        self.ejecutor = ejecutor  # EjecutorBD compartido entre las listas
+        self.cerrojo = cerrojo or threading.RLock()  # Cerrojo de la lista (puede compartirse)
+        self._metodos = {}  # Caché de corrutinas ya construidas por nombre
+
+    def _bajo_cerrojo(self, metodo, *args, **kwargs):
+        with self.cerrojo:
+            return metodo(*args, **kwargs)
+
+    def __getattr__(self, nombre):
+        # Solo se llama para atributos que no existen en el envoltorio
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        atributo = getattr(self.lista, nombre)
+        if not callable(atributo):
+            return atributo
+        if nombre not in self._metodos:
+            async def corrutina(*args, **kwargs):
+                return await self.ejecutor.ejecutar(self._bajo_cerrojo, atributo, *args, **kwargs)
+            corrutina.__name__ = nombre
+            self._metodos[nombre] = corrutina
+        return self._metodos[nombre]
+
+class ServicioAsincrono:
+    # Agrupa las listas del sistema detrás de un único ejecutor para servir varias terminales POS
+    # desde un mismo proceso
+    def __init__(self, productos=None, clientes=None, proveedores=None, transacciones=None, movimientos=None, rotaciones=None, max_hilos=4, max_pendientes=64):
+        self.ejecutor = EjecutorBD(max_hilos=max_hilos, max_pendientes=max_pendientes)
+        cerrojo_productos = threading.RLock()  # Compartido con rotaciones, que modifica la lista de productos
+        self.productos = ListaAsincrona(productos, self.ejecutor, cerrojo_productos) if productos is not None else None
+        self.clientes = ListaAsincrona(clientes, self.ejecutor) if clientes is not None else None
+        self.proveedores = ListaAsincrona(proveedores, self.ejecutor) if proveedores is not None else None
+        self.transacciones = ListaAsincrona(transacciones, self.ejecutor) if transacciones is not None else None
+        self.movimientos = ListaAsincrona(movimientos, self.ejecutor) if movimientos is not None else None
+        self.rotaciones = ListaAsincrona(rotaciones, self.ejecutor, cerrojo_productos) if rotaciones else None
+
+    def cerrar(self):
+        self.ejecutor.cerrar()
@@ -0,0 +1,252 @@
+import math
+import re
+import sqlite3
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+try:
+    from .ModuloMetricas import medir
+except ImportError:
+    from ModuloMetricas import medir
+
+# Búsqueda de texto completo sobre el nombre y la descripción de los productos
+# Dos motores con la misma interfaz (agregar, quitar, buscar):
+# - "fts5": tabla virtual FTS5 de SQLite en una BD en memoria (tokenizador unicode61 sin acentos), con
+#   ranking bm25. Se usa cuando la compilación de SQLite trae FTS5.
+# - "memoria": índice invertido propio (término -> productos) con la misma normalización y ranking BM25.
+# En ambos, cada palabra de la consulta se busca como prefijo ("choco" encuentra "Chocolate") y un producto
+# debe contener todas las palabras, en el nombre o en la descripción; las del nombre pesan más.
+# El índice se llena desde ListaProductos y se mantiene al día con su observador de cambios: así refleja
+# también las escrituras diferidas que aún no llegaron a la BD, sin tocar el esquema de la BD.
+
+MOTOR_FTS5 = "fts5"
+MOTOR_MEMORIA = "memoria"
+PESO_NOMBRE = 2.0  # Peso de las coincidencias en el nombre frente a la descripción
+PESO_DESCRIPCION = 1.0
+LIMITE_RESULTADOS = 20  # Resultados por defecto de una búsqueda
+CAMPOS_BUSQUEDA = frozenset(("nombre", "descripcion", "categoria"))  # Campos que obligan a reindexar un producto
+
+_PALABRA = re.compile(r"[^\W_]+")
+
+def normalizar(texto):
+    # Palabras del texto en minúsculas y sin acentos (misma regla que unicode61 con remove_diacritics)
+    if not texto:
+        return []
+    sin_acentos = "".join(c for c in unicodedata.normalize("NFKD", str(texto).lower()) if not unicodedata.combining(c))
+    return _PALABRA.findall(sin_acentos)
+
+def fts5_disponible():
+    # True si la compilación de SQLite permite crear tablas FTS5
+    conexion = sqlite3.connect(":memory:")
+    try:
+        conexion.execute("CREATE VIRTUAL TABLE prueba USING fts5(texto)")
+        return True
+    except sqlite3.Error:
+        return False
+    finally:
+        conexion.close()
+
+class IndiceFTS5:
+    # Índice sobre una tabla FTS5 en memoria; el rowid de cada fila es el id_producto
+    motor = MOTOR_FTS5
+
+    def __init__(self):
+        self._conexion = sqlite3.connect(":memory:", check_same_thread=False)  # Protegida por el cerrojo del buscador
+        self._conexion.execute(
+            "CREATE VIRTUAL TABLE productos_fts USING fts5("
+            "nombre, descripcion, categoria UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def cargar(self, productos):
+        # Reemplaza el contenido del índice en una sola transacción
+        with self._conexion:
+            self._conexion.execute("DELETE FROM productos_fts")
+            self._conexion.executemany(
+                "INSERT INTO productos_fts (rowid, nombre, descripcion, categoria) VALUES (?, ?, ?, ?)",
+                ((p.id_producto, p.nombre or "", p.descripcion or "", p.categoria) for p in productos)
+            )
+
+    def agregar(self, producto):
+        with self._conexion:
+            self._conexion.execute("DELETE FROM productos_fts WHERE rowid = ?", (producto.id_producto,))
+            self._conexion.execute(
+                "INSERT INTO productos_fts (rowid, nombre, descripcion, categoria) VALUES (?, ?, ?, ?)",
+                (producto.id_producto, producto.nombre or "", producto.descripcion or "", producto.categoria)
+            )
+
+    def quitar(self, id_producto):
+        with self._conexion:
+            self._conexion.execute("DELETE FROM productos_fts WHERE rowid = ?", (id_producto,))
+
+    def buscar(self, palabras, categoria, limite):
+        # Devuelve [(id_producto, puntaje)] del más al menos relevante
+        consulta = " ".join(f'"{palabra}"*' for palabra in palabras)  # Palabras normalizadas: sin comillas
+        filtro = " AND categoria = ?" if categoria is not None else ""
+        parametros = [consulta] + ([categoria] if categoria is not None else []) + [-1 if limite is None else limite]
+        filas = self._conexion.execute(
+            f"SELECT rowid, -bm25(productos_fts, {PESO_NOMBRE}, {PESO_DESCRIPCION}) AS puntaje FROM productos_fts "
+            f"WHERE productos_fts MATCH ?{filtro} ORDER BY puntaje DESC, rowid LIMIT ?", parametros
+        ).fetchall()
+        return filas
+
+    def cerrar(self):
+        self._conexion.close()
+
+class IndiceInvertido:
+    # Índice invertido en memoria: término -> {id_producto: (apariciones en nombre, en descripción)}
+    # El vocabulario se mantiene ordenado para expandir los prefijos por búsqueda binaria
+    motor = MOTOR_MEMORIA
+    K1 = 1.2  # Saturación de la frecuencia del término (BM25)
+    B = 0.75  # Normalización por largo del documento (BM25)
+
+    def __init__(self):
+        self._postings = {}
+        self._vocabulario = []
+        self._documentos = {}  # id_producto -> (términos, largo ponderado, categoria)
+        self._largo_total = 0.0
+
+    def cargar(self, productos):
+        self._postings = {}
+        self._documentos = {}
+        self._largo_total = 0.0
+        for producto in productos:
+            self._indexar(producto)
+        self._vocabulario = sorted(self._postings)
+
+    def _indexar(self, producto):
+        # Agrega las entradas del producto; devuelve los términos nuevos en el vocabulario
+        conteos = {}
+        nombre = normalizar(producto.nombre)
+        descripcion = normalizar(producto.descripcion)
+        for palabra in nombre:
+            n, d = conteos.get(palabra, (0, 0))
+            conteos[palabra] = (n + 1, d)
+        for palabra in descripcion:
+            n, d = conteos.get(palabra, (0, 0))
+            conteos[palabra] = (n, d + 1)
+        nuevos = []
+        for palabra, frecuencias in conteos.items():
+            lista = self._postings.get(palabra)
+            if lista is None:
+                lista = self._postings[palabra] = {}
+                nuevos.append(palabra)
+            lista[producto.id_producto] = frecuencias
+        largo = PESO_NOMBRE * len(nombre) + PESO_DESCRIPCION * len(descripcion)
+        self._documentos[producto.id_producto] = (tuple(conteos), largo, producto.categoria)
+        self._largo_total += largo
+        return nuevos
+
+    def agregar(self, producto):
+        self.quitar(producto.id_producto)
+        for palabra in self._indexar(producto):
+            insort(self._vocabulario, palabra)
+
+    def quitar(self, id_producto):
+        documento = self._documentos.pop(id_producto, None)
+        if documento is None:
+            return
+        palabras, largo, _ = documento
+        self._largo_total -= largo
+        for palabra in palabras:
+            lista = self._postings[palabra]
+            del lista[id_producto]
+            if not lista:
+                del self._postings[palabra]
+                del self._vocabulario[bisect_left(self._vocabulario, palabra)]
+
+    def _expandir(self, prefijo):
+        # Términos del vocabulario que empiezan con el prefijo
+        i = bisect_left(self._vocabulario, prefijo)
+        while i < len(self._vocabulario) and self._vocabulario[i].startswith(prefijo):
+            yield self._vocabulario[i]
+            i += 1
+
+    def buscar(self, palabras, categoria, limite):
+        # Devuelve [(id_producto, puntaje)] del más al menos relevante (BM25 con campos ponderados)
+        total = len(self._documentos)
+        if not total:
+            return []
+        promedio = self._largo_total / total or 1.0
+        puntajes = None
+        # Las palabras con menos candidatos primero: la intersección se achica antes
+        expansiones = sorted(([self._postings[t] for t in self._expandir(p)] for p in palabras), key=lambda l: sum(map(len, l)))
+        for listas in expansiones:
+            parciales = {}
+            for lista in listas:
+                idf = math.log(1 + (total - len(lista) + 0.5) / (len(lista) + 0.5))
+                for id_producto, (en_nombre, en_descripcion) in lista.items():
+                    if puntajes is not None and id_producto not in puntajes:
+                        continue
+                    frecuencia = PESO_NOMBRE * en_nombre + PESO_DESCRIPCION * en_descripcion
+                    largo = self._documentos[id_producto][1]
+                    norma = self.K1 * (1 - self.B + self.B * largo / promedio)
+                    parciales[id_producto] = parciales.get(id_producto, 0.0) + idf * frecuencia * (self.K1 + 1) / (frecuencia + norma)
+            if puntajes is not None:
+                parciales = {i: puntajes[i] + s for i, s in parciales.items()}
+            puntajes = parciales
+            if not puntajes:
+                return []
+        if categoria is not None:
+            puntajes = {i: s for i, s in puntajes.items() if self._documentos[i][2] == categoria}
+        ordenados = sorted(puntajes.items(), key=lambda par: (-par[1], par[0]))
+        return ordenados if limite is None else ordenados[:limite]
+
+    def cerrar(self):
+        self.cargar([])
+
+class BuscadorProductos:
+    def __init__(self, productos, motor=None):
+        # productos: ListaProductos indexada y observada
+        # motor: MOTOR_FTS5, MOTOR_MEMORIA o None (FTS5 si está disponible)
+        self.productos = productos
+        if motor is None:
+            motor = MOTOR_FTS5 if fts5_disponible() else MOTOR_MEMORIA
+        self._indice = IndiceFTS5() if motor == MOTOR_FTS5 else IndiceInvertido()
+        self.motor = self._indice.motor
+        self._cerrojo = threading.Lock()  # Los cambios pueden llegar desde varias terminales a la vez
+        with self._cerrojo:
+            self._indice.cargar(productos)
+        productos.suscribir_cambios(self._al_cambiar)
+
+    def _al_cambiar(self, id_producto, campos):
+        # Observador de ListaProductos: reindexa solo el producto afectado
+        if id_producto is None:
+            with self._cerrojo:
+                self._indice.cargar(self.productos)
+            return
+        if campos is not None and CAMPOS_BUSQUEDA.isdisjoint(campos):
+            return  # Cambios de stock o precio no afectan la búsqueda
+        nodo = self.productos._indice.get(id_producto) if campos is not None else None
+        with self._cerrojo:
+            if nodo is None:
+                self._indice.quitar(id_producto)
+            else:
+                self._indice.agregar(nodo.producto)
+
+    @medir("busqueda.buscar")
+    def buscar(self, texto, categoria=None, limite=LIMITE_RESULTADOS):
+        # Productos cuyo nombre o descripción contienen todas las palabras de 'texto' (como prefijo),
+        # del más al menos relevante
+        # categoria: si se indica, solo productos de esa categoría
+        # limite: máximo de resultados (None = todos)
+        return [producto for producto, _ in self.buscar_con_puntaje(texto, categoria, limite)]
+
+    def buscar_con_puntaje(self, texto, categoria=None, limite=LIMITE_RESULTADOS):
+        # Igual que buscar, pero devuelve [(producto, puntaje)] (mayor puntaje = más relevante)
+        palabras = normalizar(texto)
+        if not palabras:
+            return []
+        with self._cerrojo:
+            resultados = self._indice.buscar(palabras, categoria, limite)
+        encontrados = []
+        for id_producto, puntaje in resultados:
+            nodo = self.productos._indice.get(id_producto)
+            if nodo:
+                encontrados.append((nodo.producto, puntaje))
+        return encontrados
+
+    def cerrar(self):
+        # Deja de observar la lista de productos y libera el índice
+        self.productos.desuscribir_cambios(self._al_cambiar)
+        with self._cerrojo:
+            self._indice.cerrar()
@@ -8,6 +8,9 @@ except ImportError:
     parent_dir = os.path.dirname(current_dir)
     sys.path.append(parent_dir)
     from bd.BDSQLite import conectar_db
+from app.ModuloConsultas import BackendSQL, elegir_backend, BACKEND_SQL
+from app.ModuloEventos import bus
+from app.ModuloMetricas import metricas, medir
 
 class Cliente:
     # Modelo de cliente
@@ -28,46 +31,84 @@ class NodoCliente:
 
 class ListaClientes:
     # Lista doblemente enlazada de clientes con sincronización a BD
-    def __init__(self):
+    def __init__(self, cargar=True, contexto=None):
+        # cargar: si False, la lista se crea vacía (p. ej. para poblarla desde una instantánea)
+        # contexto: ContextoBD opcional (ruta, URI o ":memory:"); sin él se usa la BD configurada
+        self.contexto = contexto
         self.raiz = None  # Nodo raíz (inicio) de la lista de clientes
-        self._cargar_desde_db()
+        self.cola = None  # Último nodo de la lista (inserción O(1) al final)
+        self._largo = 0  # Número de nodos (len() en O(1))
+        self.consultas_sql = BackendSQL(self.contexto)  # Backend para consultas empujadas a SQLite
+        self.diario = None  # DiarioEscritura opcional (modo de escritura diferida)
+        if cargar:
+            self._cargar_desde_db()
 
+    @medir("clientes.cargar")
     def _cargar_desde_db(self):
         # Carga clientes desde la base de datos
-        self.raiz = None
-        conexion = conectar_db()
+        if self.diario:
+            self.diario.flush()  # La BD debe reflejar lo pendiente antes de recargar
+        conexion = conectar_db(self.contexto)
         if not conexion: return
         try:
             cursor = conexion.cursor()
             cursor.execute("SELECT * FROM Clientes")
-            filas = cursor.fetchall()
-            for fila in filas:
-                cliente = Cliente(
-                    id_cliente=fila[0], nombre=fila[1], contacto=fila[2],
-                    direccion=fila[3], tipo_cliente=fila[4], credito=fila[5]
-                )
-                self._agregar_nodo(cliente)
+            self._cargar_filas(cursor.fetchall())
         except sqlite3.Error as e:
             pass
         finally:
             if conexion: conexion.close()
 
+    def _cargar_filas(self, filas, reiniciar=True):
+        # Construye la lista a partir de filas de la tabla Clientes (BD o instantánea)
+        # reiniciar: si False, las filas se anexan a la lista existente (carga incremental)
+        if reiniciar:
+            self.raiz = None
+            self.cola = None
+            self._largo = 0
+        metricas.filas_cargadas("Clientes", len(filas))
+        for fila in filas:
+            cliente = Cliente(
+                id_cliente=fila[0], nombre=fila[1], contacto=fila[2],
+                direccion=fila[3], tipo_cliente=fila[4], credito=fila[5]
+            )
+            self._agregar_nodo(cliente)
+
     def _agregar_nodo(self, cliente):
         # Agrega un nodo a la lista
         nuevo_nodo = NodoCliente(cliente)
         if self.raiz is None:
             self.raiz = nuevo_nodo
         else:
-            nodo_actual = self.raiz
-            while nodo_actual.siguiente:
-                nodo_actual = nodo_actual.siguiente
-            nodo_actual.siguiente = nuevo_nodo
-            nuevo_nodo.anterior = nodo_actual
+            self.cola.siguiente = nuevo_nodo
+            nuevo_nodo.anterior = self.cola
+        self.cola = nuevo_nodo
+        self._largo += 1
         return nuevo_nodo
 
+    def __len__(self):
+        return self._largo
+
+    def __iter__(self):
+        # Recorre los clientes en orden de inserción sin construir listas intermedias
+        nodo_actual = self.raiz
+        while nodo_actual:
+            yield nodo_actual.cliente
+            nodo_actual = nodo_actual.siguiente
+
+    @medir("clientes.registrar_cliente")
     def registrar_cliente(self, nombre, contacto, direccion, tipo_cliente, credito=0):
         # Registra un cliente en la BD y la lista
-        conexion = conectar_db()
+        if self.diario:
+            id_cliente = self.diario.siguiente_id("Clientes", "id_cliente")
+            self.diario.insertar("Clientes", {
+                "id_cliente": id_cliente, "nombre": nombre, "contacto": contacto, "direccion": direccion,
+                "tipo_cliente": tipo_cliente, "credito": credito
+            })
+            nuevo_nodo = self._agregar_nodo(Cliente(id_cliente, nombre, contacto, direccion, tipo_cliente, credito))
+            bus.emitir("cliente.registrado", "Cliente '{nombre}' registrado con ID: {id_cliente}", nombre=nombre, id_cliente=id_cliente)
+            return nuevo_nodo.cliente
+        conexion = conectar_db(self.contexto)
         if not conexion: return None
         try:
             cursor = conexion.cursor()
@@ -79,7 +120,7 @@ class ListaClientes:
             conexion.commit()
             cliente = Cliente(id_cliente, nombre, contacto, direccion, tipo_cliente, credito)
             nuevo_nodo = self._agregar_nodo(cliente)
-            print(f"Cliente '{nombre}' registrado con ID: {id_cliente}")
+            bus.emitir("cliente.registrado", "Cliente '{nombre}' registrado con ID: {id_cliente}", nombre=nombre, id_cliente=id_cliente)
             return nuevo_nodo.cliente
         except sqlite3.Error as e:
             if conexion: conexion.rollback()
@@ -87,6 +128,7 @@ class ListaClientes:
         finally:
             if conexion: conexion.close()
 
+    @medir("clientes.actualizar_cliente")
     def actualizar_cliente(self, id_cliente, nuevos_datos):
         # Actualiza un cliente en la lista y la BD
         nodo_actual = self.raiz
@@ -103,7 +145,12 @@ class ListaClientes:
             self._cargar_desde_db()
             return False
 
-        conexion = conectar_db()
+        if self.diario:
+            self.diario.actualizar("Clientes", "id_cliente", id_cliente, nuevos_datos)
+            bus.emitir("cliente.actualizado", "Cliente ID {id_cliente} actualizado (escritura diferida).", id_cliente=id_cliente)
+            return True
+
+        conexion = conectar_db(self.contexto)
         if not conexion: return False
         try:
             cursor = conexion.cursor()
@@ -114,7 +161,7 @@ class ListaClientes:
             if cursor.rowcount == 0:
                 return False
             conexion.commit()
-            print(f"Cliente ID {id_cliente} actualizado en la BD.")
+            bus.emitir("cliente.actualizado", "Cliente ID {id_cliente} actualizado en la BD.", id_cliente=id_cliente)
             return True
         except sqlite3.Error as e:
             if conexion: conexion.rollback()
@@ -122,24 +169,29 @@ class ListaClientes:
         finally:
             if conexion: conexion.close()
 
+    @medir("clientes.eliminar_cliente")
     def eliminar_cliente(self, id_cliente):
         # Elimina un cliente de la BD y la lista
-        conexion = conectar_db()
-        if not conexion: return False
         eliminado_db = False
-        try:
-            cursor = conexion.cursor()
-            cursor.execute("PRAGMA foreign_keys = ON")
-            cursor.execute("DELETE FROM Clientes WHERE id_cliente = ?", (id_cliente,))
-            if cursor.rowcount > 0:
-                conexion.commit()
-                eliminado_db = True
-                print(f"Cliente ID {id_cliente} eliminado de la BD (y transacciones/movimientos asociados si existen).")
-        except sqlite3.Error as e:
-            if conexion: conexion.rollback()
-            return False
-        finally:
-            if conexion: conexion.close()
+        if self.diario:
+            self.diario.eliminar("Clientes", "id_cliente", id_cliente)
+            # En modo diferido la lista en memoria decide si había algo que eliminar
+        else:
+            conexion = conectar_db(self.contexto)
+            if not conexion: return False
+            try:
+                cursor = conexion.cursor()
+                cursor.execute("PRAGMA foreign_keys = ON")
+                cursor.execute("DELETE FROM Clientes WHERE id_cliente = ?", (id_cliente,))
+                if cursor.rowcount > 0:
+                    conexion.commit()
+                    eliminado_db = True
+                    bus.emitir("cliente.eliminado", "Cliente ID {id_cliente} eliminado de la BD (y transacciones/movimientos asociados si existen).", id_cliente=id_cliente)
+            except sqlite3.Error as e:
+                if conexion: conexion.rollback()
+                return False
+            finally:
+                if conexion: conexion.close()
 
         nodo_actual = self.raiz
         while nodo_actual:
@@ -150,7 +202,10 @@ class ListaClientes:
                     self.raiz = nodo_actual.siguiente
                 if nodo_actual.siguiente:
                     nodo_actual.siguiente.anterior = nodo_actual.anterior
-                print(f"Cliente ID {id_cliente} eliminado de la lista.")
+                if nodo_actual is self.cola:
+                    self.cola = nodo_actual.anterior
+                self._largo -= 1
+                bus.emitir("cliente.eliminado", "Cliente ID {id_cliente} eliminado de la lista.", id_cliente=id_cliente)
                 return True
             nodo_actual = nodo_actual.siguiente
 
@@ -160,23 +215,49 @@ class ListaClientes:
         else:
             return False
 
-    def consultar_cliente(self, id_cliente=None, nombre=None):
+    @medir("clientes.consultar_cliente")
+    def consultar_cliente(self, id_cliente=None, nombre=None, backend=None, limite=None):
         # Consulta clientes por ID o nombre
+        # backend: "memoria" (por defecto), "sql" o "auto"; la ruta SQL devuelve filas ligeras
+        # limite: número máximo de resultados
+        if elegir_backend(backend, self.consultas_sql, "Clientes") == BACKEND_SQL:
+            if self.diario:
+                self.diario.flush()  # La consulta SQL debe ver las escrituras diferidas
+            filtros = {}
+            if id_cliente is not None: filtros["id_cliente"] = id_cliente
+            if nombre is not None: filtros["nombre"] = nombre
+            return self.consultas_sql.consultar("Clientes", filtros=filtros, limite=limite)
+        return list(self.iterar_clientes(id_cliente, nombre, limite=limite))
+
+    def iterar_clientes(self, id_cliente=None, nombre=None, desde=0, limite=None):
+        # Generador de clientes por ID o nombre (en memoria): entrega las coincidencias a medida que las encuentra
+        # desde: coincidencias a omitir al inicio (paginación); limite: máximo de coincidencias a entregar
+        # El recorrido se detiene en cuanto se entrega la última coincidencia pedida o el llamador deja de iterar
+        nombre = nombre.lower() if nombre is not None else None
         nodo_actual = self.raiz
-        resultados = []
-        while nodo_actual:
-            c = nodo_actual.cliente
-            if (id_cliente is None or c.id_cliente == id_cliente) and (nombre is None or c.nombre.lower() == nombre.lower()):
-                resultados.append(c)
-            nodo_actual = nodo_actual.siguiente
-        return resultados
+        coincidencias = 0
+        entregados = 0
+        recorridos = 0  # Nodos visitados (métrica)
+        try:
+            while nodo_actual and (limite is None or entregados < limite):
+                recorridos += 1
+                c = nodo_actual.cliente
+                if (id_cliente is None or c.id_cliente == id_cliente) and (nombre is None or c.nombre.lower() == nombre):
+                    coincidencias += 1
+                    if coincidencias > desde:
+                        entregados += 1
+                        yield c
+                nodo_actual = nodo_actual.siguiente
+        finally:
+            metricas.nodos_recorridos(recorridos)
 
+    @medir("clientes.resumen_movimientos_cliente")
     def resumen_movimientos_cliente(self, movimientos_lista, id_cliente, fecha_inicio, fecha_fin, tipo=None):
         # Resumen de movimientos de un cliente
-        if not movimientos_lista:
+        if movimientos_lista is None:
             return None
         from app.ModuloTransacciones import ListaTransacciones
-        transacciones = ListaTransacciones()
+        transacciones = ListaTransacciones(contexto=self.contexto)
         transacciones_cliente = []
         nodo = transacciones.raiz
         while nodo:
@@ -0,0 +1,176 @@
+import sqlite3
+import json
+import os
+from collections import namedtuple
+try:
+    from bd.BDSQLite import conectar_db, asegurar_indices
+except ImportError:
+    import sys
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parent_dir = os.path.dirname(current_dir)
+    sys.path.append(parent_dir)
+    from bd.BDSQLite import conectar_db, asegurar_indices
+from app.ModuloEventos import bus, ERROR
+
+BACKEND_MEMORIA = "memoria"  # Filtra recorriendo la lista doblemente enlazada cargada
+BACKEND_SQL = "sql"  # Empuja filtros, rangos, orden y LIMIT a SQLite
+BACKEND_AUTO = "auto"  # Elige según el tamaño estimado de la tabla
+UMBRAL_FILAS_MEMORIA = 5000  # A partir de este número estimado de filas, "auto" usa SQL
+
+# Descripción de las tablas consultables
+# pk: clave primaria, fecha: columna usada para rangos de fechas, sin_mayusculas: columnas comparadas sin distinguir mayúsculas
+ESQUEMAS = {
+    "Productos": {"pk": "id_producto", "fecha": "fecha_expiracion", "sin_mayusculas": ("nombre", "categoria")},
+    "Proveedores": {"pk": "id_proveedor", "fecha": None, "sin_mayusculas": ("nombre",)},
+    "Clientes": {"pk": "id_cliente", "fecha": None, "sin_mayusculas": ("nombre", "tipo_cliente")},
+    "Transacciones": {"pk": "id_transaccion", "fecha": "fecha", "sin_mayusculas": ("estado",)},
+    "Movimientos": {"pk": "id_estado", "fecha": "fecha", "sin_mayusculas": ("tipo",)},
+}
+
+def elegir_backend(backend, consultas, tabla):
+    # Decide qué ruta de consulta usar
+    # backend: BACKEND_MEMORIA, BACKEND_SQL o BACKEND_AUTO (None equivale a memoria)
+    # consultas: instancia de BackendSQL usada para estimar el tamaño de la tabla
+    if backend is None or backend == BACKEND_MEMORIA:
+        return BACKEND_MEMORIA
+    if backend == BACKEND_SQL:
+        return BACKEND_SQL
+    if backend != BACKEND_AUTO:
+        raise ValueError(f"Backend de consulta desconocido: {backend}")
+    estimado = consultas.estimar_filas(tabla)
+    return BACKEND_SQL if estimado >= UMBRAL_FILAS_MEMORIA else BACKEND_MEMORIA
+
+class BackendSQL:
+    # Backend de consultas que traduce los filtros a SQL parametrizado y devuelve filas ligeras (namedtuple)
+    def __init__(self, contexto=None):
+        self.contexto = contexto  # ContextoBD opcional; sin él se usa la BD configurada
+        self._columnas = {}  # tabla -> tupla de columnas (según PRAGMA table_info)
+        self._tipos_fila = {}  # tabla -> clase namedtuple para las filas de esa tabla
+        self._indices_listos = False  # Indica si ya se verificaron los índices secundarios
+
+    def _preparar(self, conexion, tabla):
+        # Obtiene (y memoriza) las columnas de la tabla y el tipo de fila asociado
+        if tabla not in ESQUEMAS:
+            raise ValueError(f"Tabla no consultable: {tabla}")
+        if not self._indices_listos:
+            self._indices_listos = asegurar_indices(conexion)
+        if tabla not in self._columnas:
+            cursor = conexion.cursor()
+            cursor.execute(f"PRAGMA table_info({tabla})")
+            columnas = tuple(fila[1] for fila in cursor.fetchall())
+            self._columnas[tabla] = columnas
+            self._tipos_fila[tabla] = namedtuple(f"Fila{tabla}", columnas)
+        return self._columnas[tabla]
+
+    def _construir_sql(self, tabla, columnas, filtros, fecha_inicio, fecha_fin, orden, descendente, limite, offset, mayor_que=None, contar=False):
+        # Construye la sentencia SQL y sus parámetros; los nombres de columna se validan contra el esquema
+        esquema = ESQUEMAS[tabla]
+        condiciones = []
+        parametros = []
+        for clave, valor in (mayor_que or {}).items():
+            if clave not in columnas:
+                raise ValueError(f"Columna desconocida en {tabla}: {clave}")
+            condiciones.append(f"{clave} > ?")
+            parametros.append(valor)
+        for clave, valor in (filtros or {}).items():
+            if clave not in columnas:
+                raise ValueError(f"Columna desconocida en {tabla}: {clave}")
+            if valor is None:
+                condiciones.append(f"{clave} IS NULL")
+            elif clave in esquema["sin_mayusculas"]:
+                condiciones.append(f"{clave} = ? COLLATE NOCASE")
+                parametros.append(valor)
+            else:
+                condiciones.append(f"{clave} = ?")
+                parametros.append(valor)
+        if fecha_inicio is not None or fecha_fin is not None:
+            columna_fecha = esquema["fecha"]
+            if columna_fecha is None:
+                raise ValueError(f"La tabla {tabla} no tiene columna de fecha")
+            if fecha_inicio is not None:
+                condiciones.append(f"{columna_fecha} >= ?")
+                parametros.append(str(fecha_inicio))
+            if fecha_fin is not None:
+                condiciones.append(f"{columna_fecha} <= ?")
+                parametros.append(str(fecha_fin))
+        sql = f"SELECT {'COUNT(*)' if contar else '*'} FROM {tabla}"
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        if contar:
+            return sql, parametros
+        orden = orden or esquema["pk"]
+        if orden not in columnas:
+            raise ValueError(f"Columna de orden desconocida en {tabla}: {orden}")
+        sql += f" ORDER BY {orden} {'DESC' if descendente else 'ASC'}"
+        if limite is not None:
+            sql += " LIMIT ? OFFSET ?"
+            parametros.extend([int(limite), int(offset)])
+        elif offset:
+            sql += " LIMIT -1 OFFSET ?"
+            parametros.append(int(offset))
+        return sql, parametros
+
+    def consultar(self, tabla, filtros=None, fecha_inicio=None, fecha_fin=None, orden=None, descendente=False, limite=None, offset=0, mayor_que=None):
+        # Consulta filas de una tabla con filtros de igualdad, rango de fechas, orden y LIMIT/OFFSET
+        # filtros: diccionario columna -> valor (igualdad; None equivale a IS NULL)
+        # mayor_que: diccionario columna -> valor para condiciones estrictas "columna > valor"
+        # fecha_inicio, fecha_fin: extremos (inclusivos) sobre la columna de fecha de la tabla
+        # orden: columna de ordenamiento (por defecto la clave primaria)
+        # Devuelve una lista de filas namedtuple con los nombres de columna de la tabla
+        conexion = conectar_db(self.contexto)
+        if not conexion: return []
+        try:
+            columnas = self._preparar(conexion, tabla)
+            sql, parametros = self._construir_sql(tabla, columnas, filtros, fecha_inicio, fecha_fin, orden, descendente, limite, offset, mayor_que)
+            cursor = conexion.cursor()
+            cursor.execute(sql, parametros)
+            tipo_fila = self._tipos_fila[tabla]
+            if tabla == "Transacciones":
+                return [self._decodificar_transaccion(tipo_fila, fila) for fila in cursor.fetchall()]
+            return [tipo_fila._make(fila) for fila in cursor.fetchall()]
+        except sqlite3.Error as e:
+            bus.emitir("consulta.error", "Error en la consulta SQL sobre {tabla}: {error}", ERROR, tabla=tabla, error=str(e))
+            return []
+        finally:
+            if conexion: conexion.close()
+
+    def contar(self, tabla, filtros=None, fecha_inicio=None, fecha_fin=None):
+        # Cuenta las filas que cumplen los filtros sin materializarlas
+        conexion = conectar_db(self.contexto)
+        if not conexion: return 0
+        try:
+            columnas = self._preparar(conexion, tabla)
+            sql, parametros = self._construir_sql(tabla, columnas, filtros, fecha_inicio, fecha_fin, None, False, None, 0, None, contar=True)
+            cursor = conexion.cursor()
+            cursor.execute(sql, parametros)
+            return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            bus.emitir("consulta.error", "Error al contar filas de {tabla}: {error}", ERROR, tabla=tabla, error=str(e))
+            return 0
+        finally:
+            if conexion: conexion.close()
+
+    def estimar_filas(self, tabla):
+        # Estimación barata del tamaño de la tabla: MAX(rowid) se resuelve en O(log n) sobre el árbol B
+        if tabla not in ESQUEMAS:
+            raise ValueError(f"Tabla no consultable: {tabla}")
+        conexion = conectar_db(self.contexto)
+        if not conexion: return 0
+        try:
+            cursor = conexion.cursor()
+            cursor.execute(f"SELECT MAX(rowid) FROM {tabla}")
+            maximo = cursor.fetchone()[0]
+            return maximo or 0
+        except sqlite3.Error:
+            return 0
+        finally:
+            if conexion: conexion.close()
+
+    def _decodificar_transaccion(self, tipo_fila, fila):
+        # Convierte la columna JSON de productos en lista, igual que la carga en memoria
+        fila = tipo_fila._make(fila)
+        try:
+            productos = json.loads(fila.productos) if fila.productos else []
+        except (json.JSONDecodeError, TypeError):
+            productos = []
+        return fila._replace(productos=productos)
@@ -0,0 +1,302 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+try:
+    import bd.BDSQLite as BDSQLite
+    from bd.BDSQLite import conectar_db
+except ImportError:
+    import sys
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parent_dir = os.path.dirname(current_dir)
+    sys.path.append(parent_dir)
+    import bd.BDSQLite as BDSQLite
+    from bd.BDSQLite import conectar_db
+from app.ModuloEventos import bus, AVISO, ERROR
+
+DURABILIDAD_MEMORIA = "memoria"  # La cola vive solo en memoria: lo no volcado se pierde si el proceso cae
+DURABILIDAD_DIARIO = "diario"  # Cada operación se anexa al archivo de diario (el SO decide cuándo llega a disco)
+DURABILIDAD_FSYNC = "fsync"  # Cada operación se anexa y se sincroniza a disco antes de devolver el control
+
+class DiarioEscritura:
+    # Diario de escritura diferida (write-behind) con commits agrupados
+    # Las listas aplican los cambios en memoria de inmediato y encolan aquí la sentencia SQL equivalente.
+    # La cola se vuelca a SQLite en una sola transacción cada max_operaciones operaciones o cada max_ms
+    # milisegundos, lo que ocurra primero. Con durabilidad "diario" o "fsync" cada operación también se
+    # anexa a un archivo; si el proceso cae, recuperar() reaplica lo que no llegó a la BD.
+    # contexto: ContextoBD opcional; con una BD en memoria y sin ruta_diario no hay archivo que recuperar,
+    # así que la durabilidad pasa a ser "memoria"
+    def __init__(self, ruta_diario=None, max_operaciones=500, max_ms=200, durabilidad=DURABILIDAD_DIARIO, contexto=None):
+        if durabilidad not in (DURABILIDAD_MEMORIA, DURABILIDAD_DIARIO, DURABILIDAD_FSYNC):
+            raise ValueError(f"Durabilidad no válida: {durabilidad}")
+        self.contexto = contexto  # Destino de la BD (None = BD configurada)
+        ruta_db = contexto.ruta if contexto else BDSQLite.nombre_db
+        if not ruta_diario and not ruta_db:
+            durabilidad = DURABILIDAD_MEMORIA
+        self.ruta_diario = ruta_diario or f"{ruta_db}-diario"  # Archivo de diario (JSON por línea)
+        self.max_operaciones = max_operaciones  # Tamaño máximo de un grupo antes de volcar
+        self.max_ms = max_ms  # Antigüedad máxima (ms) de una operación pendiente
+        self.durabilidad = durabilidad  # Ver constantes DURABILIDAD_*
+        self._cerrojo = threading.RLock()
+        self._pendientes = []  # Lista de (seq, sql, parametros) aún no volcados a la BD
+        self._primera_pendiente = None  # Instante (monotónico) de la operación pendiente más antigua
+        self._seq = 0  # Número de secuencia de la última operación encolada
+        self._siguientes_ids = {}  # tabla -> siguiente ID a asignar
+        self._archivo = None  # Archivo de diario abierto en modo anexar
+        self._activo = True
+        self.seq_aplicado = 0  # Última secuencia confirmada en la BD (DiarioAplicado.seq)
+        self.descartadas = []  # Operaciones rechazadas por SQLite: dicts con seq, sql, parametros y error
+        self.grupos_volcados = 0  # Estadística: commits agrupados realizados
+        self.operaciones_volcadas = 0  # Estadística: operaciones escritas en la BD
+        self.recuperar()
+        if self.durabilidad != DURABILIDAD_MEMORIA:
+            self._archivo = open(self.ruta_diario, "a", encoding="utf-8")
+        self._despertador = threading.Condition(self._cerrojo)
+        self._hilo = threading.Thread(target=self._bucle_volcado, name="diario-escritura", daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    # --- Recuperación ---
+
+    def _preparar_tabla_control(self, cursor):
+        # Tabla con el último número de secuencia aplicado, escrita en la misma transacción que cada grupo
+        cursor.execute("CREATE TABLE IF NOT EXISTS DiarioAplicado (id INTEGER PRIMARY KEY CHECK(id = 1), seq INTEGER NOT NULL)")
+        cursor.execute("INSERT OR IGNORE INTO DiarioAplicado (id, seq) VALUES (1, 0)")
+
+    def recuperar(self):
+        # Reaplica las operaciones del diario que no alcanzaron la BD antes de una caída
+        # Devuelve el número de operaciones reaplicadas. El archivo solo se elimina cuando DiarioAplicado
+        # alcanzó la última secuencia anotada; si no, lo que falta queda pendiente y se reintenta al volcar
+        conexion = conectar_db(self.contexto)
+        if not conexion: return 0
+        try:
+            cursor = conexion.cursor()
+            self._preparar_tabla_control(cursor)
+            conexion.commit()
+            cursor.execute("SELECT seq FROM DiarioAplicado WHERE id = 1")
+            aplicado = cursor.fetchone()[0]  # Última secuencia que ya está en la BD
+        except sqlite3.Error as e:
+            bus.emitir("diario.error", "No se pudo leer el estado del diario: {error}", ERROR, error=str(e))
+            return 0
+        finally:
+            conexion.close()
+        self.seq_aplicado = aplicado
+        self._seq = max(self._seq, aplicado)
+        if not os.path.exists(self.ruta_diario):
+            return 0
+        operaciones = []
+        with open(self.ruta_diario, "r", encoding="utf-8") as archivo:
+            for linea in archivo:
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    break  # Línea incompleta escrita durante la caída: lo siguiente no es fiable
+                operaciones.append((registro["seq"], registro["sql"], registro["parametros"]))
+        faltantes = [op for op in operaciones if op[0] > aplicado]
+        self._seq = max([aplicado] + [op[0] for op in operaciones])
+        if faltantes:
+            try:
+                self._volcar_grupo(faltantes)
+            except sqlite3.Error as e:
+                bus.emitir("diario.error", "No se pudo reaplicar el diario: {error}", ERROR, error=str(e))
+            restantes = [op for op in faltantes if op[0] > self.seq_aplicado]
+            if restantes:
+                # El archivo se conserva y lo no aplicado se reintenta en el próximo volcado
+                self._pendientes = restantes
+                self._primera_pendiente = time.monotonic()
+                bus.emitir("diario.recuperacion_incompleta", "Diario: {restantes} de {total} operación(es) siguen sin aplicar; se conserva {ruta}.",
+                           ERROR, restantes=len(restantes), total=len(faltantes), ruta=self.ruta_diario)
+                return len(faltantes) - len(restantes)
+            bus.emitir("diario.recuperado", "Diario: {operaciones} operación(es) recuperada(s) tras una interrupción.", AVISO, operaciones=len(faltantes))
+        os.remove(self.ruta_diario)
+        return len(faltantes)
+
+    # --- Encolado ---
+
+    def siguiente_id(self, tabla, pk):
+        # Asigna el ID de una fila nueva sin esperar a la BD (los IDs son monotónicos por tabla)
+        with self._cerrojo:
+            if tabla not in self._siguientes_ids:
+                conexion = conectar_db(self.contexto)
+                maximo = 0
+                if conexion:
+                    try:
+                        cursor = conexion.cursor()
+                        cursor.execute(f"SELECT MAX({pk}) FROM {tabla}")
+                        maximo = cursor.fetchone()[0] or 0
+                        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabla,))
+                        fila = cursor.fetchone()
+                        if fila and fila[0]:
+                            maximo = max(maximo, fila[0])
+                    except sqlite3.Error:
+                        pass
+                    finally:
+                        conexion.close()
+                self._siguientes_ids[tabla] = maximo + 1
+            nuevo_id = self._siguientes_ids[tabla]
+            self._siguientes_ids[tabla] += 1
+            return nuevo_id
+
+    def encolar(self, sql, parametros=()):
+        # Encola una sentencia SQL; devuelve su número de secuencia
+        with self._cerrojo:
+            if not self._activo:
+                raise RuntimeError("El diario de escritura está cerrado.")
+            self._seq += 1
+            parametros = list(parametros)
+            if self._archivo:
+                self._archivo.write(json.dumps({"seq": self._seq, "sql": sql, "parametros": parametros}, default=str) + "\n")
+                self._archivo.flush()
+                if self.durabilidad == DURABILIDAD_FSYNC:
+                    os.fsync(self._archivo.fileno())
+            self._pendientes.append((self._seq, sql, parametros))
+            if self._primera_pendiente is None:
+                self._primera_pendiente = time.monotonic()
+                self._despertador.notify()
+            if len(self._pendientes) >= self.max_operaciones:
+                self.flush()
+            return self._seq
+
+    def insertar(self, tabla, datos):
+        # Encola un INSERT con todas sus columnas (incluida la clave primaria ya asignada)
+        columnas = ", ".join(datos)
+        marcadores = ", ".join("?" for _ in datos)
+        return self.encolar(f"INSERT INTO {tabla} ({columnas}) VALUES ({marcadores})", list(datos.values()))
+
+    def actualizar(self, tabla, pk, id_fila, datos):
+        # Encola un UPDATE de las columnas indicadas
+        set_clause = ", ".join(f"{clave} = ?" for clave in datos)
+        return self.encolar(f"UPDATE {tabla} SET {set_clause} WHERE {pk} = ?", list(datos.values()) + [id_fila])
+
+    def eliminar(self, tabla, columna, valor):
+        # Encola un DELETE por igualdad de columna
+        return self.encolar(f"DELETE FROM {tabla} WHERE {columna} = ?", [valor])
+
+    @property
+    def pendientes(self):
+        return len(self._pendientes)
+
+    # --- Volcado ---
+
+    def flush(self):
+        # Vuelca a SQLite todas las operaciones pendientes en un único commit
+        # Llamar antes de reportes o consultas que lean directamente de la BD
+        # Si la BD no está disponible (sin conexión, bloqueada) lo no aplicado vuelve a la cola y el archivo
+        # de diario se conserva; devuelve el número de operaciones que llegaron a la BD
+        with self._cerrojo:
+            if not self._pendientes:
+                return 0
+            grupo = self._pendientes
+            self._pendientes = []
+            self._primera_pendiente = None
+            error = None
+            try:
+                completo = self._volcar_grupo(grupo)
+            except sqlite3.Error as e:
+                completo, error = False, e
+            if not completo:
+                restantes = [op for op in grupo if op[0] > self.seq_aplicado]
+                self._pendientes = restantes + self._pendientes
+                if self._pendientes:
+                    self._primera_pendiente = time.monotonic()  # Reintento tras max_ms, no en bucle
+                bus.emitir("diario.volcado_fallido", "Diario: {restantes} operación(es) siguen pendientes; se reintentará el volcado ({error}).",
+                           ERROR, restantes=len(restantes), error=str(error) if error else "sin conexión con la BD")
+                return len(grupo) - len(restantes)
+            if self._archivo and not self._pendientes:
+                # Todo lo anotado ya está en la BD: el diario puede empezar de cero
+                self._archivo.truncate(0)
+                self._archivo.seek(0)
+            return len(grupo)
+
+    def _volcar_grupo(self, grupo):
+        # Aplica el grupo en una transacción; devuelve True si todas sus operaciones quedaron resueltas
+        # (aplicadas o descartadas por SQLite) y False si no hubo conexión
+        # Los errores de conexión o bloqueo (sqlite3.OperationalError) se propagan: self.seq_aplicado indica
+        # hasta dónde llegó el grupo
+        conexion = conectar_db(self.contexto)
+        if not conexion:
+            bus.emitir("diario.sin_conexion", "Diario: no hay conexión con la BD; las operaciones siguen en el archivo de diario.", ERROR,
+                       operaciones=len(grupo))
+            return False
+        try:
+            cursor = conexion.cursor()
+            cursor.execute("PRAGMA foreign_keys = ON")
+            self._preparar_tabla_control(cursor)
+            try:
+                for _, sql, parametros in grupo:
+                    cursor.execute(sql, parametros)
+                cursor.execute("UPDATE DiarioAplicado SET seq = ? WHERE id = 1", (grupo[-1][0],))
+                conexion.commit()
+                self.seq_aplicado = grupo[-1][0]
+            except sqlite3.OperationalError:
+                conexion.rollback()
+                raise
+            except sqlite3.Error as e:
+                # Una operación inválida no debe tumbar el grupo entero: se reaplica una a una
+                conexion.rollback()
+                bus.emitir("diario.grupo_fallido", "Diario: el grupo falló ({error}); se aplicará operación por operación.", AVISO,
+                           error=str(e), operaciones=len(grupo))
+                for seq, sql, parametros in grupo:
+                    try:
+                        cursor.execute(sql, parametros)
+                    except sqlite3.OperationalError:
+                        conexion.rollback()
+                        raise
+                    except sqlite3.Error as error_op:
+                        # Rechazo definitivo (CHECK, FOREIGN KEY, ...): se registra y la secuencia avanza igual,
+                        # para no reaplicarla en cada arranque
+                        conexion.rollback()
+                        self._descartar(seq, sql, parametros, error_op)
+                    cursor.execute("UPDATE DiarioAplicado SET seq = ? WHERE id = 1", (seq,))
+                    conexion.commit()
+                    self.seq_aplicado = seq
+            self.grupos_volcados += 1
+            self.operaciones_volcadas += len(grupo)
+            return True
+        finally:
+            conexion.close()
+
+    def _descartar(self, seq, sql, parametros, error):
+        # El cambio ya se aplicó en memoria pero SQLite lo rechazó: memoria y BD difieren desde aquí
+        self.descartadas.append({"seq": seq, "sql": sql, "parametros": parametros, "error": str(error)})
+        bus.emitir("diario.descartada", "Diario: operación {seq} descartada ({error}): {sql}", ERROR,
+                   seq=seq, sql=sql, parametros=parametros, error=str(error))
+
+    def _bucle_volcado(self):
+        # Hilo de fondo: vuelca cuando la operación pendiente más antigua supera max_ms
+        with self._cerrojo:
+            while self._activo:
+                if self._primera_pendiente is None:
+                    self._despertador.wait()
+                    continue
+                restante = self.max_ms / 1000 - (time.monotonic() - self._primera_pendiente)
+                if restante > 0:
+                    self._despertador.wait(restante)
+                    continue
+                self.flush()
+
+    def cerrar(self):
+        # Vuelca lo pendiente, detiene el hilo de fondo y elimina el archivo de diario (solo si todo llegó a la BD)
+        with self._cerrojo:
+            if not self._activo:
+                return
+            self.flush()
+            self._activo = False
+            self._despertador.notify_all()
+            if self._archivo:
+                self._archivo.close()
+                self._archivo = None
+                if self._pendientes:
+                    bus.emitir("diario.cerrado_pendiente", "Diario: {pendientes} operación(es) sin volcar quedan en {ruta} para la próxima recuperación.",
+                               ERROR, pendientes=len(self._pendientes), ruta=self.ruta_diario)
+                elif os.path.exists(self.ruta_diario):
+                    os.remove(self.ruta_diario)
+        self._hilo.join(timeout=1)
+
+def activar_escritura_diferida(diario, *listas):
+    # Conecta un mismo diario a varias listas (productos, clientes, transacciones, ...)
+    for lista in listas:
+        lista.diario = diario
+    return diario
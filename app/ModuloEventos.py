@@ -0,0 +1,164 @@
+import atexit
+import json
+import sys
+import threading
+import time
+from collections import deque
+
+# Bus de eventos del sistema: reemplaza los print() de las operaciones por eventos tipados.
+# Cada evento tiene un tipo ("producto.registrado", "stock.conflicto", ...), un nivel, una plantilla y sus datos;
+# el texto solo se formatea si algún sumidero lo pide. Sin suscriptores, emitir() retorna de inmediato.
+
+DEPURACION = 10
+INFO = 20
+AVISO = 30
+ERROR = 40
+NOMBRES_NIVEL = {DEPURACION: "DEPURACION", INFO: "INFO", AVISO: "AVISO", ERROR: "ERROR"}
+SIN_SUSCRIPTORES = float("inf")  # Nivel mínimo del bus cuando nadie escucha
+
+class Evento:
+    # Evento emitido por el sistema
+    # plantilla: texto con campos {nombre} (str.format) o función datos -> str; se evalúa al pedir el mensaje
+    __slots__ = ("tipo", "nivel", "plantilla", "datos", "instante", "_mensaje")
+
+    def __init__(self, tipo, nivel, plantilla, datos):
+        self.tipo = tipo  # Tipo jerárquico separado por puntos, p. ej. "producto.actualizado"
+        self.nivel = nivel  # DEPURACION, INFO, AVISO o ERROR
+        self.plantilla = plantilla
+        self.datos = datos  # Diccionario con los datos estructurados del evento
+        self.instante = time.time()  # Marca de tiempo (epoch, segundos)
+        self._mensaje = None
+
+    @property
+    def mensaje(self):
+        # Texto legible del evento, formateado una sola vez y solo si alguien lo necesita
+        if self._mensaje is None:
+            if callable(self.plantilla):
+                self._mensaje = self.plantilla(**self.datos)
+            else:
+                self._mensaje = self.plantilla.format(**self.datos)
+        return self._mensaje
+
+    def a_dict(self):
+        return {
+            "tipo": self.tipo, "nivel": NOMBRES_NIVEL.get(self.nivel, self.nivel), "instante": self.instante,
+            "mensaje": self.mensaje, "datos": self.datos,
+        }
+
+    def __repr__(self):
+        return f"Evento({self.tipo!r}, {NOMBRES_NIVEL.get(self.nivel, self.nivel)})"
+
+class BusEventos:
+    # Distribuye eventos a los sumideros suscritos según nivel y prefijo de tipo
+    def __init__(self):
+        self._suscripciones = []  # Lista de (nivel_minimo, prefijos o None, sumidero)
+        self._nivel_minimo = SIN_SUSCRIPTORES  # Menor nivel que algún sumidero acepta
+        self._cerrojo = threading.Lock()
+
+    def suscribir(self, sumidero, nivel=INFO, tipos=None):
+        # Suscribe un sumidero (cualquier callable que reciba un Evento)
+        # nivel: nivel mínimo que recibe; tipos: prefijos de tipo aceptados (p. ej. ["producto", "stock.conflicto"])
+        # Devuelve el sumidero, para poder desuscribirlo después
+        with self._cerrojo:
+            prefijos = tuple(tipos) if tipos else None
+            self._suscripciones = self._suscripciones + [(nivel, prefijos, sumidero)]
+            self._recalcular()
+        return sumidero
+
+    def desuscribir(self, sumidero):
+        with self._cerrojo:
+            self._suscripciones = [s for s in self._suscripciones if s[2] is not sumidero]
+            self._recalcular()
+
+    def _recalcular(self):
+        self._nivel_minimo = min((s[0] for s in self._suscripciones), default=SIN_SUSCRIPTORES)
+
+    def activo(self, nivel=INFO):
+        # Indica si algún sumidero escucharía un evento de este nivel
+        # Útil para evitar calcular datos costosos antes de emitir
+        return nivel >= self._nivel_minimo
+
+    def emitir(self, tipo, plantilla, nivel=INFO, **datos):
+        # Emite un evento; si ningún sumidero acepta el nivel no se construye nada
+        if nivel < self._nivel_minimo:
+            return None
+        evento = Evento(tipo, nivel, plantilla, datos)
+        for nivel_minimo, prefijos, sumidero in self._suscripciones:
+            if nivel >= nivel_minimo and (prefijos is None or tipo.startswith(prefijos)):
+                sumidero(evento)
+        return evento
+
+bus = BusEventos()  # Bus global compartido por todos los módulos
+
+class SumideroConsola:
+    # Escribe el mensaje de cada evento en la consola (stdout por defecto, resuelto en cada escritura)
+    def __init__(self, flujo=None, mostrar_nivel=False):
+        self.flujo = flujo  # Flujo de salida; None = sys.stdout actual
+        self.mostrar_nivel = mostrar_nivel  # Si True, antepone el nivel al mensaje
+
+    def __call__(self, evento):
+        flujo = self.flujo or sys.stdout
+        if self.mostrar_nivel:
+            flujo.write(f"[{NOMBRES_NIVEL.get(evento.nivel, evento.nivel)}] {evento.mensaje}\n")
+        else:
+            flujo.write(evento.mensaje + "\n")
+
+class SumideroArchivo:
+    # Anexa eventos a un archivo acumulándolos en memoria y escribiéndolos por bloques
+    # formato: "texto" (una línea legible por evento) o "jsonl" (un objeto JSON por línea)
+    def __init__(self, ruta, tam_buffer=256, formato="texto"):
+        if formato not in ("texto", "jsonl"):
+            raise ValueError(f"Formato no válido: {formato}")
+        self.ruta = ruta
+        self.tam_buffer = tam_buffer  # Eventos acumulados antes de escribir
+        self.formato = formato
+        self._buffer = []
+        self._cerrojo = threading.Lock()
+        atexit.register(self.flush)
+
+    def __call__(self, evento):
+        if self.formato == "jsonl":
+            linea = json.dumps(evento.a_dict(), ensure_ascii=False, default=str)
+        else:
+            marca = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(evento.instante))
+            linea = f"{marca} {NOMBRES_NIVEL.get(evento.nivel, evento.nivel):<10} {evento.tipo}: {evento.mensaje}"
+        with self._cerrojo:
+            self._buffer.append(linea)
+            if len(self._buffer) >= self.tam_buffer:
+                self._escribir()
+
+    def _escribir(self):
+        if self._buffer:
+            with open(self.ruta, "a", encoding="utf-8") as archivo:
+                archivo.write("\n".join(self._buffer) + "\n")
+            self._buffer = []
+
+    def flush(self):
+        with self._cerrojo:
+            self._escribir()
+
+    def cerrar(self):
+        self.flush()
+        atexit.unregister(self.flush)
+
+class SumideroAnillo:
+    # Conserva los últimos 'capacidad' eventos en memoria (útil para pruebas, diagnósticos y la CLI)
+    def __init__(self, capacidad=1000):
+        self._eventos = deque(maxlen=capacidad)
+
+    def __call__(self, evento):
+        self._eventos.append(evento)
+
+    def eventos(self, tipo=None, nivel=None):
+        # Eventos guardados, opcionalmente filtrados por prefijo de tipo y nivel mínimo
+        return [e for e in self._eventos
+                if (tipo is None or e.tipo.startswith(tipo)) and (nivel is None or e.nivel >= nivel)]
+
+    def mensajes(self, tipo=None, nivel=None):
+        return [e.mensaje for e in self.eventos(tipo, nivel)]
+
+    def limpiar(self):
+        self._eventos.clear()
+
+    def __len__(self):
+        return len(self._eventos)
@@ -0,0 +1,261 @@
+import json
+import marshal
+import mmap
+import os
+import sqlite3
+import struct
+import zlib
+from datetime import date
+try:
+    import bd.BDSQLite as BDSQLite
+    from bd.BDSQLite import conectar_db, asegurar_versiones
+except ImportError:
+    import sys
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parent_dir = os.path.dirname(current_dir)
+    sys.path.append(parent_dir)
+    import bd.BDSQLite as BDSQLite
+    from bd.BDSQLite import conectar_db, asegurar_versiones
+from app.ModuloEventos import bus, AVISO, ERROR
+from app.ModuloProductos import ListaProductos
+from app.ModuloProveedores import ListaProveedores
+from app.ModuloClientes import ListaClientes
+from app.ModuloTransacciones import ListaTransacciones
+from app.ModuloMovimientos import ListaMovimientos
+
+# Instantánea binaria del estado cargado, para arranques rápidos
+# Formato del archivo: MAGIA (8 bytes) | largo de la cabecera (uint32 little-endian) | cabecera JSON | carga
+# La cabecera guarda, por tabla, la huella de la BD al momento de guardar (filas, MAX(rowid) y versión según
+# los triggers de VersionesTablas, que la suben con el primer cambio tras guardar) y la ubicación (inicio,
+# largo, CRC32) de su segmento en la carga.
+# Cada segmento es la lista de filas de una tabla serializada con marshal: una tabla se puede decodificar sin
+# leer las demás (carga perezosa por lista, ver app.ModuloRegistro). Al abrirla el archivo se mapea en memoria
+# (mmap): la cabecera y cada segmento se leen del mapa sin llamadas de lectura adicionales.
+# marshal no admite datetime.date: las columnas de fecha se guardan como ordinales (date.toordinal) y se
+# decodifican una sola vez al leer la instantánea.
+
+MAGIA = b"ABRTSNP1"
+VERSION_FORMATO = 3  # 2: fechas como ordinales; 3: un segmento por tabla
+
+# Tabla de la BD -> (clave en el diccionario de listas, clase de la lista)
+TABLAS = (
+    ("Productos", "productos", ListaProductos),
+    ("Proveedores", "proveedores", ListaProveedores),
+    ("Clientes", "clientes", ListaClientes),
+    ("Transacciones", "transacciones", ListaTransacciones),
+    ("Movimientos", "movimientos", ListaMovimientos),
+)
+
+# Posiciones de las columnas DATE de cada tabla (en el orden de SELECT *)
+COLUMNAS_FECHA = {"Productos": (6,), "Transacciones": (5,), "Movimientos": (2,)}
+
+def _convertir_fechas(tabla, filas, conversion):
+    # Aplica 'conversion' a las columnas de fecha no nulas de las filas de la tabla
+    posiciones = COLUMNAS_FECHA.get(tabla)
+    if not posiciones:
+        return filas
+    convertidas = []
+    for fila in filas:
+        fila = list(fila)
+        for i in posiciones:
+            if fila[i] is not None:
+                fila[i] = conversion(fila[i])
+        convertidas.append(tuple(fila))
+    return convertidas
+
+def ruta_por_defecto(contexto=None):
+    # La instantánea vive junto al archivo de la BD activa; una BD en memoria no tiene instantánea (None)
+    ruta_db = contexto.ruta if contexto else BDSQLite.nombre_db
+    return f"{ruta_db}.instantanea" if ruta_db else None
+
+def huella_tabla(cursor, tabla):
+    # Huella actual de una tabla: número de filas, MAX(rowid) y versión de modificaciones
+    fila = cursor.execute("SELECT version FROM VersionesTablas WHERE tabla = ?", (tabla,)).fetchone()
+    filas, max_rowid = cursor.execute(f"SELECT COUNT(*), MAX(rowid) FROM {tabla}").fetchone()
+    return {"filas": filas, "max_rowid": max_rowid or 0, "version": fila[0] if fila else 0}
+
+def _huellas(cursor):
+    # Huella actual de cada tabla
+    return {tabla: huella_tabla(cursor, tabla) for tabla, _, _ in TABLAS}
+
+def _leer_filas(cursor, tabla, desde_rowid=0):
+    # Filas de la tabla en orden de inserción; en Transacciones se decodifica la columna JSON de productos
+    filas = cursor.execute(f"SELECT * FROM {tabla} WHERE rowid > ? ORDER BY rowid", (desde_rowid,)).fetchall()
+    if tabla == "Transacciones":
+        decodificadas = []
+        for fila in filas:
+            try:
+                productos = json.loads(fila[3]) if fila[3] else []
+            except json.JSONDecodeError:
+                productos = []
+            decodificadas.append(fila[:3] + (productos,) + fila[4:])
+        return decodificadas
+    return filas
+
+def guardar_instantanea(ruta=None, contexto=None):
+    # Lee todas las tablas en una única transacción de lectura y escribe la instantánea de forma atómica
+    # Devuelve el tamaño en bytes del archivo escrito, o None si hubo error
+    ruta = ruta or ruta_por_defecto(contexto)
+    if not ruta: return None
+    conexion = conectar_db(contexto)
+    if not conexion: return None
+    try:
+        asegurar_versiones(conexion)
+        cursor = conexion.cursor()
+        # Huellas y filas de un mismo estado de la BD; las marcas de VersionesTablas se limpian en la misma
+        # transacción, para que el próximo UPDATE/DELETE vuelva a subir la versión
+        cursor.execute("BEGIN IMMEDIATE")
+        huellas = _huellas(cursor)
+        datos = {tabla: _leer_filas(cursor, tabla) for tabla, _, _ in TABLAS}
+        cursor.execute("UPDATE VersionesTablas SET sucia = 0 WHERE sucia = 1")
+        conexion.commit()
+    except sqlite3.Error as e:
+        conexion.rollback()
+        bus.emitir("instantanea.error", "No se pudo generar la instantánea: {error}", ERROR, ruta=ruta, error=str(e))
+        return None
+    finally:
+        conexion.close()
+    segmentos = {}
+    partes = []
+    desplazamiento = 0
+    for tabla, _, _ in TABLAS:
+        bloque = marshal.dumps(_convertir_fechas(tabla, datos[tabla], date.toordinal))
+        segmentos[tabla] = {"inicio": desplazamiento, "largo": len(bloque), "crc32": zlib.crc32(bloque)}
+        partes.append(bloque)
+        desplazamiento += len(bloque)
+    carga = b"".join(partes)
+    cabecera = json.dumps({
+        "formato": VERSION_FORMATO, "huellas": huellas, "segmentos": segmentos, "largo": len(carga)
+    }).encode("utf-8")
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "wb") as archivo:
+        archivo.write(MAGIA)
+        archivo.write(struct.pack("<I", len(cabecera)))
+        archivo.write(cabecera)
+        archivo.write(carga)
+    os.replace(temporal, ruta)
+    return len(MAGIA) + 4 + len(cabecera) + len(carga)
+
+class Instantanea:
+    # Instantánea abierta sobre el archivo mapeado en memoria: la cabecera se lee al abrir y las filas de
+    # cada tabla solo cuando se piden. cerrar() libera el mapa (antes de reemplazar el archivo)
+    def __init__(self, ruta, huellas, segmentos, inicio_carga, mapa):
+        self.ruta = ruta
+        self.huellas = huellas  # tabla -> huella de la BD al guardar
+        self._segmentos = segmentos  # tabla -> {"inicio", "largo", "crc32"} (relativos a la carga)
+        self._inicio_carga = inicio_carga  # Posición de la carga en el archivo
+        self._mapa = mapa  # mmap de solo lectura del archivo completo
+
+    def filas(self, tabla):
+        # Filas guardadas de la tabla (fechas ya decodificadas) o None si el segmento falta o está dañado
+        segmento = self._segmentos.get(tabla)
+        if not segmento:
+            return None
+        try:
+            inicio = self._inicio_carga + segmento["inicio"]
+            bloque = self._mapa[inicio:inicio + segmento["largo"]]
+            if len(bloque) != segmento["largo"] or zlib.crc32(bloque) != segmento["crc32"]:
+                bus.emitir("instantanea.invalida", "Instantánea dañada ({tabla}): se cargará desde la BD.", AVISO, ruta=self.ruta, tabla=tabla)
+                return None
+            return _convertir_fechas(tabla, marshal.loads(bloque), date.fromordinal)
+        except (OSError, ValueError, EOFError, TypeError) as e:
+            bus.emitir("instantanea.invalida", "No se pudo leer la instantánea ({tabla}): {error}", AVISO, ruta=self.ruta, tabla=tabla, error=str(e))
+            return None
+
+    def cerrar(self):
+        self._mapa.close()
+
+def abrir_instantanea(ruta=None, contexto=None):
+    # Mapea el archivo en memoria, valida el formato y lee solo la cabecera (costo constante, sin importar el
+    # tamaño del historial). Devuelve una Instantanea o None si no existe o no es válida
+    ruta = ruta or ruta_por_defecto(contexto)
+    if not ruta or not os.path.exists(ruta) or os.path.getsize(ruta) < len(MAGIA) + 4:
+        return None
+    mapa = None
+    try:
+        with open(ruta, "rb") as archivo:
+            mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)  # El mapa sigue válido al cerrar el archivo
+        if mapa[:len(MAGIA)] != MAGIA:
+            mapa.close()
+            return None
+        largo_cabecera = struct.unpack_from("<I", mapa, len(MAGIA))[0]
+        inicio_carga = len(MAGIA) + 4 + largo_cabecera
+        cabecera = json.loads(mapa[len(MAGIA) + 4:inicio_carga].decode("utf-8"))
+        if cabecera.get("formato") != VERSION_FORMATO:
+            mapa.close()
+            return None
+        if len(mapa) < inicio_carga + cabecera["largo"]:
+            bus.emitir("instantanea.invalida", "Instantánea incompleta: se cargará desde la BD.", AVISO, ruta=ruta)
+            mapa.close()
+            return None
+        return Instantanea(ruta, cabecera["huellas"], cabecera["segmentos"], inicio_carga, mapa)
+    except (OSError, ValueError, struct.error, KeyError, TypeError) as e:
+        if mapa is not None:
+            mapa.close()
+        bus.emitir("instantanea.invalida", "No se pudo leer la instantánea: {error}", AVISO, ruta=ruta, error=str(e))
+        return None
+
+def leer_instantanea(ruta=None, contexto=None):
+    # Lee la instantánea completa. Devuelve (huellas, datos) o None si no existe o está dañada
+    instantanea = abrir_instantanea(ruta, contexto)
+    if not instantanea:
+        return None
+    try:
+        datos = {}
+        for tabla, _, _ in TABLAS:
+            datos[tabla] = instantanea.filas(tabla)
+            if datos[tabla] is None:
+                return None
+        return instantanea.huellas, datos
+    finally:
+        instantanea.cerrar()
+
+def filas_tabla(cursor, tabla, instantanea, actual):
+    # Filas con las que cargar la lista de una tabla, usando la instantánea cuando es válida
+    # Si la huella coincide se usan las filas guardadas; si la tabla solo creció (misma versión) se leen
+    # únicamente las filas nuevas (rowid > MAX(rowid) guardado); en otro caso se lee la tabla completa.
+    # actual: huella actual de la tabla (huella_tabla), leída en la misma transacción que 'cursor'
+    # Devuelve (filas, desactualizada); desactualizada indica que conviene regenerar la instantánea
+    previa = instantanea.huellas.get(tabla) if instantanea else None
+    creció = bool(previa) and previa["version"] == actual["version"] and actual["max_rowid"] >= previa["max_rowid"]
+    guardadas = instantanea.filas(tabla) if previa == actual or creció else None
+    if guardadas is not None and previa == actual:
+        return guardadas, False
+    if guardadas is not None:
+        delta = _leer_filas(cursor, tabla, previa["max_rowid"])
+        if previa["filas"] + len(delta) == actual["filas"]:
+            return guardadas + delta, True
+    return _leer_filas(cursor, tabla), True
+
+def cargar_listas(ruta=None, guardar=False, contexto=None):
+    # Construye las cinco listas usando la instantánea cuando es válida
+    # Por tabla: si la huella coincide se usan las filas guardadas; si la tabla solo creció (misma versión)
+    # se leen únicamente las filas nuevas (rowid > MAX(rowid) guardado); en otro caso se recarga la tabla.
+    # guardar: si True y la instantánea estaba desactualizada, se regenera al terminar
+    # contexto: ContextoBD opcional con el que se crean las listas
+    # Devuelve un diccionario {"productos": ListaProductos, "proveedores": ..., "movimientos": ...}
+    listas = {clave: clase(cargar=False, contexto=contexto) for _, clave, clase in TABLAS}
+    conexion = conectar_db(contexto)
+    if not conexion: return listas
+    instantanea = abrir_instantanea(ruta, contexto)
+    desactualizada = instantanea is None
+    try:
+        asegurar_versiones(conexion)
+        cursor = conexion.cursor()
+        cursor.execute("BEGIN")
+        for tabla, clave, _ in TABLAS:
+            filas, cambio = filas_tabla(cursor, tabla, instantanea, huella_tabla(cursor, tabla))
+            desactualizada = desactualizada or cambio
+            listas[clave]._cargar_filas(filas)
+        conexion.rollback()
+    except sqlite3.Error as e:
+        bus.emitir("instantanea.error", "Error al validar la instantánea, se carga desde la BD: {error}", ERROR, error=str(e))
+        for _, clave, clase in TABLAS:
+            listas[clave] = clase(contexto=contexto)
+    finally:
+        conexion.close()
+        if instantanea:
+            instantanea.cerrar()
+    if desactualizada and guardar:
+        guardar_instantanea(ruta, contexto)
+    return listas
@@ -0,0 +1,321 @@
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date
+from itertools import islice
+try:
+    import pyarrow as pa  # Opcional: formato columnar Parquet
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+try:
+    from bd.BDSQLite import conectar_db, asegurar_columnas_politica
+except ImportError:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parent_dir = os.path.dirname(current_dir)
+    sys.path.append(parent_dir)
+    from bd.BDSQLite import conectar_db, asegurar_columnas_politica
+from app.ModuloEventos import bus, AVISO, ERROR
+from app.ModuloMetricas import medir
+
+# Exportación e importación masiva de todas las tablas (un archivo por tabla: <Tabla>.csv, .jsonl o .parquet)
+# Las filas viajan por bloques de tamano_bloque: fetchmany al exportar y executemany al importar, de modo que
+# la memoria usada no depende del tamaño del historial.
+# - Exportar lee todas las tablas en una sola transacción de lectura (un mismo estado de la BD).
+# - Importar escribe todas las tablas en una sola transacción: las claves foráneas se verifican en bloque al
+#   final (PRAGMA foreign_key_check) y, si alguna fila apunta a un padre inexistente, no se importa nada.
+# En CSV, NULL se escribe como \N para distinguirlo del texto vacío; las fechas van en ISO y los booleanos como 0/1.
+
+TABLAS_INTERCAMBIO = ("Proveedores", "Productos", "Clientes", "Transacciones", "Movimientos", "Rotaciones")  # Padres antes que hijos
+FORMATOS = ("csv", "jsonl", "parquet")
+TAMANO_BLOQUE = 5000  # Filas por fetchmany / executemany
+NULO_CSV = "\\N"
+MAX_VIOLACIONES = 10  # Violaciones de claves foráneas que se informan al rechazar una importación
+
+def formatos_disponibles():
+    # Formatos utilizables en esta instalación (parquet requiere pyarrow)
+    return [f for f in FORMATOS if f != "parquet" or pq is not None]
+
+def ruta_tabla(directorio, tabla, formato):
+    return os.path.join(directorio, f"{tabla}.{formato}")
+
+def _columnas(cursor, tabla):
+    # [(nombre, tipo declarado)] de la tabla en orden; vacía si la tabla no existe
+    return [(fila[1], (fila[2] or "").upper()) for fila in cursor.execute(f"PRAGMA table_info({tabla})").fetchall()]
+
+def _bloques(filas, tamano):
+    # Parte un iterable de filas en listas de 'tamano' filas sin materializarlo entero
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, tamano))
+        if not bloque:
+            return
+        yield bloque
+
+def _a_json(valor):
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+# --- Escritores (un bloque de filas por llamada) ---
+
+class _EscritorCSV:
+    def __init__(self, ruta, columnas):
+        self._archivo = open(ruta, "w", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._archivo)
+        self._csv.writerow([nombre for nombre, _ in columnas])
+
+    def escribir(self, filas):
+        self._csv.writerows(
+            [NULO_CSV if v is None else int(v) if isinstance(v, bool) else v for v in fila] for fila in filas
+        )
+
+    def cerrar(self):
+        self._archivo.close()
+
+class _EscritorJSONL:
+    def __init__(self, ruta, columnas):
+        self._archivo = open(ruta, "w", encoding="utf-8")
+        self._nombres = [nombre for nombre, _ in columnas]
+
+    def escribir(self, filas):
+        self._archivo.write("".join(
+            json.dumps(dict(zip(self._nombres, fila)), ensure_ascii=False, default=_a_json) + "\n" for fila in filas
+        ))
+
+    def cerrar(self):
+        self._archivo.close()
+
+class _EscritorParquet:
+    # Tipos de la columna según su tipo declarado en SQLite
+    def __init__(self, ruta, columnas):
+        tipos = {"INTEGER": pa.int64(), "REAL": pa.float64(), "BOOLEAN": pa.bool_(), "DATE": pa.date32()}
+        self._esquema = pa.schema([(nombre, tipos.get(tipo, pa.string())) for nombre, tipo in columnas])
+        self._escritor = pq.ParquetWriter(ruta, self._esquema)
+
+    def escribir(self, filas):
+        columnas = list(zip(*filas))
+        self._escritor.write_batch(pa.record_batch(
+            [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, self._esquema)], schema=self._esquema
+        ))
+
+    def cerrar(self):
+        self._escritor.close()
+
+ESCRITORES = {"csv": _EscritorCSV, "jsonl": _EscritorJSONL, "parquet": _EscritorParquet}
+
+# --- Lectores: devuelven (columnas, generador de filas) ---
+
+def _leer_csv(ruta, tamano_bloque):
+    archivo = open(ruta, newline="", encoding="utf-8")
+    lector = csv.reader(archivo)
+    columnas = next(lector, [])
+    def filas():
+        with archivo:
+            for fila in lector:
+                yield tuple(None if v == NULO_CSV else v for v in fila)
+    return columnas, filas()
+
+def _leer_jsonl(ruta, tamano_bloque):
+    archivo = open(ruta, encoding="utf-8")
+    primera = archivo.readline()
+    columnas = list(json.loads(primera)) if primera.strip() else []
+    def filas():
+        with archivo:
+            if columnas:
+                yield tuple(json.loads(primera).get(c) for c in columnas)
+            for linea in archivo:
+                if linea.strip():
+                    objeto = json.loads(linea)
+                    yield tuple(objeto.get(c) for c in columnas)
+    return columnas, filas()
+
+def _leer_parquet(ruta, tamano_bloque):
+    archivo = pq.ParquetFile(ruta)
+    columnas = archivo.schema_arrow.names
+    def filas():
+        for lote in archivo.iter_batches(batch_size=tamano_bloque):
+            yield from zip(*(lote.column(i).to_pylist() for i in range(lote.num_columns)))
+    return columnas, filas()
+
+LECTORES = {"csv": _leer_csv, "jsonl": _leer_jsonl, "parquet": _leer_parquet}
+
+def _validar_formato(formato):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no válido: {formato} (use {', '.join(FORMATOS)})")
+    if formato == "parquet" and pq is None:
+        raise ValueError("El formato parquet requiere pyarrow (pip install pyarrow)")
+
+# --- Exportación ---
+
+@medir("intercambio.exportar")
+def exportar(directorio, formato="csv", tablas=None, contexto=None, tamano_bloque=TAMANO_BLOQUE, progreso=None):
+    # Escribe cada tabla en directorio/<Tabla>.<formato>
+    # tablas: tablas a exportar (por defecto, todas); las que no existan en la BD se omiten
+    # progreso: función (tabla, filas escritas hasta ahora, fin) llamada tras cada bloque (fin=False) y al
+    #   terminar cada tabla (fin=True)
+    # Devuelve {tabla: filas exportadas}, o None si hubo error
+    _validar_formato(formato)
+    os.makedirs(directorio, exist_ok=True)
+    conexion = conectar_db(contexto)
+    if not conexion: return None
+    inicio = time.perf_counter()
+    conteos = {}
+    try:
+        cursor = conexion.cursor()
+        cursor.execute("BEGIN")  # Todas las tablas de un mismo estado de la BD
+        for tabla in tablas or TABLAS_INTERCAMBIO:
+            columnas = _columnas(cursor, tabla)
+            if not columnas:
+                continue
+            ruta = ruta_tabla(directorio, tabla, formato)
+            temporal = f"{ruta}.tmp"
+            escritor = ESCRITORES[formato](temporal, columnas)
+            total = 0
+            try:
+                cursor.execute(f"SELECT {', '.join(n for n, _ in columnas)} FROM {tabla} ORDER BY rowid")
+                while True:
+                    filas = cursor.fetchmany(tamano_bloque)
+                    if not filas:
+                        break
+                    escritor.escribir(filas)
+                    total += len(filas)
+                    if progreso:
+                        progreso(tabla, total, False)
+            finally:
+                escritor.cerrar()
+            os.replace(temporal, ruta)  # Un archivo a medio escribir nunca reemplaza a uno completo
+            conteos[tabla] = total
+            if progreso:
+                progreso(tabla, total, True)
+        conexion.rollback()
+    except (sqlite3.Error, OSError) as e:
+        bus.emitir("intercambio.error", "Error al exportar a {directorio}: {error}", ERROR, directorio=directorio, error=str(e))
+        return None
+    finally:
+        conexion.close()
+    bus.emitir("intercambio.exportado", "{filas} fila(s) de {tablas} tabla(s) exportadas a {directorio} ({formato}) en {segundos:.2f} s.",
+               filas=sum(conteos.values()), tablas=len(conteos), directorio=directorio, formato=formato, segundos=time.perf_counter() - inicio)
+    return conteos
+
+# --- Importación ---
+
+@medir("intercambio.importar")
+def importar(directorio, formato="csv", tablas=None, contexto=None, reemplazar=False, tamano_bloque=TAMANO_BLOQUE, progreso=None):
+    # Inserta en la BD las filas de directorio/<Tabla>.<formato>, todo en una transacción
+    # tablas: tablas a importar (por defecto, todas las que tengan archivo en el directorio)
+    # reemplazar: si True, vacía antes las tablas importadas (de hijas a padres)
+    # progreso: función (tabla, filas insertadas hasta ahora, fin), como en exportar
+    # Devuelve {tabla: filas importadas}, o None si se rechazó (claves foráneas, restricciones) o hubo error
+    _validar_formato(formato)
+    if tablas is None:
+        tablas = [t for t in TABLAS_INTERCAMBIO if os.path.exists(ruta_tabla(directorio, t, formato))]
+    faltantes = [t for t in tablas if not os.path.exists(ruta_tabla(directorio, t, formato))]
+    if faltantes or not tablas:
+        bus.emitir("intercambio.rechazado", "Importación rechazada: faltan archivos {formato} en {directorio} ({tablas}).", AVISO,
+                   formato=formato, directorio=directorio, tablas=", ".join(faltantes) or "ninguna tabla")
+        return None
+    tablas = sorted(tablas, key=lambda t: TABLAS_INTERCAMBIO.index(t) if t in TABLAS_INTERCAMBIO else len(TABLAS_INTERCAMBIO))
+    conexion = conectar_db(contexto)
+    if not conexion: return None
+    inicio = time.perf_counter()
+    conteos = {}
+    try:
+        if "Productos" in tablas:
+            asegurar_columnas_politica(conexion)  # Los archivos pueden traer stock_objetivo / umbral_stock
+        cursor = conexion.cursor()
+        cursor.execute("PRAGMA foreign_keys = OFF")  # Se verifican en bloque al final, no fila por fila
+        cursor.execute("BEGIN")
+        if reemplazar:
+            for tabla in reversed(tablas):
+                cursor.execute(f"DELETE FROM {tabla}")
+        for tabla in tablas:
+            existentes = {nombre for nombre, _ in _columnas(cursor, tabla)}
+            columnas, filas = LECTORES[formato](ruta_tabla(directorio, tabla, formato), tamano_bloque)
+            desconocidas = [c for c in columnas if c not in existentes]
+            if not existentes or desconocidas:
+                filas.close()
+                conexion.rollback()
+                bus.emitir("intercambio.rechazado", "Importación rechazada: {tabla} no coincide con la BD (columnas {columnas}).", AVISO,
+                           tabla=tabla, columnas=", ".join(desconocidas) or "-")
+                return None
+            total = 0
+            if columnas:
+                sql = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})"
+                for bloque in _bloques(filas, tamano_bloque):
+                    cursor.executemany(sql, bloque)
+                    total += len(bloque)
+                    if progreso:
+                        progreso(tabla, total, False)
+            conteos[tabla] = total
+            if progreso:
+                progreso(tabla, total, True)
+        violaciones = cursor.execute("PRAGMA foreign_key_check").fetchmany(MAX_VIOLACIONES)
+        if violaciones:
+            conexion.rollback()
+            detalle = "; ".join(f"{tabla} rowid {rowid} -> {padre}" for tabla, rowid, padre, _ in violaciones)
+            bus.emitir("intercambio.rechazado", "Importación rechazada: filas que apuntan a registros inexistentes ({detalle}).", AVISO, detalle=detalle)
+            return None
+        conexion.commit()
+    except (sqlite3.IntegrityError, ValueError, csv.Error) as e:  # CHECK, UNIQUE o NOT NULL, o archivo mal formado
+        conexion.rollback()
+        bus.emitir("intercambio.rechazado", "Importación rechazada: {error}", AVISO, error=str(e))
+        return None
+    except (sqlite3.Error, OSError) as e:
+        conexion.rollback()
+        bus.emitir("intercambio.error", "Error al importar desde {directorio}: {error}", ERROR, directorio=directorio, error=str(e))
+        return None
+    finally:
+        conexion.close()
+    bus.emitir("intercambio.importado", "{filas} fila(s) de {tablas} tabla(s) importadas desde {directorio} ({formato}) en {segundos:.2f} s.",
+               filas=sum(conteos.values()), tablas=len(conteos), directorio=directorio, formato=formato, segundos=time.perf_counter() - inicio)
+    return conteos
+
+class ProgresoConsola:
+    # Función de progreso para exportar/importar: una línea por tabla, reescrita con cada bloque
+    def __init__(self):
+        self.abierta = False  # Hay una línea de progreso sin terminar
+
+    def __call__(self, tabla, filas, fin):
+        print(f"\r  {tabla}: {filas} filas", end="\n" if fin else "", flush=True)
+        self.abierta = not fin
+
+    def terminar(self):
+        # Cierra la línea de una tabla interrumpida (error a mitad de la exportación o importación)
+        if self.abierta:
+            print()
+            self.abierta = False
+
+def main():
+    import argparse
+    from bd.BDSQLite import ContextoBD
+    from app.ModuloEventos import SumideroConsola
+    parser = argparse.ArgumentParser(description="Exportación e importación masiva de las tablas del sistema")
+    parser.add_argument("accion", choices=("exportar", "importar"))
+    parser.add_argument("directorio", help="Directorio con un archivo por tabla")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--bd", default=None, help="BD de origen/destino (por defecto, la del sistema)")
+    parser.add_argument("--tablas", nargs="+", default=None, help="Solo estas tablas")
+    parser.add_argument("--reemplazar", action="store_true", help="Al importar, vacía antes las tablas")
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE, help="Filas por fetchmany / executemany")
+    args = parser.parse_args()
+    bus.suscribir(SumideroConsola())
+    contexto = ContextoBD(args.bd) if args.bd else None
+    progreso = ProgresoConsola()
+    try:
+        if args.accion == "exportar":
+            conteos = exportar(args.directorio, args.formato, args.tablas, contexto, args.bloque, progreso)
+        else:
+            conteos = importar(args.directorio, args.formato, args.tablas, contexto, args.reemplazar, args.bloque, progreso)
+    except ValueError as e:
+        print(e)
+        return 1
+    finally:
+        progreso.terminar()
+    return 0 if conteos is not None else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import csv
+import functools
+import json
+import math
+import os
+import threading
+import time
+try:
+    import bd.BDSQLite as BDSQLite
+except ImportError:
+    import sys
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parent_dir = os.path.dirname(current_dir)
+    sys.path.append(parent_dir)
+    import bd.BDSQLite as BDSQLite
+
+# Registro de métricas de rendimiento de la capa de datos
+# - Por operación (método decorado con @medir): llamadas, errores, latencia (total, mín., máx. e histograma),
+#   sentencias SQL ejecutadas (idas y vueltas a la BD) y nodos de lista recorridos
+# - Contadores globales: sentencias SQL, filas cargadas por tabla, nodos recorridos
+# Se puede apagar por completo con metricas.desactivar() o con la variable de entorno ABARROTERIA_METRICAS=0
+
+CUBETAS = 32  # Cubetas del histograma: la cubeta k cubre latencias de hasta 2**k microsegundos
+
+def _cubeta(segundos):
+    microsegundos = segundos * 1e6
+    if microsegundos <= 1:
+        return 0
+    return min(CUBETAS - 1, math.ceil(math.log2(microsegundos)))
+
+def percentil(valores, p):
+    # Percentil p (0-100) de una muestra por rango más cercano: el menor valor con al menos p% de la muestra
+    # en o por debajo (la misma regla que EstadisticaOperacion.percentil). Es monótono en p: p5 <= p50 <= p95
+    # con cualquier tamaño de muestra. Devuelve 0.0 si no hay valores
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(len(ordenados) * p / 100) - 1)]
+
+class EstadisticaOperacion:
+    # Acumulados de una operación instrumentada
+    __slots__ = ("llamadas", "errores", "total_s", "min_s", "max_s", "cubetas", "sentencias", "nodos")
+
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0  # Llamadas que terminaron con una excepción
+        self.total_s = 0.0
+        self.min_s = float("inf")
+        self.max_s = 0.0
+        self.cubetas = [0] * CUBETAS  # Histograma logarítmico de latencias
+        self.sentencias = 0  # Sentencias SQL ejecutadas dentro de la operación
+        self.nodos = 0  # Nodos de lista recorridos dentro de la operación
+
+    def percentil(self, p):
+        # Estimación del percentil p (0-100) a partir del histograma: límite superior de la cubeta
+        if not self.llamadas:
+            return 0.0
+        objetivo = math.ceil(self.llamadas * p / 100)
+        acumulado = 0
+        for k, cantidad in enumerate(self.cubetas):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return min(self.max_s, (2 ** k) / 1e6)
+        return self.max_s
+
+    def a_dict(self):
+        llamadas = self.llamadas or 1
+        return {
+            "llamadas": self.llamadas,
+            "errores": self.errores,
+            "total_ms": round(self.total_s * 1000, 3),
+            "media_ms": round(self.total_s / llamadas * 1000, 4),
+            "min_ms": round(self.min_s * 1000, 4) if self.llamadas else 0.0,
+            "p50_ms": round(self.percentil(50) * 1000, 4),
+            "p95_ms": round(self.percentil(95) * 1000, 4),
+            "p99_ms": round(self.percentil(99) * 1000, 4),
+            "max_ms": round(self.max_s * 1000, 4),
+            "sentencias_por_llamada": round(self.sentencias / llamadas, 2),
+            "nodos_por_llamada": round(self.nodos / llamadas, 1),
+        }
+
+class RegistroMetricas:
+    def __init__(self, activo=True):
+        self.activo = activo  # Interruptor general: si es False, la instrumentación no hace nada
+        self.inicio = time.time()  # Desde cuándo se acumulan las métricas
+        self._operaciones = {}  # nombre -> EstadisticaOperacion
+        self._contadores = {}  # nombre -> entero
+        self._cerrojo = threading.Lock()
+        self._local = threading.local()  # Pila de operaciones en curso del hilo (para atribuir sentencias y nodos)
+
+    # --- Interruptor ---
+
+    def activar(self):
+        self.activo = True
+
+    def desactivar(self):
+        self.activo = False
+
+    def reiniciar(self):
+        with self._cerrojo:
+            self._operaciones = {}
+            self._contadores = {}
+            self.inicio = time.time()
+
+    # --- Registro ---
+
+    def incrementar(self, nombre, cantidad=1):
+        if not self.activo:
+            return
+        with self._cerrojo:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + cantidad
+
+    def filas_cargadas(self, tabla, cantidad):
+        self.incrementar(f"filas_cargadas.{tabla}", cantidad)
+
+    def nodos_recorridos(self, cantidad):
+        # Nodos de lista recorridos por una consulta; se atribuyen también a la operación en curso
+        if not self.activo:
+            return
+        self.incrementar("nodos_recorridos", cantidad)
+        pila = getattr(self._local, "pila", None)
+        if pila:
+            pila[-1][1] += cantidad
+
+    def _sentencia(self, _sql):
+        # Callback de sqlite3 (set_trace_callback): una llamada por sentencia ejecutada
+        if not self.activo:
+            return
+        self.incrementar("sentencias_sql")
+        pila = getattr(self._local, "pila", None)
+        if pila:
+            pila[-1][0] += 1
+
+    def preparar_conexion(self, conexion):
+        # Gancho para cada conexión nueva de bd.BDSQLite: cuenta las idas y vueltas a la BD
+        if self.activo:
+            conexion.set_trace_callback(self._sentencia)
+
+    def _registrar(self, nombre, duracion, sentencias, nodos, error):
+        with self._cerrojo:
+            est = self._operaciones.get(nombre)
+            if est is None:
+                est = self._operaciones[nombre] = EstadisticaOperacion()
+            est.llamadas += 1
+            est.errores += error
+            est.total_s += duracion
+            est.min_s = min(est.min_s, duracion)
+            est.max_s = max(est.max_s, duracion)
+            est.cubetas[_cubeta(duracion)] += 1
+            est.sentencias += sentencias
+            est.nodos += nodos
+
+    def medir(self, nombre):
+        # Decorador: mide latencia, sentencias SQL y nodos recorridos de cada llamada a la función
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                if not self.activo:
+                    return funcion(*args, **kwargs)
+                pila = getattr(self._local, "pila", None)
+                if pila is None:
+                    pila = self._local.pila = []
+                marca = [0, 0]  # [sentencias, nodos] de esta llamada
+                pila.append(marca)
+                error = 0
+                inicio = time.perf_counter()
+                try:
+                    return funcion(*args, **kwargs)
+                except BaseException:
+                    error = 1
+                    raise
+                finally:
+                    duracion = time.perf_counter() - inicio
+                    pila.pop()
+                    if pila:
+                        # Las sentencias y nodos de una operación anidada también cuentan para la externa
+                        pila[-1][0] += marca[0]
+                        pila[-1][1] += marca[1]
+                    self._registrar(nombre, duracion, marca[0], marca[1], error)
+            return envoltura
+        return decorador
+
+    # --- Consulta y exportación ---
+
+    def instantanea(self):
+        # Copia serializable del estado actual de las métricas
+        with self._cerrojo:
+            operaciones = {nombre: est.a_dict() for nombre, est in sorted(self._operaciones.items())}
+            contadores = dict(sorted(self._contadores.items()))
+        return {
+            "activo": self.activo,
+            "desde": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.inicio)),
+            "segundos": round(time.time() - self.inicio, 1),
+            "operaciones": operaciones,
+            "contadores": contadores,
+        }
+
+    def exportar(self, ruta, formato=None):
+        # Exporta las métricas a JSON (completo) o CSV (una fila por operación)
+        # formato: "json" o "csv"; por defecto se deduce de la extensión de la ruta
+        formato = formato or ("csv" if ruta.lower().endswith(".csv") else "json")
+        datos = self.instantanea()
+        if formato == "json":
+            with open(ruta, "w", encoding="utf-8") as archivo:
+                json.dump(datos, archivo, indent=2, ensure_ascii=False)
+        elif formato == "csv":
+            columnas = list(EstadisticaOperacion().a_dict())
+            with open(ruta, "w", encoding="utf-8", newline="") as archivo:
+                escritor = csv.writer(archivo)
+                escritor.writerow(["operacion"] + columnas)
+                for nombre, fila in datos["operaciones"].items():
+                    escritor.writerow([nombre] + [fila[c] for c in columnas])
+                for nombre, valor in datos["contadores"].items():
+                    escritor.writerow([nombre, valor] + [""] * (len(columnas) - 1))
+        else:
+            raise ValueError(f"Formato no válido: {formato}")
+        return ruta
+
+    def resumen_texto(self):
+        # Tabla legible para la consola
+        datos = self.instantanea()
+        lineas = [
+            f"Métricas {'activas' if datos['activo'] else 'DESACTIVADAS'} desde {datos['desde']} ({datos['segundos']}s)",
+            f"{'Operación':<38}{'llamadas':>9}{'media ms':>10}{'p95 ms':>10}{'máx ms':>10}{'SQL/llam':>10}{'nodos/llam':>12}",
+        ]
+        for nombre, op in datos["operaciones"].items():
+            lineas.append(f"{nombre:<38}{op['llamadas']:>9}{op['media_ms']:>10.3f}{op['p95_ms']:>10.3f}"
+                          f"{op['max_ms']:>10.3f}{op['sentencias_por_llamada']:>10.2f}{op['nodos_por_llamada']:>12.1f}")
+        if datos["contadores"]:
+            lineas.append("Contadores:")
+            for nombre, valor in datos["contadores"].items():
+                lineas.append(f"  {nombre:<36}{valor:>12}")
+        return "\n".join(lineas)
+
+metricas = RegistroMetricas(activo=os.environ.get("ABARROTERIA_METRICAS", "1") != "0")  # Registro global
+medir = metricas.medir
+BDSQLite.ganchos_conexion.append(metricas.preparar_conexion)
@@ -2,20 +2,23 @@ from datetime import date
 import sqlite3
 import os
 try:
-    from bd.BDSQLite import conectar_db
+    from bd.BDSQLite import conectar_db, a_fecha
 except ImportError:
     import sys
     current_dir = os.path.dirname(os.path.abspath(__file__))
     parent_dir = os.path.dirname(current_dir)
     sys.path.append(parent_dir)
-    from bd.BDSQLite import conectar_db
+    from bd.BDSQLite import conectar_db, a_fecha
+from app.ModuloConsultas import BackendSQL, elegir_backend, BACKEND_SQL
+from app.ModuloEventos import bus
+from app.ModuloMetricas import metricas, medir
 
 class Movimiento:
     # Modelo de movimiento de inventario
     def __init__(self, id_estado, id_transaccion, fecha, tipo):
         self.id_estado = id_estado  # Identificador único del movimiento en la BD (PK)
         self.id_transaccion = id_transaccion  # ID de la transacción asociada (FK a Transacciones)
-        self.fecha = fecha  # Fecha del movimiento (string ISO o date)
+        self.fecha = fecha  # Fecha del movimiento (datetime.date)
         self.tipo = tipo  # Tipo de movimiento: "compra", "venta", etc.
 
 class NodoMovimiento:
@@ -27,52 +30,106 @@ class NodoMovimiento:
 
 class ListaMovimientos:
     # Lista doblemente enlazada de movimientos con sincronización a BD
-    def __init__(self):
+    def __init__(self, cargar=True, contexto=None):
+        # cargar: si False, la lista se crea vacía (p. ej. para poblarla desde una instantánea)
+        # contexto: ContextoBD opcional (ruta, URI o ":memory:"); sin él se usa la BD configurada
+        self.contexto = contexto
         self.raiz = None  # Nodo raíz (inicio) de la lista de movimientos
-        self._cargar_desde_db()
+        self.cola = None  # Último nodo de la lista (inserción O(1) al final)
+        self._largo = 0  # Número de nodos (len() en O(1))
+        self.consultas_sql = BackendSQL(self.contexto)  # Backend para consultas empujadas a SQLite
+        self.diario = None  # DiarioEscritura opcional (modo de escritura diferida)
+        self._observadores = []  # Funciones (movimiento, signo) avisadas tras cada alta o baja confirmada
+        if cargar:
+            self._cargar_desde_db()
 
+    @medir("movimientos.cargar")
     def _cargar_desde_db(self):
         # Carga movimientos desde la base de datos
-        self.raiz = None
-        conexion = conectar_db()
+        if self.diario:
+            self.diario.flush()  # La BD debe reflejar lo pendiente antes de recargar
+        conexion = conectar_db(self.contexto)
         if not conexion: return
         try:
             cursor = conexion.cursor()
             cursor.execute("SELECT * FROM Movimientos")
-            filas = cursor.fetchall()
-            for fila in filas:
-                # fila[0]: id_estado (PK), fila[1]: id_transaccion (FK), fila[2]: fecha, fila[3]: tipo
-                movimiento = Movimiento(
-                    id_estado=fila[0],  # ID único del movimiento (clave primaria en la tabla)
-                    id_transaccion=fila[1],  # ID de la transacción asociada (clave foránea)
-                    fecha=fila[2],  # Fecha del movimiento (string en formato ISO)
-                    tipo=fila[3]  # Tipo de movimiento: "compra", "venta", etc.
-                )
-                self._agregar_nodo(movimiento)
+            self._cargar_filas(cursor.fetchall())
+            self._notificar(None, 0)  # Recarga completa: los observadores deben reconstruir su estado
         except sqlite3.Error as e:
             pass
         finally:
             if conexion: conexion.close()
 
+    def _cargar_filas(self, filas, reiniciar=True):
+        # Construye la lista a partir de filas de la tabla Movimientos (BD o instantánea)
+        # reiniciar: si False, las filas se anexan a la lista existente (carga incremental)
+        if reiniciar:
+            self.raiz = None
+            self.cola = None
+            self._largo = 0
+        metricas.filas_cargadas("Movimientos", len(filas))
+        for fila in filas:
+            # fila[0]: id_estado (PK), fila[1]: id_transaccion (FK), fila[2]: fecha, fila[3]: tipo
+            movimiento = Movimiento(
+                id_estado=fila[0],  # ID único del movimiento (clave primaria en la tabla)
+                id_transaccion=fila[1],  # ID de la transacción asociada (clave foránea)
+                fecha=fila[2],  # Fecha del movimiento (date, decodificada al leer la fila)
+                tipo=fila[3]  # Tipo de movimiento: "compra", "venta", etc.
+            )
+            self._agregar_nodo(movimiento)
+
+    def suscribir_movimientos(self, funcion):
+        # Registra un observador llamado como funcion(movimiento, signo) tras cada cambio confirmado:
+        # signo 1 = movimiento registrado, -1 = movimiento eliminado; (None, 0) = la lista se recargó por completo
+        # Devuelve la función para poder desuscribirla
+        self._observadores.append(funcion)
+        return funcion
+
+    def desuscribir_movimientos(self, funcion):
+        if funcion in self._observadores:
+            self._observadores.remove(funcion)
+
+    def _notificar(self, movimiento, signo):
+        for funcion in self._observadores:
+            funcion(movimiento, signo)
+
     def _agregar_nodo(self, movimiento):
         # Agrega un nodo a la lista
         nuevo_nodo = NodoMovimiento(movimiento)
         if self.raiz is None:
             self.raiz = nuevo_nodo
         else:
-            nodo_actual = self.raiz
-            while nodo_actual.siguiente:
-                nodo_actual = nodo_actual.siguiente
-            nodo_actual.siguiente = nuevo_nodo
-            nuevo_nodo.anterior = nodo_actual
+            self.cola.siguiente = nuevo_nodo
+            nuevo_nodo.anterior = self.cola
+        self.cola = nuevo_nodo
+        self._largo += 1
         return nuevo_nodo
 
+    def __len__(self):
+        return self._largo
+
+    def __iter__(self):
+        # Recorre los movimientos en orden de inserción sin construir listas intermedias
+        nodo_actual = self.raiz
+        while nodo_actual:
+            yield nodo_actual.movimiento
+            nodo_actual = nodo_actual.siguiente
+
+    @medir("movimientos.registrar_movimiento")
     def registrar_movimiento(self, id_transaccion, fecha, tipo):
         # Registra un movimiento en la BD y la lista
         # id_transaccion: ID de la transacción asociada (compra/venta)
-        # fecha: fecha del movimiento (string ISO)
+        # fecha: fecha del movimiento (date o texto ISO; se guarda en memoria como date)
         # tipo: tipo de movimiento ("compra", "venta", etc.)
-        conexion = conectar_db()
+        fecha = a_fecha(fecha)
+        if self.diario:
+            id_estado = self.diario.siguiente_id("Movimientos", "id_estado")
+            self.diario.insertar("Movimientos", {"id_estado": id_estado, "id_transaccion": id_transaccion, "fecha": fecha, "tipo": tipo})
+            nuevo_nodo = self._agregar_nodo(Movimiento(id_estado, id_transaccion, fecha, tipo))
+            bus.emitir("movimiento.registrado", "Movimiento registrado con ID: {id_estado} para transacción ID: {id_transaccion}", id_estado=id_estado, id_transaccion=id_transaccion)
+            self._notificar(nuevo_nodo.movimiento, 1)
+            return nuevo_nodo.movimiento
+        conexion = conectar_db(self.contexto)
         if not conexion: return None
         try:
             cursor = conexion.cursor()
@@ -84,7 +141,8 @@ class ListaMovimientos:
             conexion.commit()
             movimiento = Movimiento(id_estado, id_transaccion, fecha, tipo)
             nuevo_nodo = self._agregar_nodo(movimiento)
-            print(f"Movimiento registrado con ID: {id_estado} para transacción ID: {id_transaccion}")
+            bus.emitir("movimiento.registrado", "Movimiento registrado con ID: {id_estado} para transacción ID: {id_transaccion}", id_estado=id_estado, id_transaccion=id_transaccion)
+            self._notificar(movimiento, 1)
             return nuevo_nodo.movimiento
         except sqlite3.Error as e:
             if conexion: conexion.rollback()
@@ -92,77 +150,116 @@ class ListaMovimientos:
         finally:
             if conexion: conexion.close()
 
+    def aplicar_movimiento_confirmado(self, movimiento):
+        # Agrega a la lista un movimiento que otro módulo ya escribió en la BD (p. ej. una compra del
+        # planificador de reabastecimiento) y avisa a los observadores igual que registrar_movimiento
+        nuevo_nodo = self._agregar_nodo(movimiento)
+        self._notificar(movimiento, 1)
+        return nuevo_nodo.movimiento
+
+    @medir("movimientos.resumen_movimientos_por_rango")
     def resumen_movimientos_por_rango(self, fecha_inicio, fecha_fin, tipo=None):
         # Resumen de movimientos entre dos fechas y tipo
-        # fecha_inicio, fecha_fin: strings ISO o date
+        # fecha_inicio, fecha_fin: strings ISO o date (se convierten una vez; las fechas de la lista ya son date)
         # tipo: filtra por tipo de movimiento si se especifica
-        from datetime import date
-        def parse_fecha(f):
-            if isinstance(f, date):
-                return f
-            return date.fromisoformat(f)
-        fecha_inicio = parse_fecha(fecha_inicio)
-        fecha_fin = parse_fecha(fecha_fin)
-        resultados = []
-        nodo_actual = self.raiz
-        while nodo_actual:
-            m = nodo_actual.movimiento
-            try:
-                fecha_mov = parse_fecha(m.fecha)
-            except Exception:
-                nodo_actual = nodo_actual.siguiente
-                continue
-            if fecha_inicio <= fecha_mov <= fecha_fin:
-                if tipo is None or m.tipo.lower() == tipo.lower():
-                    resultados.append(m)
-            nodo_actual = nodo_actual.siguiente
+        fecha_inicio, fecha_fin = a_fecha(fecha_inicio), a_fecha(fecha_fin)
+        if fecha_inicio is None or fecha_fin is None:
+            return {"total_movimientos": 0, "movimientos": []}  # Fecha no válida: no hay coincidencias
+        resultados = list(self.iterar_movimientos(fecha_inicio, fecha_fin, tipo))
         resumen = {
             "total_movimientos": len(resultados),  # Total de movimientos encontrados
             "movimientos": resultados  # Lista de instancias Movimiento
         }
         return resumen
 
-    def consultar_movimientos(self, fecha_consulta=None, tipo_consulta=None):
+    @medir("movimientos.consultar_movimientos")
+    def consultar_movimientos(self, fecha_consulta=None, tipo_consulta=None, backend=None, limite=None):
         # Consulta movimientos por fecha, tipo o ambos
-        # fecha_consulta: string ISO o None
+        # fecha_consulta: date, string ISO o None
         # tipo_consulta: string o None
-        from datetime import date, timedelta
+        # backend: "memoria" (por defecto), "sql" o "auto"; la ruta SQL devuelve filas ligeras
+        # limite: número máximo de resultados
+        if elegir_backend(backend, self.consultas_sql, "Movimientos") == BACKEND_SQL:
+            if self.diario:
+                self.diario.flush()  # La consulta SQL debe ver las escrituras diferidas
+            filtros = {}
+            if fecha_consulta: filtros["fecha"] = a_fecha(fecha_consulta)
+            if tipo_consulta: filtros["tipo"] = tipo_consulta
+            return self.consultas_sql.consultar("Movimientos", filtros=filtros, limite=limite)
         if fecha_consulta:
             fecha_inicio = fecha_fin = fecha_consulta
         else:
-            fecha_inicio = "1900-01-01"
-            fecha_fin = "2999-12-31"
-        resumen = self.resumen_movimientos_por_rango(fecha_inicio, fecha_fin, tipo_consulta)
-        return resumen["movimientos"]
+            fecha_inicio, fecha_fin = date.min, date.max
+        return list(self.iterar_movimientos(fecha_inicio, fecha_fin, tipo_consulta, limite=limite))
 
+    def iterar_movimientos(self, fecha_inicio=None, fecha_fin=None, tipo=None, desde=0, limite=None):
+        # Generador de movimientos por rango de fechas y tipo (en memoria)
+        # fecha_inicio, fecha_fin: límites inclusivos (date o texto ISO); sin ambos no se filtra por fecha
+        # desde: coincidencias a omitir al inicio (paginación); limite: máximo de coincidencias a entregar
+        # El recorrido se detiene en cuanto se entrega la última coincidencia pedida o el llamador deja de iterar
+        por_fecha = fecha_inicio is not None or fecha_fin is not None
+        if por_fecha:
+            fecha_inicio = a_fecha(fecha_inicio) if fecha_inicio is not None else date.min
+            fecha_fin = a_fecha(fecha_fin) if fecha_fin is not None else date.max
+            if fecha_inicio is None or fecha_fin is None:
+                return  # Fecha no válida: no hay coincidencias
+        tipo = tipo.lower() if tipo is not None else None
+        nodo_actual = self.raiz
+        coincidencias = 0
+        entregados = 0
+        recorridos = 0  # Nodos visitados (métrica)
+        try:
+            while nodo_actual and (limite is None or entregados < limite):
+                recorridos += 1
+                m = nodo_actual.movimiento
+                if (not por_fecha or (m.fecha is not None and fecha_inicio <= m.fecha <= fecha_fin)) and \
+                   (tipo is None or m.tipo.lower() == tipo):
+                    coincidencias += 1
+                    if coincidencias > desde:
+                        entregados += 1
+                        yield m
+                nodo_actual = nodo_actual.siguiente
+        finally:
+            metricas.nodos_recorridos(recorridos)
+
+    @medir("movimientos.consultar_movimiento_por_id_transaccion")
     def consultar_movimiento_por_id_transaccion(self, id_transaccion):
         # Busca un movimiento por ID de transacción
         # id_transaccion: ID de la transacción asociada
         nodo_actual = self.raiz
+        recorridos = 0  # Nodos visitados (métrica)
         while nodo_actual:
+            recorridos += 1
             if nodo_actual.movimiento.id_transaccion == id_transaccion:
+                metricas.nodos_recorridos(recorridos)
                 return nodo_actual.movimiento
             nodo_actual = nodo_actual.siguiente
+        metricas.nodos_recorridos(recorridos)
         return None
 
+    @medir("movimientos.eliminar_movimiento_por_id_transaccion")
     def eliminar_movimiento_por_id_transaccion(self, id_transaccion):
         # Elimina un movimiento de la BD y la lista por ID de transacción
         # id_transaccion: ID de la transacción asociada
-        conexion = conectar_db()
-        if not conexion: return False
         eliminado_db = False  # Indica si se eliminó de la BD
-        try:
-            cursor = conexion.cursor()
-            cursor.execute("DELETE FROM Movimientos WHERE id_transaccion = ?", (id_transaccion,))
-            if cursor.rowcount > 0:
-                conexion.commit()
-                eliminado_db = True
-                print(f"Movimiento(s) asociado(s) a transacción {id_transaccion} eliminado(s) de la BD.")
-        except sqlite3.Error as e:
-            if conexion: conexion.rollback()
-            return False
-        finally:
-            if conexion: conexion.close()
+        if self.diario:
+            self.diario.eliminar("Movimientos", "id_transaccion", id_transaccion)
+            # En modo diferido la lista en memoria decide si había algo que eliminar
+        else:
+            conexion = conectar_db(self.contexto)
+            if not conexion: return False
+            try:
+                cursor = conexion.cursor()
+                cursor.execute("DELETE FROM Movimientos WHERE id_transaccion = ?", (id_transaccion,))
+                if cursor.rowcount > 0:
+                    conexion.commit()
+                    eliminado_db = True
+                    bus.emitir("movimiento.eliminado", "Movimiento(s) asociado(s) a transacción {id_transaccion} eliminado(s) de la BD.", id_transaccion=id_transaccion)
+            except sqlite3.Error as e:
+                if conexion: conexion.rollback()
+                return False
+            finally:
+                if conexion: conexion.close()
 
         eliminado_lista = False  # Indica si se eliminó de la lista enlazada
         nodo_actual = self.raiz
@@ -175,7 +272,11 @@ class ListaMovimientos:
                     self.raiz = nodo_actual.siguiente
                 if nodo_actual.siguiente:
                     nodo_actual.siguiente.anterior = nodo_actual.anterior
-                print(f"Movimiento (ID Estado: {nodo_actual.movimiento.id_estado}) eliminado de la lista.")
+                if nodo_actual is self.cola:
+                    self.cola = nodo_actual.anterior
+                self._largo -= 1
+                bus.emitir("movimiento.eliminado", "Movimiento (ID Estado: {id_estado}) eliminado de la lista.", id_estado=nodo_actual.movimiento.id_estado, id_transaccion=id_transaccion)
+                self._notificar(nodo_actual.movimiento, -1)
                 eliminado_lista = True
             nodo_actual = siguiente_nodo
 
@@ -189,31 +290,26 @@ class ListaMovimientos:
         else:
             return False
 
-    def reporte_logistico_final(self, lista_productos, fecha_inicio=None, fecha_fin=None, id_producto=None):
+    @medir("movimientos.reporte_logistico_final")
+    def reporte_logistico_final(self, lista_productos, fecha_inicio=None, fecha_fin=None, id_producto=None, stock_bajo=None):
         """
         Reporte logístico avanzado: muestra movimientos físicos (entradas, salidas, stock inicial/final),
         permite filtrar por producto y fechas. Incluye rotación, productos más/menos movidos y alertas de stock mínimo.
+        stock_bajo: IndiceStockBajo ya mantenido sobre lista_productos (si falta, se arma uno para el reporte).
         """
         from collections import defaultdict
-        from datetime import date as dtdate
-
-        def parse_fecha(f):
-            if isinstance(f, dtdate):
-                return f
-            return dtdate.fromisoformat(f)
 
-        # Filtrar movimientos por fecha y producto
+        # Filtrar movimientos por fecha y producto (los límites se convierten una sola vez)
+        filtrar_fechas = bool(fecha_inicio and fecha_fin)
+        if filtrar_fechas:
+            desde, hasta = a_fecha(fecha_inicio), a_fecha(fecha_fin)
         movimientos_filtrados = []
         nodo = self.raiz
         while nodo:
             m = nodo.movimiento
             cumple_fecha = True
-            if fecha_inicio and fecha_fin:
-                try:
-                    fecha_mov = parse_fecha(m.fecha)
-                    cumple_fecha = (fecha_mov >= parse_fecha(fecha_inicio) and fecha_mov <= parse_fecha(fecha_fin))
-                except Exception:
-                    cumple_fecha = False
+            if filtrar_fechas:
+                cumple_fecha = desde is not None and hasta is not None and m.fecha is not None and desde <= m.fecha <= hasta
             if cumple_fecha:
                 movimientos_filtrados.append(m)
             nodo = nodo.siguiente
@@ -227,22 +323,22 @@ class ListaMovimientos:
 
         # Obtener stock inicial/final y rotación
         productos = lista_productos.consultar_producto()
+        nombres = {}  # pid -> nombre (para el informe)
         for p in productos:
             stock_inicial[p.id_producto] = p.stock
             stock_final[p.id_producto] = p.stock
+            nombres[p.id_producto] = p.nombre
+
+        # Las transacciones se cargan una sola vez y se indexan por ID (antes se recargaban por cada movimiento)
+        por_transaccion = {}
+        if movimientos_filtrados:
+            from app.ModuloTransacciones import ListaTransacciones
+            por_transaccion = {t.id_transaccion: t for t in ListaTransacciones(contexto=self.contexto)}
 
         for m in movimientos_filtrados:
             # Buscar productos involucrados en la transacción
             # Se asume que la transacción tiene productos como lista de IDs o dicts
-            from app.ModuloTransacciones import ListaTransacciones
-            transacciones = ListaTransacciones()
-            t = None
-            nodo_t = transacciones.raiz
-            while nodo_t:
-                if nodo_t.transaccion.id_transaccion == m.id_transaccion:
-                    t = nodo_t.transaccion
-                    break
-                nodo_t = nodo_t.siguiente
+            t = por_transaccion.get(m.id_transaccion)
             if not t:
                 continue
             productos_ids = []
@@ -276,11 +372,14 @@ class ListaMovimientos:
             productos_mas_movidos = []
             productos_menos_movidos = []
 
-        # Alertas por stock mínimo
-        alertas_stock = []
-        for p in productos:
-            if p.stock <= 5:
-                alertas_stock.append(f"⚠️ Stock mínimo para producto {p.nombre} (ID {p.id_producto}): {p.stock}")
+        # Alertas por stock mínimo: productos bajo su umbral propio (o el global), leídos del índice
+        if stock_bajo is None:
+            from app.ModuloStockBajo import IndiceStockBajo
+            indice = IndiceStockBajo(lista_productos, emitir_eventos=False)
+            alertas_stock = indice.alertas()
+            indice.cerrar()
+        else:
+            alertas_stock = stock_bajo.alertas()
 
         print("\n===== REPORTE LOGÍSTICO FINAL =====")
         if fecha_inicio and fecha_fin:
@@ -290,16 +389,16 @@ class ListaMovimientos:
         print("-----------------------------------")
         print("Rotación de productos (movimientos):")
         for pid, v in rotacion.items():
-            nombre = next((p.nombre for p in productos if p.id_producto == pid), str(pid))
+            nombre = nombres.get(pid, str(pid))
             print(f"Producto {nombre} (ID {pid}): {v} movimientos")
         print("-----------------------------------")
         print("Entradas por producto:")
         for pid, v in entradas.items():
-            nombre = next((p.nombre for p in productos if p.id_producto == pid), str(pid))
+            nombre = nombres.get(pid, str(pid))
             print(f"Producto {nombre} (ID {pid}): {v} entradas")
         print("Salidas por producto:")
         for pid, v in salidas.items():
-            nombre = next((p.nombre for p in productos if p.id_producto == pid), str(pid))
+            nombre = nombres.get(pid, str(pid))
             print(f"Producto {nombre} (ID {pid}): {v} salidas")
         print("-----------------------------------")
         print("Productos más movidos:", productos_mas_movidos)
@@ -0,0 +1,79 @@
+try:
+    from .ModuloMetricas import medir
+except ImportError:
+    from ModuloMetricas import medir
+
+# Motor de precios efectivos con caché por producto
+# El precio efectivo de un producto es su precio con la rebaja activa aplicada: round(precio * (1 - rebaja), 2).
+# Se calcula una vez y queda en caché hasta que cambia el precio o la rebaja del producto (el motor se suscribe
+# a los cambios de ListaProductos). Las rebajas de temporada ya llegan en 'rebaja': ModuloRotaciones las
+# guarda en el producto al aplicarlas, así que el motor no vuelve a evaluar la temporada.
+# Una cesta completa se cotiza con una consulta al diccionario por línea: O(tamaño de la cesta).
+
+CAMPOS_PRECIO = frozenset(("precio", "rebaja"))  # Campos que invalidan el precio efectivo
+
+def precio_efectivo(producto):
+    # Precio de venta de un producto con su rebaja aplicada
+    rebaja = producto.rebaja or 0.0
+    return round(producto.precio * (1 - rebaja), 2) if rebaja > 0 else producto.precio
+
+class MotorPrecios:
+    def __init__(self, productos):
+        # productos: ListaProductos cuyos precios se cotizan (el motor queda suscrito a sus cambios)
+        self.productos = productos
+        self._precios = {}  # id_producto -> precio efectivo vigente
+        self.aciertos = 0  # Precios servidos desde la caché
+        self.calculos = 0  # Precios recalculados
+        productos.suscribir_cambios(self._al_cambiar)
+
+    def _al_cambiar(self, id_producto, campos):
+        # Observador de ListaProductos: descarta solo los precios afectados por el cambio
+        if id_producto is None:
+            self._precios.clear()  # La lista se recargó por completo
+        elif campos is None or not CAMPOS_PRECIO.isdisjoint(campos):
+            self._precios.pop(id_producto, None)
+
+    def invalidar(self, id_producto=None):
+        # Descarta el precio de un producto (o todos si id_producto es None)
+        if id_producto is None:
+            self._precios.clear()
+        else:
+            self._precios.pop(id_producto, None)
+
+    def precio(self, id_producto):
+        # Precio efectivo del producto o None si no existe
+        precio = self._precios.get(id_producto)
+        if precio is not None:
+            self.aciertos += 1
+            return precio
+        nodo = self.productos._indice.get(id_producto)
+        if not nodo:
+            return None
+        precio = self._precios[id_producto] = precio_efectivo(nodo.producto)
+        self.calculos += 1
+        return precio
+
+    @medir("precios.cesta")
+    def precio_cesta(self, cesta):
+        # Cotiza una cesta completa: diccionario id_producto -> unidades o iterable de IDs (una unidad cada uno)
+        # Devuelve (lineas, total) con lineas = [{"id", "cantidad", "precio"}] (precio unitario efectivo);
+        # los productos inexistentes se omiten
+        if not isinstance(cesta, dict):
+            unidades = {}
+            for id_producto in cesta:
+                unidades[id_producto] = unidades.get(id_producto, 0) + 1
+            cesta = unidades
+        lineas = []
+        total = 0.0
+        for id_producto, cantidad in cesta.items():
+            precio = self.precio(id_producto)
+            if precio is None:
+                continue
+            lineas.append({"id": id_producto, "cantidad": cantidad, "precio": precio})
+            total += precio * cantidad
+        return lineas, round(total, 2)
+
+    def cerrar(self):
+        # Deja de observar la lista de productos
+        self.productos.desuscribir_cambios(self._al_cambiar)
+        self._precios.clear()
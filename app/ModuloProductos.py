@@ -1,28 +1,55 @@
 from datetime import date, timedelta
 import sqlite3
 import os
+import threading
+import time
 try:
-    from bd.BDSQLite import conectar_db
+    from bd.BDSQLite import conectar_db, asegurar_columnas_politica, a_fecha
 except ImportError:
     import sys
     current_dir = os.path.dirname(os.path.abspath(__file__))
     parent_dir = os.path.dirname(current_dir)
     sys.path.append(parent_dir)
-    from bd.BDSQLite import conectar_db
+    from bd.BDSQLite import conectar_db, asegurar_columnas_politica, a_fecha
+from app.ModuloConsultas import BackendSQL, elegir_backend, BACKEND_SQL
+from app.ModuloEventos import bus, INFO, AVISO, ERROR
+from app.ModuloMetricas import metricas, medir
+from app.ModuloAlertas import calcular_estado
+
+CAMPOS_PRODUCTO = ("nombre", "descripcion", "categoria", "precio", "stock", "fecha_expiracion", "temporalidad", "rebaja", "id_proveedor", "stock_objetivo", "umbral_stock")
+CAMPOS_STOCK = ("stock",)
+
+def _normalizar_datos(datos):
+    # Convierte los campos tipados de un cambio (fecha_expiracion -> date, temporalidad -> bool)
+    # Devuelve el diccionario normalizado, o None si la fecha de expiración no es válida
+    if "fecha_expiracion" not in datos and "temporalidad" not in datos:
+        return datos
+    datos = dict(datos)
+    if datos.get("fecha_expiracion") not in (None, ""):
+        datos["fecha_expiracion"] = a_fecha(datos["fecha_expiracion"])
+        if datos["fecha_expiracion"] is None:
+            return None
+    elif "fecha_expiracion" in datos:
+        datos["fecha_expiracion"] = None
+    if "temporalidad" in datos:
+        datos["temporalidad"] = bool(datos["temporalidad"])
+    return datos
 
 class Producto:
     # Modelo de producto
-    def __init__(self, id_producto, nombre, descripcion, categoria, precio, stock, fecha_expiracion=None, temporalidad=False, rebaja=0.0, id_proveedor=None):
+    def __init__(self, id_producto, nombre, descripcion, categoria, precio, stock, fecha_expiracion=None, temporalidad=False, rebaja=0.0, id_proveedor=None, stock_objetivo=None, umbral_stock=None):
         self.id_producto = id_producto  # Identificador único del producto en la BD
         self.nombre = nombre  # Nombre del producto
         self.descripcion = descripcion  # Descripción del producto
         self.categoria = categoria  # Categoría del producto (ej: Fruta, Verdura)
         self.precio = precio  # Precio actual del producto
         self.stock = stock  # Stock actual disponible
-        self.fecha_expiracion = fecha_expiracion  # Fecha de expiración (string ISO o date)
+        self.fecha_expiracion = fecha_expiracion  # Fecha de expiración (datetime.date o None)
         self.temporalidad = temporalidad  # Indica si es producto de temporada (bool)
         self.rebaja = rebaja  # Porcentaje de rebaja activa (ej: 0.2 para 20%)
         self.id_proveedor = id_proveedor  # ID del proveedor asociado (FK)
+        self.stock_objetivo = stock_objetivo  # Stock deseado tras reabastecer (None = valor global)
+        self.umbral_stock = umbral_stock  # Stock mínimo antes de reabastecer (None = valor global)
 
 class NodoProducto:
     # Nodo de lista doblemente enlazada para productos
@@ -35,6 +62,7 @@ class NodoCategoria:
     def __init__(self, categoria):
         self.categoria = categoria  # Nombre de la categoría
         self.productos_raiz = None  # NodoProducto (inicio de la lista de productos de esta categoría)
+        self.productos_cola = None  # Último NodoProducto de la categoría (inserción O(1))
         self.siguiente = None  # No se usa en árbol, solo para compatibilidad
         self.izquierda = None  # Hijo izquierdo en el árbol binario de categorías
         self.derecha = None  # Hijo derecho en el árbol binario de categorías
@@ -44,11 +72,9 @@ class NodoCategoria:
         if self.productos_raiz is None:
             self.productos_raiz = nuevo_nodo
         else:
-            actual = self.productos_raiz
-            while actual.siguiente:
-                actual = actual.siguiente
-            actual.siguiente = nuevo_nodo
-            nuevo_nodo.anterior = actual
+            self.productos_cola.siguiente = nuevo_nodo
+            nuevo_nodo.anterior = self.productos_cola
+        self.productos_cola = nuevo_nodo
 
 class ArbolCategorias:
     def __init__(self):
@@ -106,75 +132,138 @@ class ArbolCategorias:
 
 class ListaProductos:
     # Lista doblemente enlazada de productos con sincronización a BD
-    def __init__(self):
+    def __init__(self, cargar=True, contexto=None):
+        # cargar: si False, la lista se crea vacía (p. ej. para poblarla desde una instantánea)
+        # contexto: ContextoBD opcional (ruta, URI o ":memory:"); sin él se usa la BD configurada
+        self.contexto = contexto
         self.raiz = None  # Nodo raíz (inicio) de la lista de productos
+        self.cola = None  # Último nodo de la lista (inserción O(1) al final)
+        self._largo = 0  # Número de nodos (len() en O(1))
         self.arbol_categorias = ArbolCategorias()  # Árbol binario para categorías
-        self._cargar_desde_db()
+        self.consultas_sql = BackendSQL(self.contexto)  # Backend para consultas empujadas a SQLite
+        self._indice = {}  # id_producto -> NodoProducto, para búsquedas O(1) por ID
+        self._cerrojos = {}  # id_producto -> threading.Lock de ese producto
+        self._cerrojo_cerrojos = threading.Lock()  # Protege la creación de cerrojos por producto
+        self.diario = None  # DiarioEscritura opcional (modo de escritura diferida)
+        self._esquema_listo = False  # Indica si ya se verificaron las columnas de política en la BD
+        self._observadores = []  # Funciones (id_producto, campos) avisadas tras cada cambio confirmado
+        if cargar:
+            self._cargar_desde_db()
 
+    @medir("productos.cargar")
     def _cargar_desde_db(self):
         # Carga productos desde la base de datos
         # Cada fila representa un producto con todos sus atributos
-        # fila[0]: id_producto, fila[1]: nombre, fila[2]: descripcion, fila[3]: categoria, fila[4]: precio, fila[5]: stock, fila[6]: fecha_expiracion, fila[7]: temporalidad, fila[8]: rebaja, fila[9]: id_proveedor
-        self.raiz = None
-        conexion = conectar_db()
+        # fila[0]: id_producto, fila[1]: nombre, fila[2]: descripcion, fila[3]: categoria, fila[4]: precio, fila[5]: stock, fila[6]: fecha_expiracion, fila[7]: temporalidad, fila[8]: rebaja, fila[9]: id_proveedor, fila[10]: stock_objetivo, fila[11]: umbral_stock
+        if self.diario:
+            self.diario.flush()  # La BD debe reflejar lo pendiente antes de recargar
+        conexion = conectar_db(self.contexto)
         if not conexion:
             return
         try:
+            if not self._esquema_listo:
+                self._esquema_listo = asegurar_columnas_politica(conexion)
             cursor = conexion.cursor()
             cursor.execute("SELECT * FROM Productos")
-            filas = cursor.fetchall()
-            for fila in filas:
-                producto = Producto(
-                    id_producto=fila[0], nombre=fila[1], descripcion=fila[2],
-                    categoria=fila[3], precio=fila[4], stock=fila[5],
-                    fecha_expiracion=fila[6], temporalidad=bool(fila[7]), rebaja=fila[8],
-                    id_proveedor=fila[9] if len(fila) > 9 else None
-                )
-                self._agregar_nodo(producto)
-                self.arbol_categorias.agregar_producto_a_categoria(producto)
+            self._cargar_filas(cursor.fetchall())
+            self._notificar(None, None)  # Recarga completa: los observadores deben descartar lo que tengan
         except sqlite3.Error as e:
             pass
         finally:
             if conexion:
                 conexion.close()
 
+    def _cargar_filas(self, filas, reiniciar=True):
+        # Construye la lista, el índice por ID y el árbol de categorías a partir de filas de Productos
+        # Las filas llegan tipadas (fecha_expiracion como date, temporalidad como bool) desde la BD o la instantánea
+        # reiniciar: si False, las filas se anexan a la lista existente (carga incremental)
+        if reiniciar:
+            self.raiz = None
+            self.cola = None
+            self._indice = {}
+            self._largo = 0
+            self.arbol_categorias = ArbolCategorias()
+        metricas.filas_cargadas("Productos", len(filas))
+        for fila in filas:
+            producto = Producto(
+                id_producto=fila[0], nombre=fila[1], descripcion=fila[2],
+                categoria=fila[3], precio=fila[4], stock=fila[5],
+                fecha_expiracion=fila[6], temporalidad=fila[7], rebaja=fila[8],
+                id_proveedor=fila[9] if len(fila) > 9 else None,
+                stock_objetivo=fila[10] if len(fila) > 10 else None,
+                umbral_stock=fila[11] if len(fila) > 11 else None
+            )
+            self._agregar_nodo(producto)  # También lo agrega al árbol de categorías
+
+    def suscribir_cambios(self, funcion):
+        # Registra un observador llamado como funcion(id_producto, campos) tras cada cambio confirmado:
+        # campos es la tupla de campos modificados; (id_producto, None) = producto eliminado;
+        # (None, None) = la lista se recargó por completo. Devuelve la función para poder desuscribirla
+        self._observadores.append(funcion)
+        return funcion
+
+    def desuscribir_cambios(self, funcion):
+        if funcion in self._observadores:
+            self._observadores.remove(funcion)
+
+    def _notificar(self, id_producto, campos):
+        for funcion in self._observadores:
+            funcion(id_producto, campos)
+
     def _agregar_nodo(self, producto):
         # Agrega un nodo a la lista
         nuevo_nodo = NodoProducto(producto)
         if self.raiz is None:
             self.raiz = nuevo_nodo
         else:
-            nodo_actual = self.raiz
-            while nodo_actual.siguiente:
-                nodo_actual = nodo_actual.siguiente
-            nodo_actual.siguiente = nuevo_nodo
-            nuevo_nodo.anterior = nodo_actual
+            self.cola.siguiente = nuevo_nodo
+            nuevo_nodo.anterior = self.cola
+        self.cola = nuevo_nodo
+        self._largo += 1
+        self._indice[producto.id_producto] = nuevo_nodo
         # Agregar al árbol de categorías
         self.arbol_categorias.agregar_producto_a_categoria(producto)
         return nuevo_nodo
 
+    def __len__(self):
+        return self._largo
+
+    def __iter__(self):
+        # Recorre los productos en orden de inserción sin construir listas intermedias
+        nodo_actual = self.raiz
+        while nodo_actual:
+            yield nodo_actual.producto
+            nodo_actual = nodo_actual.siguiente
+
     def _mensaje_estado_producto(self, producto):
-        # Mensajes automáticos de estado de producto
-        # mensajes: lista de strings con advertencias o información relevante
-        mensajes = []
-        if producto.fecha_expiracion:
-            try:
-                fecha_exp = producto.fecha_expiracion
-                if isinstance(fecha_exp, str):
-                    fecha_exp = date.fromisoformat(fecha_exp)
-                dias_restantes = (fecha_exp - date.today()).days
-                if 0 <= dias_restantes <= 5:
-                    mensajes.append(f"⚠️ El producto '{producto.nombre}' está por expirar en {dias_restantes} día(s).")
-            except Exception:
-                pass
-        if producto.temporalidad:
-            mensajes.append(f"🌱 El producto '{producto.nombre}' es de temporada.")
-        if producto.rebaja and producto.rebaja > 0:
-            mensajes.append(f"💸 El producto '{producto.nombre}' tiene una rebaja activa del {producto.rebaja*100:.0f}%.")
-        for m in mensajes:
-            print(m)
-
-    def registrar_producto(self, nombre, descripcion, categoria, precio, stock, fecha_expiracion=None, temporalidad=False, rebaja=0.0, id_proveedor=None):
+        # Avisos de estado de un producto recién registrado (por expirar, de temporada, con rebaja)
+        # Las consultas no los emiten: el resumen diario de alertas está en app.ModuloAlertas
+        if not bus.activo(INFO):
+            return
+        estado = calcular_estado(producto)
+        if estado.dias_para_expirar is not None:
+            bus.emitir("producto.por_expirar", "⚠️ El producto '{nombre}' está por expirar en {dias} día(s).", AVISO,
+                       id_producto=producto.id_producto, nombre=producto.nombre, dias=estado.dias_para_expirar)
+        if estado.temporada:
+            bus.emitir("producto.temporada", "🌱 El producto '{nombre}' es de temporada.",
+                       id_producto=producto.id_producto, nombre=producto.nombre)
+        if estado.rebaja > 0:
+            bus.emitir("producto.rebaja", "💸 El producto '{nombre}' tiene una rebaja activa del {porcentaje:.0f}%.",
+                       id_producto=producto.id_producto, nombre=producto.nombre, porcentaje=estado.rebaja * 100)
+
+    def _asegurar_esquema(self, campos):
+        # Las columnas de política (stock_objetivo, umbral_stock) pueden faltar en BDs anteriores a ellas
+        # Las listas armadas desde filas (registro, instantánea) no pasan por _cargar_desde_db: se verifican
+        # la primera vez que se escribe uno de esos campos
+        if self._esquema_listo or not any(campo in ("stock_objetivo", "umbral_stock") for campo in campos):
+            return
+        conexion = conectar_db(self.contexto)
+        if conexion:
+            self._esquema_listo = asegurar_columnas_politica(conexion)
+            conexion.close()
+
+    @medir("productos.registrar_producto")
+    def registrar_producto(self, nombre, descripcion, categoria, precio, stock, fecha_expiracion=None, temporalidad=False, rebaja=0.0, id_proveedor=None, umbral_stock=None):
         # Registra un producto en la BD y la lista
         # nombre: nombre del producto
         # descripcion: descripción del producto
@@ -185,87 +274,286 @@ class ListaProductos:
         # temporalidad: bool, si es de temporada
         # rebaja: porcentaje de rebaja (ej: 0.2 para 20%)
         # id_proveedor: ID del proveedor asociado
+        # umbral_stock: stock mínimo propio del producto (None = valor global, ver app.ModuloStockBajo)
+        if umbral_stock is not None and umbral_stock < 0:
+            bus.emitir("producto.rechazado", "Producto '{nombre}' rechazado: stock mínimo no válido ({umbral}).", AVISO, nombre=nombre, umbral=umbral_stock)
+            return None
+        self._asegurar_esquema(("umbral_stock",))  # El INSERT siempre nombra la columna, exista o no un umbral
         if not fecha_expiracion:
             # Asigna fecha de expiración automática (7 días desde hoy)
-            fecha_expiracion = (date.today() + timedelta(days=7)).isoformat()
-        conexion = conectar_db()
+            fecha_expiracion = date.today() + timedelta(days=7)
+        elif a_fecha(fecha_expiracion) is None:
+            bus.emitir("producto.rechazado", "Producto '{nombre}' rechazado: fecha de expiración no válida ({fecha}).", AVISO, nombre=nombre, fecha=fecha_expiracion)
+            return None
+        fecha_expiracion = a_fecha(fecha_expiracion)
+        temporalidad = bool(temporalidad)
+        if self.diario:
+            # Escritura diferida: el ID se asigna sin esperar a la BD y el INSERT queda encolado
+            id_producto = self.diario.siguiente_id("Productos", "id_producto")
+            self.diario.insertar("Productos", {
+                "id_producto": id_producto, "nombre": nombre, "descripcion": descripcion, "categoria": categoria,
+                "precio": precio, "stock": stock, "fecha_expiracion": fecha_expiracion, "temporalidad": temporalidad,
+                "rebaja": rebaja, "id_proveedor": id_proveedor, "umbral_stock": umbral_stock
+            })
+            producto = Producto(id_producto, nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja, id_proveedor, umbral_stock=umbral_stock)
+            nuevo_nodo = self._agregar_nodo(producto)
+            bus.emitir("producto.registrado", "Producto '{nombre}' registrado con ID: {id_producto}", nombre=nombre, id_producto=id_producto)
+            self._notificar(id_producto, CAMPOS_PRODUCTO)
+            self._mensaje_estado_producto(producto)
+            return nuevo_nodo.producto
+        conexion = conectar_db(self.contexto)
         if not conexion: return None
         try:
             cursor = conexion.cursor()
             cursor.execute("""
-                INSERT INTO Productos (nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja, id_proveedor)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja, id_proveedor))
+                INSERT INTO Productos (nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja, id_proveedor, umbral_stock)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja, id_proveedor, umbral_stock))
             id_producto = cursor.lastrowid
             conexion.commit()
-            producto = Producto(id_producto, nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja, id_proveedor)
+            producto = Producto(id_producto, nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja, id_proveedor, umbral_stock=umbral_stock)
             nuevo_nodo = self._agregar_nodo(producto)
-            print(f"Producto '{nombre}' registrado con ID: {id_producto}")
+            bus.emitir("producto.registrado", "Producto '{nombre}' registrado con ID: {id_producto}", nombre=nombre, id_producto=id_producto)
+            self._notificar(id_producto, CAMPOS_PRODUCTO)
             self._mensaje_estado_producto(producto)
             return nuevo_nodo.producto
         except sqlite3.Error as e:
             if conexion: conexion.rollback()
+            bus.emitir("producto.error", "Error al registrar producto '{nombre}': {error}", ERROR, nombre=nombre, error=str(e))
             return None
         finally:
             if conexion: conexion.close()
 
+    def _cerrojo_producto(self, id_producto):
+        # Devuelve el cerrojo propio de un producto (se crea la primera vez que se pide)
+        with self._cerrojo_cerrojos:
+            cerrojo = self._cerrojos.get(id_producto)
+            if cerrojo is None:
+                cerrojo = threading.Lock()
+                self._cerrojos[id_producto] = cerrojo
+            return cerrojo
+
+    @medir("productos.actualizar_producto")
     def actualizar_producto(self, id_producto, nuevos_datos):
         # Actualiza un producto en la lista y la BD
         # id_producto: identificador del producto a actualizar
         # nuevos_datos: diccionario con los campos a actualizar
-        nodo_actual = self.raiz
-        producto_encontrado = None
-        while nodo_actual:
-            if nodo_actual.producto.id_producto == id_producto:
-                producto_encontrado = nodo_actual.producto
+        # Para cambios de stock concurrentes usar ajustar_stock, que no pisa ventas simultáneas
+        nodo = self._indice.get(id_producto)
+        if not nodo:
+            self._cargar_desde_db()
+            return False
+        nuevos_datos = _normalizar_datos(nuevos_datos)
+        if nuevos_datos is None:
+            bus.emitir("producto.rechazado", "Actualización rechazada para producto ID {id_producto}: fecha de expiración no válida.", AVISO, id_producto=id_producto)
+            return False
+        self._asegurar_esquema(nuevos_datos)
+
+        with self._cerrojo_producto(id_producto):
+            producto_encontrado = nodo.producto
+            if self.diario:
+                # En modo diferido se validan aquí las restricciones CHECK que luego aplicaría la BD
+                if nuevos_datos.get("stock", 0) < 0 or nuevos_datos.get("precio", 0) < 0:
+                    bus.emitir("producto.rechazado", "Actualización rechazada para producto ID {id_producto}: stock y precio deben ser >= 0.", AVISO, id_producto=id_producto)
+                    return False
                 for clave, valor in nuevos_datos.items():
                     if hasattr(producto_encontrado, clave):
                         setattr(producto_encontrado, clave, valor)
-                break
-            nodo_actual = nodo_actual.siguiente
-
-        if not producto_encontrado:
-            self._cargar_desde_db()
-            return False
+                self.diario.actualizar("Productos", "id_producto", id_producto, nuevos_datos)
+                bus.emitir("producto.actualizado", "Producto ID {id_producto} actualizado (escritura diferida).", id_producto=id_producto)
+                self._notificar(id_producto, tuple(nuevos_datos))
+                return True
+            valores_previos = {}  # Valores en memoria antes del cambio, para revertir si la BD lo rechaza
+            for clave, valor in nuevos_datos.items():
+                if hasattr(producto_encontrado, clave):
+                    valores_previos[clave] = getattr(producto_encontrado, clave)
+                    setattr(producto_encontrado, clave, valor)
 
-        conexion = conectar_db()
-        if not conexion: return False
-        try:
-            cursor = conexion.cursor()
-            set_clause = ", ".join([f"{clave} = ?" for clave in nuevos_datos])
-            valores = list(nuevos_datos.values())
-            valores.append(id_producto)
-            cursor.execute(f"UPDATE Productos SET {set_clause} WHERE id_producto = ?", valores)
-            if cursor.rowcount == 0:
+            conexion = conectar_db(self.contexto)
+            if not conexion: return False
+            actualizado = False
+            try:
+                cursor = conexion.cursor()
+                set_clause = ", ".join([f"{clave} = ?" for clave in nuevos_datos])
+                valores = list(nuevos_datos.values())
+                valores.append(id_producto)
+                cursor.execute(f"UPDATE Productos SET {set_clause} WHERE id_producto = ?", valores)
+                if cursor.rowcount == 0:
+                    return False
+                conexion.commit()
+                actualizado = True
+                bus.emitir("producto.actualizado", "Producto ID {id_producto} actualizado en la BD.", id_producto=id_producto)
+                self._notificar(id_producto, tuple(nuevos_datos))
+                return True
+            except sqlite3.IntegrityError as e:
+                if conexion: conexion.rollback()
+                bus.emitir("producto.rechazado", "Actualización rechazada para producto ID {id_producto}: {error}", AVISO, id_producto=id_producto, error=str(e))
                 return False
-            conexion.commit()
-            print(f"Producto ID {id_producto} actualizado en la BD.")
-            return True
-        except sqlite3.Error as e:
-            if conexion: conexion.rollback()
+            except sqlite3.Error as e:
+                if conexion: conexion.rollback()
+                bus.emitir("producto.error", "Error al actualizar producto ID {id_producto}: {error}", ERROR, id_producto=id_producto, error=str(e))
+                return False
+            finally:
+                if not actualizado:
+                    for clave, valor in valores_previos.items():
+                        setattr(producto_encontrado, clave, valor)
+                if conexion: conexion.close()
+
+    @medir("productos.actualizar_productos_lote")
+    def actualizar_productos_lote(self, cambios):
+        # Actualiza varios productos en una sola transacción (todo o nada)
+        # cambios: diccionario id_producto -> diccionario con los campos a actualizar
+        # Los UPDATE se agrupan por conjunto de columnas y se envían con executemany
+        # Devuelve el número de productos actualizados, o False si la BD rechazó el lote
+        cambios = {id_producto: _normalizar_datos(datos) for id_producto, datos in cambios.items() if datos and id_producto in self._indice}
+        if not cambios:
+            return 0
+        if any(datos is None for datos in cambios.values()):
+            bus.emitir("producto.rechazado", "Lote rechazado: fecha de expiración no válida.", AVISO, productos=len(cambios))
             return False
-        finally:
-            if conexion: conexion.close()
+        self._asegurar_esquema({campo for datos in cambios.values() for campo in datos})
+        if self.diario:
+            if any(d.get("stock", 0) < 0 or d.get("precio", 0) < 0 for d in cambios.values()):
+                bus.emitir("producto.rechazado", "Lote rechazado: stock y precio deben ser >= 0.", AVISO, productos=len(cambios))
+                return False
+            for id_producto, datos in cambios.items():
+                self.diario.actualizar("Productos", "id_producto", id_producto, datos)
+        else:
+            grupos = {}  # tupla de columnas -> lista de parámetros de cada UPDATE
+            for id_producto, datos in cambios.items():
+                columnas = tuple(datos)
+                grupos.setdefault(columnas, []).append([datos[c] for c in columnas] + [id_producto])
+            conexion = conectar_db(self.contexto)
+            if not conexion: return False
+            try:
+                cursor = conexion.cursor()
+                for columnas, parametros in grupos.items():
+                    set_clause = ", ".join(f"{clave} = ?" for clave in columnas)
+                    cursor.executemany(f"UPDATE Productos SET {set_clause} WHERE id_producto = ?", parametros)
+                conexion.commit()
+            except sqlite3.IntegrityError as e:
+                conexion.rollback()
+                bus.emitir("producto.rechazado", "Lote de {productos} producto(s) rechazado: {error}", AVISO, productos=len(cambios), error=str(e))
+                return False
+            except sqlite3.Error as e:
+                conexion.rollback()
+                bus.emitir("producto.error", "Error al actualizar lote de {productos} producto(s): {error}", ERROR, productos=len(cambios), error=str(e))
+                return False
+            finally:
+                conexion.close()
+        # La BD aceptó el lote: se refleja en memoria
+        for id_producto, datos in cambios.items():
+            with self._cerrojo_producto(id_producto):
+                producto = self._indice[id_producto].producto
+                for clave, valor in datos.items():
+                    if hasattr(producto, clave):
+                        setattr(producto, clave, valor)
+            self._notificar(id_producto, tuple(datos))
+        bus.emitir("producto.lote_actualizado", "{productos} producto(s) actualizados en lote.", productos=len(cambios))
+        return len(cambios)
+
+    @medir("productos.ajustar_stock")
+    def ajustar_stock(self, id_producto, delta, reintentos=3):
+        # Ajusta el stock de forma atómica sumando delta (negativo para ventas, positivo para compras)
+        # El UPDATE condicional evita perder actualizaciones entre terminales y nunca deja stock negativo
+        # reintentos: reintentos con espera exponencial si la BD está bloqueada por otro escritor
+        # Devuelve el nuevo stock, o None si hay conflicto (stock insuficiente), el producto no existe o hubo error
+        with self._cerrojo_producto(id_producto):
+            if self.diario:
+                # En modo diferido la memoria es la fuente de verdad y el cerrojo del producto hace atómico el ajuste
+                nodo = self._indice.get(id_producto)
+                if not nodo:
+                    bus.emitir("stock.inexistente", "Producto ID {id_producto} no existe; no se ajustó el stock.", AVISO, id_producto=id_producto)
+                    return None
+                if nodo.producto.stock + delta < 0:
+                    bus.emitir("stock.conflicto", "Conflicto de stock en producto ID {id_producto}: disponible {disponible}, ajuste solicitado {delta}.", AVISO, id_producto=id_producto, disponible=nodo.producto.stock, delta=delta)
+                    return None
+                nodo.producto.stock += delta
+                self.diario.encolar("UPDATE Productos SET stock = stock + ? WHERE id_producto = ?", [delta, id_producto])
+                self._notificar(id_producto, CAMPOS_STOCK)
+                return nodo.producto.stock
+            for intento in range(reintentos + 1):
+                conexion = conectar_db(self.contexto)
+                if not conexion: return None
+                try:
+                    cursor = conexion.cursor()
+                    cursor.execute(
+                        "UPDATE Productos SET stock = stock + ? WHERE id_producto = ? AND stock + ? >= 0",
+                        (delta, id_producto, delta)
+                    )
+                    actualizado = cursor.rowcount > 0
+                    cursor.execute("SELECT stock FROM Productos WHERE id_producto = ?", (id_producto,))
+                    fila = cursor.fetchone()
+                    if not actualizado:
+                        conexion.rollback()
+                        if fila is None:
+                            bus.emitir("stock.inexistente", "Producto ID {id_producto} no existe; no se ajustó el stock.", AVISO, id_producto=id_producto)
+                            return None
+                        self._sincronizar_stock(id_producto, fila[0])
+                        bus.emitir("stock.conflicto", "Conflicto de stock en producto ID {id_producto}: disponible {disponible}, ajuste solicitado {delta}.", AVISO, id_producto=id_producto, disponible=fila[0], delta=delta)
+                        return None
+                    conexion.commit()
+                    self._sincronizar_stock(id_producto, fila[0])
+                    return fila[0]
+                except sqlite3.OperationalError as e:
+                    if conexion: conexion.rollback()
+                    if "locked" in str(e) or "busy" in str(e):
+                        time.sleep(0.01 * (2 ** intento))
+                        continue
+                    bus.emitir("stock.error", "Error al ajustar stock del producto ID {id_producto}: {error}", ERROR, id_producto=id_producto, error=str(e))
+                    return None
+                except sqlite3.Error as e:
+                    if conexion: conexion.rollback()
+                    bus.emitir("stock.error", "Error al ajustar stock del producto ID {id_producto}: {error}", ERROR, id_producto=id_producto, error=str(e))
+                    return None
+                finally:
+                    if conexion: conexion.close()
+            bus.emitir("stock.error", "No se pudo ajustar el stock del producto ID {id_producto}: BD ocupada tras {reintentos} reintentos.", ERROR, id_producto=id_producto, reintentos=reintentos)
+            return None
 
+    def _sincronizar_stock(self, id_producto, stock):
+        # Refleja en memoria el stock leído de la BD
+        nodo = self._indice.get(id_producto)
+        if nodo:
+            nodo.producto.stock = stock
+            self._notificar(id_producto, CAMPOS_STOCK)
+
+    def aplicar_ajuste_confirmado(self, id_producto, delta):
+        # Suma en memoria un ajuste de stock que otro módulo ya confirmó en la BD (p. ej. una orden de compra)
+        # Devuelve el nuevo stock, o None si el producto no está en la lista
+        with self._cerrojo_producto(id_producto):
+            nodo = self._indice.get(id_producto)
+            if not nodo:
+                return None
+            nodo.producto.stock += delta
+            stock = nodo.producto.stock
+        self._notificar(id_producto, CAMPOS_STOCK)
+        return stock
+
+    @medir("productos.eliminar_producto")
     def eliminar_producto(self, id_producto):
         # Elimina un producto de la BD y la lista
         # id_producto: identificador del producto a eliminar
         # eliminado_db: indica si se eliminó de la BD
-        conexion = conectar_db()
-        if not conexion: return False
         eliminado_db = False
-        try:
-            cursor = conexion.cursor()
-            cursor.execute("DELETE FROM Productos WHERE id_producto = ?", (id_producto,))
-            if cursor.rowcount > 0:
-                conexion.commit()
-                eliminado_db = True
-                print(f"Producto ID {id_producto} eliminado de la BD.")
-        except sqlite3.Error as e:
-            if conexion: conexion.rollback()
-            return False
-        finally:
-            if conexion: conexion.close()
+        if self.diario:
+            self.diario.eliminar("Productos", "id_producto", id_producto)
+            # En modo diferido la lista en memoria decide si había algo que eliminar
+        else:
+            conexion = conectar_db(self.contexto)
+            if not conexion: return False
+            try:
+                cursor = conexion.cursor()
+                cursor.execute("DELETE FROM Productos WHERE id_producto = ?", (id_producto,))
+                if cursor.rowcount > 0:
+                    conexion.commit()
+                    eliminado_db = True
+                    bus.emitir("producto.eliminado", "Producto ID {id_producto} eliminado de la BD.", id_producto=id_producto)
+            except sqlite3.Error as e:
+                if conexion: conexion.rollback()
+                return False
+            finally:
+                if conexion: conexion.close()
 
         nodo_actual = self.raiz
         while nodo_actual:
@@ -276,7 +564,12 @@ class ListaProductos:
                     self.raiz = nodo_actual.siguiente
                 if nodo_actual.siguiente:
                     nodo_actual.siguiente.anterior = nodo_actual.anterior
-                print(f"Producto ID {id_producto} eliminado de la lista enlazada.")
+                if nodo_actual is self.cola:
+                    self.cola = nodo_actual.anterior
+                self._indice.pop(id_producto, None)
+                self._largo -= 1
+                bus.emitir("producto.eliminado", "Producto ID {id_producto} eliminado de la lista enlazada.", id_producto=id_producto)
+                self._notificar(id_producto, None)
                 return True
             nodo_actual = nodo_actual.siguiente
 
@@ -288,34 +581,69 @@ class ListaProductos:
         else:
             return False
 
-    def consultar_producto(self, id_producto=None, nombre=None, solo_rebaja=False):
+    def obtener_producto(self, id_producto):
+        # Producto con ese ID o None, en O(1) por el índice (sin pasar por el backend de consultas)
+        nodo = self._indice.get(id_producto)
+        return nodo.producto if nodo else None
+
+    @medir("productos.consultar_producto")
+    def consultar_producto(self, id_producto=None, nombre=None, solo_rebaja=False, backend=None, limite=None):
         # Consulta productos por ID, nombre o rebaja
         # id_producto: filtra por ID si se especifica
         # nombre: filtra por nombre si se especifica
         # solo_rebaja: si True, solo productos con rebaja activa
-        resultados = []
+        # backend: "memoria" (por defecto), "sql" o "auto"; la ruta SQL devuelve filas ligeras
+        # limite: número máximo de resultados
+        if elegir_backend(backend, self.consultas_sql, "Productos") == BACKEND_SQL:
+            if self.diario:
+                self.diario.flush()  # La consulta SQL debe ver las escrituras diferidas
+            filtros = {}
+            if id_producto is not None: filtros["id_producto"] = id_producto
+            if nombre is not None: filtros["nombre"] = nombre
+            return self.consultas_sql.consultar(
+                "Productos", filtros=filtros, limite=limite,
+                mayor_que={"rebaja": 0} if solo_rebaja else None
+            )
+        return list(self.iterar_productos(id_producto, nombre, solo_rebaja, limite=limite))
+
+    def iterar_productos(self, id_producto=None, nombre=None, solo_rebaja=False, desde=0, limite=None):
+        # Generador de productos con los mismos filtros que consultar_producto (en memoria)
+        # desde: coincidencias a omitir al inicio (paginación); limite: máximo de coincidencias a entregar
+        # El recorrido se detiene en cuanto se entrega la última coincidencia pedida o el llamador deja de iterar
+        nombre = nombre.lower() if nombre is not None else None
         nodo_actual = self.raiz
-        while nodo_actual:
-            p = nodo_actual.producto
-            id_coincide = (id_producto is None or p.id_producto == id_producto)
-            nombre_coincide = (nombre is None or p.nombre.lower() == nombre.lower())
-            rebaja_coincide = (not solo_rebaja or (p.rebaja > 0))
-            if id_coincide and nombre_coincide and rebaja_coincide:
-                resultados.append(p)
-                self._mensaje_estado_producto(p)
-            if id_producto is not None and id_coincide:
-                break
-            nodo_actual = nodo_actual.siguiente
-        return resultados
+        coincidencias = 0
+        entregados = 0
+        recorridos = 0  # Nodos visitados (métrica)
+        try:
+            while nodo_actual and (limite is None or entregados < limite):
+                recorridos += 1
+                p = nodo_actual.producto
+                id_coincide = (id_producto is None or p.id_producto == id_producto)
+                nombre_coincide = (nombre is None or p.nombre.lower() == nombre)
+                rebaja_coincide = (not solo_rebaja or (p.rebaja > 0))
+                if id_coincide and nombre_coincide and rebaja_coincide:
+                    coincidencias += 1
+                    if coincidencias > desde:
+                        entregados += 1
+                        yield p
+                if id_producto is not None and id_coincide:
+                    break
+                nodo_actual = nodo_actual.siguiente
+        finally:
+            metricas.nodos_recorridos(recorridos)
 
+    @medir("productos.consultar_productos_por_categoria")
     def consultar_productos_por_categoria(self, categoria, limite=5):
         # Devuelve hasta 'limite' productos de la categoría dada
         return self.arbol_categorias.consultar_productos_por_categoria(categoria, limite)
 
+    @medir("productos.categorias_disponibles")
     def categorias_disponibles(self):
         # Devuelve lista de nombres de categorías disponibles
         return self.arbol_categorias.categorias_disponibles()
 
+    @medir("productos.resumen_movimientos_producto")
     def resumen_movimientos_producto(self, movimientos_lista, id_producto, fecha_inicio, fecha_fin, tipo=None):
         # Resumen de movimientos de un producto
         # movimientos_lista: instancia de ListaMovimientos
@@ -323,10 +651,10 @@ class ListaProductos:
         # fecha_inicio, fecha_fin: rango de fechas (string ISO o date)
         # tipo: filtra por tipo de movimiento si se especifica
         # transacciones_con_producto: IDs de transacciones que involucran el producto
-        if not movimientos_lista:
+        if movimientos_lista is None:
             return None
         from app.ModuloTransacciones import ListaTransacciones
-        transacciones = ListaTransacciones()
+        transacciones = ListaTransacciones(contexto=self.contexto)
         transacciones_con_producto = []
         nodo = transacciones.raiz
         while nodo:
@@ -0,0 +1,282 @@
+import json
+import math
+from collections import deque
+from datetime import date, timedelta
+from statistics import NormalDist
+try:
+    import numpy as np  # Opcional: operaciones vectorizadas sobre todos los productos
+except ImportError:
+    np = None
+try:
+    from .ModuloMetricas import medir
+except ImportError:
+    from ModuloMetricas import medir
+from bd.BDSQLite import a_fecha
+
+# Pronóstico de demanda y puntos de reorden por producto
+# La demanda diaria de cada producto se estima con media móvil o suavizado exponencial (EWMA) sobre las ventas
+# diarias. Con la demanda y su desviación se calculan, para todos los productos a la vez:
+#   stock de seguridad = z(nivel de servicio) * desviación * sqrt(plazo de entrega)
+#   punto de reorden = demanda * plazo de entrega + stock de seguridad
+#   stock objetivo = punto de reorden + demanda * días de cobertura
+# El estado se actualiza de forma incremental con cerrar_dia(), un día a la vez.
+
+METODO_MEDIA_MOVIL = "media_movil"
+METODO_EWMA = "ewma"
+
+def unidades_por_producto(productos):
+    # Unidades de cada producto en una transacción: dicts {"id", "cantidad"} o IDs sueltos (1 unidad), o su texto JSON
+    # Devuelve un diccionario id_producto -> unidades
+    if isinstance(productos, str):
+        try:
+            productos = json.loads(productos)
+        except json.JSONDecodeError:
+            return {}
+    unidades = {}
+    if not isinstance(productos, list):
+        return unidades
+    for x in productos:
+        if isinstance(x, dict):
+            id_producto, cantidad = x.get("id"), x.get("cantidad", 1)
+        elif isinstance(x, int):
+            id_producto, cantidad = x, 1
+        else:
+            continue
+        unidades[id_producto] = unidades.get(id_producto, 0) + cantidad
+    return unidades
+
+def ventas_por_dia(transacciones, movimientos, desde=None, hasta=None):
+    # Unidades vendidas por día y producto a partir del historial de movimientos de venta
+    # desde, hasta: fechas opcionales (date o ISO, inclusive) del rango a considerar
+    # Devuelve un diccionario date -> {id_producto: unidades}
+    desde = a_fecha(desde) or date.min
+    hasta = a_fecha(hasta) or date.max
+    fechas_venta = {}  # id_transaccion -> fecha del movimiento de venta
+    nodo = movimientos.raiz
+    while nodo:
+        m = nodo.movimiento
+        if m.tipo == "venta" and m.fecha is not None and desde <= m.fecha <= hasta:
+            fechas_venta.setdefault(m.id_transaccion, m.fecha)
+        nodo = nodo.siguiente
+    dias = {}
+    nodo = transacciones.raiz
+    while nodo:
+        t = nodo.transaccion
+        fecha = fechas_venta.get(t.id_transaccion)
+        if fecha:
+            del_dia = dias.setdefault(fecha, {})
+            for id_producto, cantidad in unidades_por_producto(t.productos).items():
+                del_dia[id_producto] = del_dia.get(id_producto, 0) + cantidad
+        nodo = nodo.siguiente
+    return dias
+
+class PronosticoDemanda:
+    # Estado del pronóstico de todos los productos en vectores paralelos (arreglos NumPy o listas)
+    def __init__(self, metodo=METODO_EWMA, ventana=28, alfa=0.3, nivel_servicio=0.95, plazo_entrega=2, dias_cobertura=7, usar_numpy=None):
+        # metodo: METODO_MEDIA_MOVIL o METODO_EWMA
+        # ventana: días considerados por la media móvil; alfa: peso del último día en el EWMA (0-1)
+        # nivel_servicio: probabilidad deseada de no quebrar stock durante el plazo de entrega
+        # plazo_entrega: días que tarda en llegar un pedido; dias_cobertura: días de demanda que cubre el stock objetivo
+        # usar_numpy: None = usar NumPy si está instalado; False = forzar listas de Python
+        if metodo not in (METODO_MEDIA_MOVIL, METODO_EWMA):
+            raise ValueError(f"Método de pronóstico no válido: {metodo}")
+        if not 0 < alfa <= 1 or not 0 < nivel_servicio < 1:
+            raise ValueError("alfa debe estar en (0, 1] y nivel_servicio en (0, 1).")
+        self.metodo = metodo
+        self.ventana = ventana
+        self.alfa = alfa
+        self.plazo_entrega = plazo_entrega
+        self.dias_cobertura = dias_cobertura
+        self.z = NormalDist().inv_cdf(nivel_servicio)  # Factor de seguridad para el nivel de servicio
+        self.usar_numpy = np is not None if usar_numpy is None else bool(usar_numpy and np is not None)
+        self.ids = []  # id_producto de cada posición de los vectores
+        self._posicion = {}  # id_producto -> posición
+        self._columnas = deque()  # Ventas de los últimos 'ventana' días, dispersas: {posición: unidades} (media móvil)
+        self._suma = self._vector(0)  # Suma de ventas de la ventana por producto (media móvil)
+        self._suma_cuad = self._vector(0)  # Suma de cuadrados de la ventana (desviación de la media móvil)
+        self._nivel = self._vector(0)  # Demanda suavizada (EWMA)
+        self._varianza = self._vector(0)  # Varianza suavizada del error (EWMA)
+        self.ultimo_dia = None  # Último día cerrado (date)
+        self.dias_cerrados = 0
+
+    # --- Vectores ---
+
+    def _vector(self, n):
+        return np.zeros(n) if self.usar_numpy else [0.0] * n
+
+    def _extender(self, vector, k):
+        return np.concatenate([vector, np.zeros(k)]) if self.usar_numpy else vector + [0.0] * k
+
+    def registrar_productos(self, ids):
+        # Agrega a los vectores los productos que aún no tienen posición (con demanda 0)
+        nuevos = [i for i in dict.fromkeys(ids) if i not in self._posicion]
+        if not nuevos:
+            return 0
+        for id_producto in nuevos:
+            self._posicion[id_producto] = len(self.ids)
+            self.ids.append(id_producto)
+        k = len(nuevos)
+        self._suma = self._extender(self._suma, k)
+        self._suma_cuad = self._extender(self._suma_cuad, k)
+        self._nivel = self._extender(self._nivel, k)
+        self._varianza = self._extender(self._varianza, k)
+        return k
+
+    # --- Actualización incremental ---
+
+    def cerrar_dia(self, ventas, fecha=None):
+        # Incorpora las ventas de un día cerrado
+        # ventas: diccionario id_producto -> unidades vendidas ese día (los productos ausentes vendieron 0)
+        # fecha: date o fecha ISO del día; por defecto, el día siguiente al último cerrado
+        fecha = a_fecha(fecha)
+        self.registrar_productos(ventas)
+        columna = {self._posicion[i]: float(u) for i, u in ventas.items() if u}
+        if self.metodo == METODO_MEDIA_MOVIL:
+            # Se resta el día que sale de la ventana y se suma el nuevo (solo productos con ventas)
+            salientes = self._columnas.popleft() if len(self._columnas) == self.ventana else {}
+            for pos, u in salientes.items():
+                self._suma[pos] -= u
+                self._suma_cuad[pos] -= u * u
+            for pos, u in columna.items():
+                self._suma[pos] += u
+                self._suma_cuad[pos] += u * u
+            self._columnas.append(columna)
+        else:
+            self._actualizar_ewma(columna)
+        self.ultimo_dia = fecha or (self.ultimo_dia + timedelta(days=1) if self.ultimo_dia else date.today())
+        self.dias_cerrados += 1
+
+    def _actualizar_ewma(self, columna):
+        # Todos los productos decaen, incluidos los que no vendieron ese día
+        a = self.alfa
+        if self.usar_numpy:
+            x = np.zeros(len(self.ids))
+            if columna:
+                x[list(columna)] = list(columna.values())
+            if self.dias_cerrados == 0:
+                self._nivel = x
+            else:
+                error = x - self._nivel
+                self._nivel = self._nivel + a * error
+                self._varianza = (1 - a) * (self._varianza + a * error * error)
+        elif self.dias_cerrados == 0:
+            self._nivel = [columna.get(pos, 0.0) for pos in range(len(self.ids))]
+        else:
+            errores = [columna.get(pos, 0.0) - nivel for pos, nivel in enumerate(self._nivel)]
+            self._nivel = [nivel + a * e for nivel, e in zip(self._nivel, errores)]
+            self._varianza = [(1 - a) * (v + a * e * e) for v, e in zip(self._varianza, errores)]
+
+    @medir("pronosticos.actualizar")
+    def actualizar(self, transacciones, movimientos, hasta=None):
+        # Cierra, uno por uno y en orden, los días del historial posteriores al último cerrado
+        # Los días sin ventas también se cierran (demanda 0). hasta: fecha ISO o date del último día a cerrar
+        # Devuelve el número de días cerrados
+        hasta = a_fecha(hasta)
+        desde = self.ultimo_dia + timedelta(days=1) if self.ultimo_dia else None
+        dias = ventas_por_dia(transacciones, movimientos, desde, hasta)
+        if not dias and not hasta:
+            return 0
+        dia = desde or min(dias)
+        fin = hasta or max(dias)
+        cerrados = 0
+        while dia <= fin:
+            self.cerrar_dia(dias.get(dia, {}), dia)
+            dia += timedelta(days=1)
+            cerrados += 1
+        return cerrados
+
+    # --- Cálculos ---
+
+    def demanda(self):
+        # Demanda diaria estimada de cada producto (vector en el orden de self.ids)
+        if self.metodo == METODO_EWMA:
+            return self._nivel
+        dias = max(1, len(self._columnas))
+        if self.usar_numpy:
+            return self._suma / dias
+        return [s / dias for s in self._suma]
+
+    def desviacion(self):
+        # Desviación estándar estimada de la demanda diaria de cada producto
+        if self.metodo == METODO_EWMA:
+            return np.sqrt(self._varianza) if self.usar_numpy else [math.sqrt(v) for v in self._varianza]
+        dias = max(1, len(self._columnas))
+        if self.usar_numpy:
+            media = self._suma / dias
+            return np.sqrt(np.maximum(0.0, self._suma_cuad / dias - media * media))
+        return [math.sqrt(max(0.0, c / dias - (s / dias) ** 2)) for s, c in zip(self._suma, self._suma_cuad)]
+
+    @medir("pronosticos.puntos_reorden")
+    def puntos_reorden(self):
+        # Devuelve (demanda, stock_seguridad, punto_reorden, stock_objetivo), vectores en el orden de self.ids
+        demanda = self.demanda()
+        desviacion = self.desviacion()
+        factor = self.z * math.sqrt(self.plazo_entrega)
+        if self.usar_numpy:
+            seguridad = factor * desviacion
+            reorden = demanda * self.plazo_entrega + seguridad
+            return demanda, seguridad, reorden, reorden + demanda * self.dias_cobertura
+        seguridad = [factor * d for d in desviacion]
+        reorden = [d * self.plazo_entrega + s for d, s in zip(demanda, seguridad)]
+        objetivo = [r + d * self.dias_cobertura for r, d in zip(reorden, demanda)]
+        return demanda, seguridad, reorden, objetivo
+
+    def politica(self):
+        # Política entera por producto: id_producto -> {"umbral_stock": ..., "stock_objetivo": ...}
+        # El objetivo siempre supera al umbral, para que cada reabastecimiento deje el producto fuera de riesgo
+        _, _, reorden, objetivo = self.puntos_reorden()
+        if self.usar_numpy:
+            reorden, objetivo = np.ceil(reorden).astype(int).tolist(), np.ceil(objetivo).astype(int).tolist()
+        else:
+            reorden, objetivo = [math.ceil(r) for r in reorden], [math.ceil(o) for o in objetivo]
+        return {
+            id_producto: {"umbral_stock": r, "stock_objetivo": max(o, r + 1)}
+            for id_producto, r, o in zip(self.ids, reorden, objetivo)
+        }
+
+    @medir("pronosticos.planificar")
+    def planificar(self, productos):
+        # Plan nocturno de reabastecimiento: productos cuyo stock está en o por debajo de su punto de reorden
+        # productos: ListaProductos (se recorre una vez para leer los stocks)
+        # Devuelve una lista de dicts {id_producto, stock, punto_reorden, stock_objetivo, cantidad}
+        stocks = {}
+        nodo = productos.raiz
+        while nodo:
+            stocks[nodo.producto.id_producto] = nodo.producto.stock
+            nodo = nodo.siguiente
+        self.registrar_productos(stocks)
+        _, _, reorden, objetivo = self.puntos_reorden()
+        if self.usar_numpy:
+            stock = np.array([stocks.get(i, 0) for i in self.ids], dtype=float)
+            existe = np.array([i in stocks for i in self.ids], dtype=bool)
+            cantidad = np.ceil(np.maximum(objetivo, reorden + 1) - stock)
+            posiciones = np.nonzero(existe & (stock <= reorden) & (cantidad > 0))[0].tolist()
+            return [{
+                "id_producto": self.ids[pos], "stock": int(stock[pos]), "punto_reorden": round(float(reorden[pos]), 2),
+                "stock_objetivo": round(float(objetivo[pos]), 2), "cantidad": int(cantidad[pos]),
+            } for pos in posiciones]
+        plan = []
+        for pos, id_producto in enumerate(self.ids):
+            stock = stocks.get(id_producto)
+            if stock is None or stock > reorden[pos]:
+                continue
+            cantidad = math.ceil(max(objetivo[pos], reorden[pos] + 1) - stock)
+            if cantidad > 0:
+                plan.append({
+                    "id_producto": id_producto, "stock": stock, "punto_reorden": round(reorden[pos], 2),
+                    "stock_objetivo": round(objetivo[pos], 2), "cantidad": cantidad,
+                })
+        return plan
+
+    def guardar_politica(self, productos):
+        # Persiste umbral_stock y stock_objetivo de cada producto con una sola escritura en lote
+        # Solo se escriben los productos cuya política cambió. Devuelve el número de productos actualizados
+        cambios = {}
+        for id_producto, datos in self.politica().items():
+            nodo = productos._indice.get(id_producto)
+            if not nodo:
+                continue
+            p = nodo.producto
+            if p.umbral_stock != datos["umbral_stock"] or p.stock_objetivo != datos["stock_objetivo"]:
+                cambios[id_producto] = datos
+        return productos.actualizar_productos_lote(cambios) if cambios else 0
@@ -8,6 +8,8 @@ except ImportError:
     parent_dir = os.path.dirname(current_dir)
     sys.path.append(parent_dir)
     from bd.BDSQLite import conectar_db
+from app.ModuloEventos import bus
+from app.ModuloMetricas import metricas, medir
 
 class Nodo:
     # Nodo de lista doblemente enlazada para proveedores
@@ -26,29 +28,47 @@ class Proveedor:
 
 class ListaProveedores:
     # Lista doblemente enlazada de proveedores con sincronización a BD
-    def __init__(self):
+    def __init__(self, cargar=True, contexto=None):
+        # cargar: si False, la lista se crea vacía (p. ej. para poblarla desde una instantánea)
+        # contexto: ContextoBD opcional (ruta, URI o ":memory:"); sin él se usa la BD configurada
+        self.contexto = contexto
         self.raiz = None  # Nodo raíz (inicio) de la lista de proveedores
-        self._cargar_desde_db()
+        self.cola = None  # Último nodo de la lista (inserción O(1) al final)
+        self._largo = 0  # Número de nodos (len() en O(1))
+        self.diario = None  # DiarioEscritura opcional (modo de escritura diferida)
+        if cargar:
+            self._cargar_desde_db()
 
+    @medir("proveedores.cargar")
     def _cargar_desde_db(self):
         # Carga proveedores desde la base de datos
         # Cada fila representa un proveedor con todos sus atributos
         # fila[0]: id_proveedor, fila[1]: nombre, fila[2]: contacto, fila[3]: direccion
-        self.raiz = None
-        conexion = conectar_db()
+        if self.diario:
+            self.diario.flush()  # La BD debe reflejar lo pendiente antes de recargar
+        conexion = conectar_db(self.contexto)
         if not conexion: return
         try:
             cursor = conexion.cursor()
             cursor.execute("SELECT * FROM Proveedores")
-            filas = cursor.fetchall()
-            for fila in filas:
-                proveedor = Proveedor(id_proveedor=fila[0], nombre=fila[1], contacto=fila[2], direccion=fila[3])
-                self._agregar_nodo(proveedor)
+            self._cargar_filas(cursor.fetchall())
         except sqlite3.Error as e:
             pass
         finally:
             if conexion: conexion.close()
 
+    def _cargar_filas(self, filas, reiniciar=True):
+        # Construye la lista a partir de filas de la tabla Proveedores (BD o instantánea)
+        # reiniciar: si False, las filas se anexan a la lista existente (carga incremental)
+        if reiniciar:
+            self.raiz = None
+            self.cola = None
+            self._largo = 0
+        metricas.filas_cargadas("Proveedores", len(filas))
+        for fila in filas:
+            proveedor = Proveedor(id_proveedor=fila[0], nombre=fila[1], contacto=fila[2], direccion=fila[3])
+            self._agregar_nodo(proveedor)
+
     def _agregar_nodo(self, proveedor):
         # Agrega un nodo a la lista
         # proveedor: instancia de Proveedor
@@ -56,19 +76,35 @@ class ListaProveedores:
         if self.raiz is None:
             self.raiz = nuevo_nodo
         else:
-            nodo_actual = self.raiz
-            while nodo_actual.siguiente:
-                nodo_actual = nodo_actual.siguiente
-            nodo_actual.siguiente = nuevo_nodo
-            nuevo_nodo.anterior = nodo_actual
+            self.cola.siguiente = nuevo_nodo
+            nuevo_nodo.anterior = self.cola
+        self.cola = nuevo_nodo
+        self._largo += 1
         return nuevo_nodo
 
+    def __len__(self):
+        return self._largo
+
+    def __iter__(self):
+        # Recorre los proveedores en orden de inserción sin construir listas intermedias
+        nodo_actual = self.raiz
+        while nodo_actual:
+            yield nodo_actual.proveedor
+            nodo_actual = nodo_actual.siguiente
+
+    @medir("proveedores.registrar_proveedor")
     def registrar_proveedor(self, nombre, contacto, direccion):
         # Registra un proveedor en la BD y la lista
         # nombre: nombre del proveedor
         # contacto: información de contacto
         # direccion: dirección física
-        conexion = conectar_db()
+        if self.diario:
+            id_proveedor = self.diario.siguiente_id("Proveedores", "id_proveedor")
+            self.diario.insertar("Proveedores", {"id_proveedor": id_proveedor, "nombre": nombre, "contacto": contacto, "direccion": direccion})
+            nuevo_nodo = self._agregar_nodo(Proveedor(id_proveedor, nombre, contacto, direccion))
+            bus.emitir("proveedor.registrado", "Proveedor '{nombre}' registrado con ID: {id_proveedor}", nombre=nombre, id_proveedor=id_proveedor)
+            return nuevo_nodo.proveedor
+        conexion = conectar_db(self.contexto)
         if not conexion: return None
         try:
             cursor = conexion.cursor()
@@ -78,7 +114,7 @@ class ListaProveedores:
             conexion.commit()
             proveedor = Proveedor(id_proveedor, nombre, contacto, direccion)
             nuevo_nodo = self._agregar_nodo(proveedor)
-            print(f"Proveedor '{nombre}' registrado con ID: {id_proveedor}")
+            bus.emitir("proveedor.registrado", "Proveedor '{nombre}' registrado con ID: {id_proveedor}", nombre=nombre, id_proveedor=id_proveedor)
             return nuevo_nodo.proveedor
         except sqlite3.Error as e:
             if conexion: conexion.rollback()
@@ -86,6 +122,7 @@ class ListaProveedores:
         finally:
             if conexion: conexion.close()
 
+    @medir("proveedores.actualizar_proveedor")
     def actualizar_proveedor(self, id_proveedor, nuevos_datos):
         # Actualiza un proveedor en la lista y la BD
         # id_proveedor: identificador del proveedor a actualizar
@@ -104,7 +141,12 @@ class ListaProveedores:
             self._cargar_desde_db()
             return False
 
-        conexion = conectar_db()
+        if self.diario:
+            self.diario.actualizar("Proveedores", "id_proveedor", id_proveedor, nuevos_datos)
+            bus.emitir("proveedor.actualizado", "Proveedor ID {id_proveedor} actualizado (escritura diferida).", id_proveedor=id_proveedor)
+            return True
+
+        conexion = conectar_db(self.contexto)
         if not conexion: return False
         try:
             cursor = conexion.cursor()
@@ -115,7 +157,7 @@ class ListaProveedores:
             if cursor.rowcount == 0:
                 return False
             conexion.commit()
-            print(f"Proveedor ID {id_proveedor} actualizado en la BD.")
+            bus.emitir("proveedor.actualizado", "Proveedor ID {id_proveedor} actualizado en la BD.", id_proveedor=id_proveedor)
             return True
         except sqlite3.Error as e:
             if conexion: conexion.rollback()
@@ -123,25 +165,30 @@ class ListaProveedores:
         finally:
             if conexion: conexion.close()
 
+    @medir("proveedores.eliminar_proveedor")
     def eliminar_proveedor(self, id_proveedor):
         # Elimina un proveedor de la BD y la lista
         # id_proveedor: identificador del proveedor a eliminar
         # eliminado_db: indica si se eliminó de la BD
-        conexion = conectar_db()
-        if not conexion: return False
         eliminado_db = False
-        try:
-            cursor = conexion.cursor()
-            cursor.execute("DELETE FROM Proveedores WHERE id_proveedor = ?", (id_proveedor,))
-            if cursor.rowcount > 0:
-                conexion.commit()
-                eliminado_db = True
-                print(f"Proveedor ID {id_proveedor} eliminado de la BD.")
-        except sqlite3.Error as e:
-            if conexion: conexion.rollback()
-            return False
-        finally:
-            if conexion: conexion.close()
+        if self.diario:
+            self.diario.eliminar("Proveedores", "id_proveedor", id_proveedor)
+            # En modo diferido la lista en memoria decide si había algo que eliminar
+        else:
+            conexion = conectar_db(self.contexto)
+            if not conexion: return False
+            try:
+                cursor = conexion.cursor()
+                cursor.execute("DELETE FROM Proveedores WHERE id_proveedor = ?", (id_proveedor,))
+                if cursor.rowcount > 0:
+                    conexion.commit()
+                    eliminado_db = True
+                    bus.emitir("proveedor.eliminado", "Proveedor ID {id_proveedor} eliminado de la BD.", id_proveedor=id_proveedor)
+            except sqlite3.Error as e:
+                if conexion: conexion.rollback()
+                return False
+            finally:
+                if conexion: conexion.close()
 
         nodo_actual = self.raiz
         while nodo_actual:
@@ -152,7 +199,10 @@ class ListaProveedores:
                 else:
                     nodo_actual.anterior.siguiente = nodo_actual.siguiente
                     if nodo_actual.siguiente: nodo_actual.siguiente.anterior = nodo_actual.anterior
-                print(f"Proveedor ID {id_proveedor} eliminado de la lista.")
+                if nodo_actual is self.cola:
+                    self.cola = nodo_actual.anterior
+                self._largo -= 1
+                bus.emitir("proveedor.eliminado", "Proveedor ID {id_proveedor} eliminado de la lista.", id_proveedor=id_proveedor)
                 return True
             nodo_actual = nodo_actual.siguiente
 
@@ -165,14 +215,40 @@ class ListaProveedores:
         else:
             return False
 
+    @medir("proveedores.consultar_proveedor")
     def consultar_proveedor(self, id_proveedor):
         # Consulta un proveedor por ID
         # id_proveedor: identificador del proveedor a consultar
         if self.raiz is None:
             return None
         nodo_actual = self.raiz
+        recorridos = 0  # Nodos visitados (métrica)
         while nodo_actual:
+            recorridos += 1
             if nodo_actual.proveedor.id_proveedor == id_proveedor:
+                metricas.nodos_recorridos(recorridos)
                 return nodo_actual.proveedor
             nodo_actual = nodo_actual.siguiente
-        return None
\ No newline at end of file
+        metricas.nodos_recorridos(recorridos)
+        return None
+
+    def iterar_proveedores(self, nombre=None, desde=0, limite=None):
+        # Generador de proveedores (todos o por nombre): entrega las coincidencias a medida que las encuentra
+        # desde: coincidencias a omitir al inicio (paginación); limite: máximo de coincidencias a entregar
+        nombre = nombre.lower() if nombre is not None else None
+        nodo_actual = self.raiz
+        coincidencias = 0
+        entregados = 0
+        recorridos = 0  # Nodos visitados (métrica)
+        try:
+            while nodo_actual and (limite is None or entregados < limite):
+                recorridos += 1
+                p = nodo_actual.proveedor
+                if nombre is None or p.nombre.lower() == nombre:
+                    coincidencias += 1
+                    if coincidencias > desde:
+                        entregados += 1
+                        yield p
+                nodo_actual = nodo_actual.siguiente
+        finally:
+            metricas.nodos_recorridos(recorridos)
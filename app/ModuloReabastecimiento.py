@@ -0,0 +1,174 @@
+import json
+import sqlite3
+import os
+try:
+    from bd.BDSQLite import conectar_db, a_fecha
+except ImportError:
+    import sys
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parent_dir = os.path.dirname(current_dir)
+    sys.path.append(parent_dir)
+    from bd.BDSQLite import conectar_db, a_fecha
+from app.ModuloTransacciones import Transaccion
+from app.ModuloMovimientos import Movimiento
+from app.ModuloEventos import bus, ERROR
+from app.ModuloMetricas import medir
+
+# Planificador de reabastecimiento con órdenes de compra agrupadas por proveedor
+# Las necesidades de reabastecimiento se encolan (una por producto) y, en cada ciclo, las de un mismo proveedor
+# se despachan como una sola orden de compra de varias líneas. Todas las órdenes del ciclo (transacción,
+# movimiento "compra" y aumento de stock de cada línea) se escriben en una única transacción de la BD.
+
+class NecesidadReabastecimiento:
+    # Producto que debe reabastecerse hasta 'stock_objetivo'
+    __slots__ = ("id_producto", "id_proveedor", "stock_objetivo", "desde")
+
+    def __init__(self, id_producto, id_proveedor, stock_objetivo, desde):
+        self.id_producto = id_producto
+        self.id_proveedor = id_proveedor  # Proveedor al que se le pedirá
+        self.stock_objetivo = stock_objetivo  # Nivel de stock a alcanzar con la compra
+        self.desde = desde  # Día en que se detectó la necesidad
+
+class PlanificadorReabastecimiento:
+    def __init__(self, productos, proveedores, transacciones, movimientos, id_cliente_inventario, ventana_dias=0, contexto=None):
+        # productos, proveedores, transacciones, movimientos: listas del sistema que se mantienen sincronizadas
+        # id_cliente_inventario: cliente interno al que se asocian las compras
+        # ventana_dias: días que se acumulan necesidades de un proveedor antes de emitir su orden (0 = al cierre del día)
+        # contexto: ContextoBD opcional; por defecto, el de la lista de productos
+        self.productos = productos
+        self.proveedores = proveedores
+        self.transacciones = transacciones
+        self.movimientos = movimientos
+        self.id_cliente_inventario = id_cliente_inventario
+        self.ventana_dias = ventana_dias
+        self.contexto = contexto or productos.contexto
+        self._pendientes = {}  # id_proveedor -> {id_producto: NecesidadReabastecimiento}
+
+    def _proveedor_de(self, producto):
+        # Proveedor asignado al producto; si no tiene (o ya no existe), el primero registrado
+        nodo = self.proveedores.raiz
+        primero = nodo.proveedor if nodo else None
+        while nodo:
+            if nodo.proveedor.id_proveedor == producto.id_proveedor:
+                return nodo.proveedor
+            nodo = nodo.siguiente
+        return primero
+
+    def solicitar(self, id_producto, stock_objetivo, dia):
+        # Encola la necesidad de llevar el producto a 'stock_objetivo'; si ya estaba encolada se conserva
+        # la fecha original y el objetivo mayor. Devuelve True si la necesidad es nueva
+        producto = self.productos.obtener_producto(id_producto)
+        if not producto:
+            return False
+        proveedor = self._proveedor_de(producto)
+        if not proveedor:
+            return False
+        del_proveedor = self._pendientes.setdefault(proveedor.id_proveedor, {})
+        necesidad = del_proveedor.get(id_producto)
+        if necesidad:
+            necesidad.stock_objetivo = max(necesidad.stock_objetivo, stock_objetivo)
+            return False
+        del_proveedor[id_producto] = NecesidadReabastecimiento(id_producto, proveedor.id_proveedor, stock_objetivo, dia)
+        return True
+
+    @property
+    def pendientes(self):
+        # Número de productos en espera de una orden de compra
+        return sum(len(n) for n in self._pendientes.values())
+
+    @medir("reabastecimiento.ciclo")
+    def ciclo(self, dia, fecha, forzar=False):
+        # Emite las órdenes de los proveedores cuya necesidad más antigua cumplió la ventana (o todas si forzar)
+        # La cantidad de cada línea se calcula con el stock actual: objetivo - stock (se omiten las ya cubiertas)
+        # fecha: fecha de las órdenes (date o ISO). Devuelve la lista de órdenes emitidas:
+        # {"id_transaccion", "id_proveedor", "proveedor", "lineas": [{"id", "cantidad", "precio"}], "total"}
+        fecha = a_fecha(fecha)
+        ordenes = []
+        despachadas = {}  # Necesidades retiradas de la cola en este ciclo (se restauran si la BD falla)
+        for id_proveedor, necesidades in list(self._pendientes.items()):
+            if not forzar and dia - min(n.desde for n in necesidades.values()) < self.ventana_dias:
+                continue
+            lineas = []
+            for necesidad in necesidades.values():
+                producto = self.productos.obtener_producto(necesidad.id_producto)
+                if not producto:
+                    continue
+                cantidad = necesidad.stock_objetivo - producto.stock
+                if cantidad > 0:
+                    lineas.append({"id": necesidad.id_producto, "cantidad": cantidad, "precio": producto.precio})
+            despachadas[id_proveedor] = self._pendientes.pop(id_proveedor)
+            if lineas:
+                proveedor = self._proveedor_por_id(id_proveedor)
+                ordenes.append({
+                    "id_transaccion": None, "id_proveedor": id_proveedor, "proveedor": proveedor,
+                    "lineas": lineas, "total": round(sum(l["cantidad"] * l["precio"] for l in lineas), 2),
+                })
+        if not ordenes:
+            return []
+        if not self._registrar(ordenes, fecha):
+            # La BD rechazó el ciclo: las necesidades vuelven a la cola para el próximo
+            for id_proveedor, necesidades in despachadas.items():
+                self._pendientes.setdefault(id_proveedor, {}).update(necesidades)
+            return []
+        for orden in ordenes:
+            bus.emitir("reabastecimiento.orden", "🚚 Orden de compra {id_transaccion} a '{nombre}': {lineas} producto(s), total ${total:.2f}",
+                       id_transaccion=orden["id_transaccion"], nombre=orden["proveedor"].nombre if orden["proveedor"] else orden["id_proveedor"],
+                       lineas=len(orden["lineas"]), total=orden["total"])
+        return ordenes
+
+    def _proveedor_por_id(self, id_proveedor):
+        nodo = self.proveedores.raiz
+        while nodo:
+            if nodo.proveedor.id_proveedor == id_proveedor:
+                return nodo.proveedor
+            nodo = nodo.siguiente
+        return None
+
+    def _tipo_pago(self, orden):
+        return f"compra a proveedor {orden['proveedor'].nombre}" if orden["proveedor"] else "compra a proveedor"
+
+    def _registrar(self, ordenes, fecha):
+        # Persiste las órdenes del ciclo y las refleja en las listas
+        if self.productos.diario or self.transacciones.diario or self.movimientos.diario:
+            # En escritura diferida el diario ya agrupa las escrituras: se usan las operaciones de cada lista
+            for orden in ordenes:
+                compra = self.transacciones.registrar_transaccion(
+                    id_cliente=self.id_cliente_inventario, id_proveedor=orden["id_proveedor"], productos=orden["lineas"],
+                    total=orden["total"], fecha=fecha, tipo_pago=self._tipo_pago(orden), estado="completada"
+                )
+                orden["id_transaccion"] = compra.id_transaccion
+                self.movimientos.registrar_movimiento(id_transaccion=compra.id_transaccion, fecha=fecha, tipo="compra")
+                for linea in orden["lineas"]:
+                    self.productos.ajustar_stock(linea["id"], linea["cantidad"])
+            return True
+        conexion = conectar_db(self.contexto)
+        if not conexion: return False
+        try:
+            cursor = conexion.cursor()
+            for orden in ordenes:
+                cursor.execute("""
+                    INSERT INTO Transacciones (id_cliente, id_proveedor, productos, total, fecha, tipo_pago, estado)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (self.id_cliente_inventario, orden["id_proveedor"], json.dumps(orden["lineas"]), orden["total"], fecha, self._tipo_pago(orden), "completada"))
+                orden["id_transaccion"] = cursor.lastrowid
+                cursor.execute("INSERT INTO Movimientos (id_transaccion, fecha, tipo) VALUES (?, ?, ?)", (orden["id_transaccion"], fecha, "compra"))
+                orden["id_estado"] = cursor.lastrowid
+                cursor.executemany("UPDATE Productos SET stock = stock + ? WHERE id_producto = ?",
+                                   [(linea["cantidad"], linea["id"]) for linea in orden["lineas"]])
+            conexion.commit()
+        except sqlite3.Error as e:
+            conexion.rollback()
+            bus.emitir("reabastecimiento.error", "Error al registrar {ordenes} orden(es) de compra: {error}", ERROR, ordenes=len(ordenes), error=str(e))
+            return False
+        finally:
+            conexion.close()
+        # La BD aceptó el ciclo: se reflejan transacciones, movimientos y stock en memoria
+        for orden in ordenes:
+            self.transacciones.aplicar_transaccion_confirmada(Transaccion(
+                orden["id_transaccion"], self.id_cliente_inventario, orden["id_proveedor"], orden["lineas"],
+                orden["total"], fecha, self._tipo_pago(orden), "completada"
+            ))
+            self.movimientos.aplicar_movimiento_confirmado(Movimiento(orden.pop("id_estado"), orden["id_transaccion"], fecha, "compra"))
+            for linea in orden["lineas"]:
+                self.productos.aplicar_ajuste_confirmado(linea["id"], linea["cantidad"])
+        return True
@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+import time
+try:
+    from bd.BDSQLite import conectar_db, asegurar_versiones
+except ImportError:
+    import sys
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parent_dir = os.path.dirname(current_dir)
+    sys.path.append(parent_dir)
+    from bd.BDSQLite import conectar_db, asegurar_versiones
+from app.ModuloEventos import bus, AVISO
+from app.ModuloInstantaneas import TABLAS, abrir_instantanea, filas_tabla, huella_tabla
+
+# Registro perezoso de listas y módulos de la aplicación
+# Cada entrada se construye la primera vez que se pide (obtener / registro[clave]); calentar() construye las
+# restantes en hilos de fondo para que el primer menú se muestre sin esperar a que carguen todas las listas.
+# Las cinco listas se cargan con una única conexión de lectura compartida entre hilos: la lectura de la
+# huella y de las filas de cada tabla se serializa con un cerrojo (una transacción BEGIN ... rollback por
+# tabla), y la construcción de los nodos ocurre fuera del cerrojo. Con la instantánea del arranque anterior
+# solo se lee su cabecera al abrir el registro; el segmento de cada tabla se decodifica al cargar su lista.
+
+class RegistroListas:
+    def __init__(self, contexto=None, ruta_instantanea=None):
+        # contexto: ContextoBD opcional con el que se crean las listas
+        # ruta_instantanea: instantánea a usar (por defecto, la de la BD activa)
+        self.contexto = contexto
+        self._instantanea = abrir_instantanea(ruta_instantanea, contexto)  # Solo la cabecera
+        self.desactualizada = self._instantanea is None  # True si alguna tabla no coincidió con la instantánea
+        self._fabricas = {}  # clave -> función (registro) -> objeto
+        self._objetos = {}  # clave -> objeto ya construido
+        self._cerrojos = {}  # clave -> threading.Lock que serializa su construcción
+        self._cerrojo_lectura = threading.Lock()  # Serializa el uso de la conexión de lectura compartida
+        self._conexion = None  # Conexión de lectura compartida (se abre con la primera lista)
+        self._hilos = []
+        self.tiempos = {}  # clave -> segundos que tomó construirla
+        for tabla, clave, clase in TABLAS:
+            self.definir(clave, self._fabrica_lista(tabla, clase))
+
+    def definir(self, clave, fabrica):
+        # Registra (o reemplaza) una entrada; fabrica recibe el registro para pedir sus dependencias
+        self._fabricas[clave] = fabrica
+        self._cerrojos.setdefault(clave, threading.Lock())
+
+    def construida(self, clave):
+        return clave in self._objetos
+
+    def obtener(self, clave):
+        # Devuelve el objeto de la clave, construyéndolo si aún no existe (una sola vez aunque lo pidan varios hilos)
+        objeto = self._objetos.get(clave)
+        if objeto is not None:
+            return objeto
+        with self._cerrojos[clave]:
+            objeto = self._objetos.get(clave)
+            if objeto is None:
+                inicio = time.perf_counter()
+                objeto = self._fabricas[clave](self)
+                self.tiempos[clave] = time.perf_counter() - inicio
+                self._objetos[clave] = objeto
+        return objeto
+
+    def __getitem__(self, clave):
+        return self.obtener(clave)
+
+    def calentar(self, claves=None):
+        # Construye en hilos de fondo las entradas indicadas (por defecto, todas) que aún no existan
+        # Las listas van primero y de la más chica a la más grande según la instantánea
+        claves = [c for c in (claves or self._fabricas) if c not in self._objetos]
+        filas = {clave: self._filas_estimadas(tabla) for tabla, clave, _ in TABLAS}
+        claves.sort(key=lambda c: (c not in filas, filas.get(c, 0)))
+        for clave in claves:
+            hilo = threading.Thread(target=self._calentar_una, args=(clave,), name=f"registro-{clave}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def _calentar_una(self, clave):
+        try:
+            self.obtener(clave)
+        except Exception as e:  # Un error en segundo plano no debe perderse: se reintenta al pedir la entrada
+            bus.emitir("registro.error", "No se pudo precargar '{clave}': {error}", AVISO, clave=clave, error=str(e))
+
+    def esperar(self, tiempo_max=None):
+        # Espera a que terminen los hilos de calentamiento; devuelve True si terminaron todos
+        limite = None if tiempo_max is None else time.monotonic() + tiempo_max
+        for hilo in self._hilos:
+            hilo.join(None if limite is None else max(0.0, limite - time.monotonic()))
+        return not any(hilo.is_alive() for hilo in self._hilos)
+
+    def recargar(self):
+        # Vuelve a leer desde la BD las listas ya construidas (p. ej. tras una importación masiva)
+        # Los módulos que observan una lista (índices, búsqueda, top de ventas) se reconstruyen con su aviso de recarga
+        self.esperar()
+        for _, clave, _ in TABLAS:
+            lista = self._objetos.get(clave)
+            if lista is not None:
+                lista._cargar_desde_db()
+
+    def cerrar(self):
+        # Espera el calentamiento y libera la conexión de lectura compartida y el mapa de la instantánea
+        self.esperar()
+        with self._cerrojo_lectura:
+            if self._conexion:
+                self._conexion.close()
+                self._conexion = None
+            if self._instantanea:
+                self._instantanea.cerrar()
+                self._instantanea = None
+
+    # --- Carga de listas ---
+
+    def _filas_estimadas(self, tabla):
+        huella = self._instantanea.huellas.get(tabla) if self._instantanea else None
+        return huella["filas"] if huella else 0
+
+    def _fabrica_lista(self, tabla, clase):
+        def fabrica(registro):
+            lista = clase(cargar=False, contexto=registro.contexto)
+            filas = registro._leer_tabla(tabla)
+            if filas is None:  # Sin conexión compartida: la lista se carga por su cuenta
+                return clase(contexto=registro.contexto)
+            lista._cargar_filas(filas)
+            return lista
+        return fabrica
+
+    def _leer_tabla(self, tabla):
+        # Filas de la tabla (instantánea, delta o lectura completa) leídas con la conexión compartida
+        # Devuelve None si no se pudo usar la conexión
+        with self._cerrojo_lectura:
+            try:
+                if self._conexion is None:
+                    self._conexion = conectar_db(self.contexto, compartida=True)
+                    if not self._conexion:
+                        return None
+                    asegurar_versiones(self._conexion)
+                cursor = self._conexion.cursor()
+                cursor.execute("BEGIN")  # Huella y filas de un mismo estado de la BD
+                try:
+                    filas, cambio = filas_tabla(cursor, tabla, self._instantanea, huella_tabla(cursor, tabla))
+                finally:
+                    self._conexion.rollback()
+            except sqlite3.Error as e:
+                bus.emitir("registro.error", "Error al leer {tabla} con la conexión compartida: {error}", AVISO, tabla=tabla, error=str(e))
+                return None
+        self.desactualizada = self.desactualizada or cambio
+        return filas
@@ -1,16 +1,268 @@
 from datetime import date, timedelta
+import sqlite3
 
 try:
     from .ModuloProductos import ListaProductos, Producto
+    from .ModuloEventos import bus, AVISO, ERROR
+    from .ModuloMetricas import medir
 except ImportError:
     from ModuloProductos import ListaProductos, Producto
+    from ModuloEventos import bus, AVISO, ERROR
+    from ModuloMetricas import medir
+from bd.BDSQLite import conectar_db, a_fecha
+
+# Tipos de periodo registrados en la tabla Rotaciones
+TIPO_REBAJA_EXPIRACION = "rebaja_expiracion"
+TIPO_TEMPORADA_LLUVIOSA = "temporada_lluviosa"
+TIPO_TEMPORADA_SECA = "temporada_seca"
+
+class PeriodoRotacion:
+    # Periodo de rotación o promoción de un producto (fila de la tabla Rotaciones)
+    __slots__ = ("id_periodo", "id_producto", "fecha_inicio", "fecha_fin", "tipo")
+
+    def __init__(self, id_periodo, id_producto, fecha_inicio, fecha_fin, tipo):
+        self.id_periodo = id_periodo  # rowid de la fila en Rotaciones
+        self.id_producto = id_producto
+        self.fecha_inicio = fecha_inicio  # Fecha de inicio (datetime.date, inclusive)
+        self.fecha_fin = fecha_fin  # Fecha de fin (datetime.date, inclusive)
+        self.tipo = tipo  # Tipo de periodo (p. ej. "rebaja_expiracion", "temporada_lluviosa")
+
+    def __repr__(self):
+        return f"PeriodoRotacion({self.id_producto}, {self.fecha_inicio}..{self.fecha_fin}, {self.tipo!r})"
+
+class NodoIntervalo:
+    # Nodo del árbol de intervalos: guarda un periodo y el mayor fecha_fin de su subárbol
+    __slots__ = ("periodo", "clave", "max_fin", "altura", "izquierda", "derecha")
+
+    def __init__(self, periodo):
+        self.periodo = periodo
+        self.clave = (periodo.fecha_inicio, periodo.id_periodo)  # Orden del árbol: inicio y, en empate, ID
+        self.max_fin = periodo.fecha_fin  # Mayor fecha_fin del subárbol (permite podar las búsquedas)
+        self.altura = 1
+        self.izquierda = None
+        self.derecha = None
+
+class ArbolIntervalos:
+    # Árbol AVL de intervalos ordenado por fecha de inicio y aumentado con el fin máximo de cada subárbol
+    # Inserción O(log n). Las consultas "activos en X" y "que se solapan con [a, b]" podan los subárboles cuyo
+    # fin máximo es anterior a 'a' y se detienen al pasar 'b': cuestan O(log n + k) en la práctica
+    # (k = periodos devueltos) y O(k·log n) en el peor caso, en vez de recorrer toda la tabla
+    def __init__(self):
+        self.raiz = None
+        self._tamano = 0
+
+    def __len__(self):
+        return self._tamano
+
+    @staticmethod
+    def _altura(nodo):
+        return nodo.altura if nodo else 0
+
+    @staticmethod
+    def _actualizar(nodo):
+        nodo.altura = 1 + max(ArbolIntervalos._altura(nodo.izquierda), ArbolIntervalos._altura(nodo.derecha))
+        nodo.max_fin = nodo.periodo.fecha_fin
+        if nodo.izquierda and nodo.izquierda.max_fin > nodo.max_fin:
+            nodo.max_fin = nodo.izquierda.max_fin
+        if nodo.derecha and nodo.derecha.max_fin > nodo.max_fin:
+            nodo.max_fin = nodo.derecha.max_fin
+
+    def _rotar_derecha(self, nodo):
+        nueva_raiz = nodo.izquierda
+        nodo.izquierda = nueva_raiz.derecha
+        nueva_raiz.derecha = nodo
+        self._actualizar(nodo)
+        self._actualizar(nueva_raiz)
+        return nueva_raiz
+
+    def _rotar_izquierda(self, nodo):
+        nueva_raiz = nodo.derecha
+        nodo.derecha = nueva_raiz.izquierda
+        nueva_raiz.izquierda = nodo
+        self._actualizar(nodo)
+        self._actualizar(nueva_raiz)
+        return nueva_raiz
+
+    def _balancear(self, nodo):
+        self._actualizar(nodo)
+        balance = self._altura(nodo.izquierda) - self._altura(nodo.derecha)
+        if balance > 1:
+            if self._altura(nodo.izquierda.izquierda) < self._altura(nodo.izquierda.derecha):
+                nodo.izquierda = self._rotar_izquierda(nodo.izquierda)
+            return self._rotar_derecha(nodo)
+        if balance < -1:
+            if self._altura(nodo.derecha.derecha) < self._altura(nodo.derecha.izquierda):
+                nodo.derecha = self._rotar_derecha(nodo.derecha)
+            return self._rotar_izquierda(nodo)
+        return nodo
+
+    def insertar(self, periodo):
+        nuevo = NodoIntervalo(periodo)
+        # Inserción iterativa registrando el camino, luego rebalanceo de abajo hacia arriba
+        camino = []
+        nodo = self.raiz
+        while nodo:
+            camino.append(nodo)
+            nodo = nodo.izquierda if nuevo.clave < nodo.clave else nodo.derecha
+        hijo = nuevo
+        for padre in reversed(camino):
+            if hijo.clave < padre.clave:
+                padre.izquierda = hijo
+            else:
+                padre.derecha = hijo
+            hijo = self._balancear(padre)
+        self.raiz = hijo
+        self._tamano += 1
+
+    def solapados(self, inicio, fin):
+        # Periodos que se solapan con [inicio, fin] (datetime.date, inclusive), en orden de fecha de inicio
+        resultado = []
+        pila = []
+        nodo = self.raiz
+        while pila or nodo:
+            # Se desciende por la izquierda mientras algún intervalo del subárbol pueda llegar a 'inicio'
+            while nodo and nodo.max_fin >= inicio:
+                pila.append(nodo)
+                nodo = nodo.izquierda
+            if not pila:
+                break
+            nodo = pila.pop()
+            if nodo.periodo.fecha_inicio > fin:
+                break  # Este y todos los siguientes en orden empiezan después de 'fin'
+            if nodo.periodo.fecha_fin >= inicio:
+                resultado.append(nodo.periodo)
+            nodo = nodo.derecha
+        return resultado
+
+    def activos_en(self, fecha):
+        # Periodos vigentes en una fecha
+        return self.solapados(fecha, fecha)
+
+    def __iter__(self):
+        # Recorrido en orden de fecha de inicio
+        pila = []
+        nodo = self.raiz
+        while pila or nodo:
+            while nodo:
+                pila.append(nodo)
+                nodo = nodo.izquierda
+            nodo = pila.pop()
+            yield nodo.periodo
+            nodo = nodo.derecha
 
 class ModuloRotaciones:
     # Lógica de rotación, temporada y rebajas
-    def __init__(self, lista_productos: ListaProductos):
+    def __init__(self, lista_productos: ListaProductos, contexto=None):
+        # contexto: ContextoBD opcional; por defecto, el mismo de la lista de productos
         if not isinstance(lista_productos, ListaProductos):
             raise TypeError("Se requiere una instancia de ListaProductos.")
         self.lista_productos = lista_productos
+        self.contexto = contexto or lista_productos.contexto
+        self.periodos = ArbolIntervalos()  # Periodos de la tabla Rotaciones indexados por fechas
+        self._periodos_por_producto = {}  # id_producto -> lista de PeriodoRotacion
+        self._cargar_periodos()
+
+    def _cargar_periodos(self):
+        # Carga la tabla Rotaciones en el árbol de intervalos
+        self.periodos = ArbolIntervalos()
+        self._periodos_por_producto = {}
+        conexion = conectar_db(self.contexto)
+        if not conexion:
+            return
+        try:
+            cursor = conexion.cursor()
+            cursor.execute("SELECT rowid, id_producto, fecha_inicio, fecha_fin, tipo FROM Rotaciones ORDER BY rowid")
+            for fila in cursor.fetchall():
+                self._indexar(PeriodoRotacion(fila[0], fila[1], fila[2], fila[3], fila[4]))  # Fechas ya decodificadas
+        except sqlite3.Error:
+            pass
+        finally:
+            conexion.close()
+
+    def _indexar(self, periodo):
+        self.periodos.insertar(periodo)
+        self._periodos_por_producto.setdefault(periodo.id_producto, []).append(periodo)
+
+    @medir("rotaciones.registrar_periodos")
+    def registrar_periodos(self, periodos):
+        # Registra varios periodos en la tabla Rotaciones con una sola escritura y los indexa en memoria
+        # periodos: lista de tuplas (id_producto, fecha_inicio, fecha_fin, tipo)
+        # Devuelve la lista de PeriodoRotacion creados, o None si hubo error
+        filas = []
+        for id_producto, fecha_inicio, fecha_fin, tipo in periodos:
+            fecha_inicio, fecha_fin = a_fecha(fecha_inicio), a_fecha(fecha_fin)
+            if fecha_inicio is None or fecha_fin is None or fecha_fin < fecha_inicio:
+                bus.emitir("rotacion.rechazada", "Periodo rechazado para producto ID {id_producto}: fechas no válidas o fin anterior al inicio.", AVISO, id_producto=id_producto)
+                continue
+            filas.append((id_producto, fecha_inicio, fecha_fin, tipo))
+        if not filas:
+            return []
+        diario = self.lista_productos.diario
+        creados = []
+        if diario:
+            # Escritura diferida: el rowid se asigna sin esperar a la BD
+            for id_producto, fecha_inicio, fecha_fin, tipo in filas:
+                id_periodo = diario.siguiente_id("Rotaciones", "rowid")
+                diario.insertar("Rotaciones", {"rowid": id_periodo, "id_producto": id_producto, "fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin, "tipo": tipo})
+                creados.append(PeriodoRotacion(id_periodo, id_producto, fecha_inicio, fecha_fin, tipo))
+        else:
+            conexion = conectar_db(self.contexto)
+            if not conexion: return None
+            try:
+                cursor = conexion.cursor()
+                for id_producto, fecha_inicio, fecha_fin, tipo in filas:
+                    cursor.execute("INSERT INTO Rotaciones (id_producto, fecha_inicio, fecha_fin, tipo) VALUES (?, ?, ?, ?)",
+                                   (id_producto, fecha_inicio, fecha_fin, tipo))
+                    creados.append(PeriodoRotacion(cursor.lastrowid, id_producto, fecha_inicio, fecha_fin, tipo))
+                conexion.commit()
+            except sqlite3.Error as e:
+                conexion.rollback()
+                bus.emitir("rotacion.error", "Error al registrar {periodos} periodo(s) de rotación: {error}", ERROR, periodos=len(filas), error=str(e))
+                return None
+            finally:
+                conexion.close()
+        for periodo in creados:
+            self._indexar(periodo)
+            bus.emitir("rotacion.registrada", "Periodo '{tipo_periodo}' registrado para producto ID {id_producto}: {inicio} a {fin}.",
+                       tipo_periodo=periodo.tipo, id_producto=periodo.id_producto, inicio=periodo.fecha_inicio, fin=periodo.fecha_fin)
+        return creados
+
+    def registrar_periodo(self, id_producto, fecha_inicio, fecha_fin, tipo):
+        # Registra un periodo de rotación o promoción; devuelve el PeriodoRotacion o None
+        creados = self.registrar_periodos([(id_producto, fecha_inicio, fecha_fin, tipo)])
+        return creados[0] if creados else None
+
+    @medir("rotaciones.periodos_activos")
+    def periodos_activos(self, fecha=None, tipo=None):
+        # Periodos vigentes en la fecha indicada (por defecto, hoy), opcionalmente de un tipo
+        dia = a_fecha(fecha) if fecha is not None else date.today()
+        if dia is None:
+            return []
+        encontrados = self.periodos.activos_en(dia)
+        return [p for p in encontrados if tipo is None or p.tipo == tipo]
+
+    @medir("rotaciones.periodos_en_rango")
+    def periodos_en_rango(self, fecha_inicio, fecha_fin, tipo=None):
+        # Periodos que se solapan con [fecha_inicio, fecha_fin], opcionalmente de un tipo
+        fecha_inicio, fecha_fin = a_fecha(fecha_inicio), a_fecha(fecha_fin)
+        if fecha_inicio is None or fecha_fin is None:
+            return []
+        encontrados = self.periodos.solapados(fecha_inicio, fecha_fin)
+        return [p for p in encontrados if tipo is None or p.tipo == tipo]
+
+    def historial_producto(self, id_producto):
+        # Todos los periodos registrados de un producto, en orden de registro
+        return list(self._periodos_por_producto.get(id_producto, []))
+
+    def productos_en_promocion(self, fecha=None, tipo=None):
+        # Productos con algún periodo vigente en la fecha (sin repetir)
+        ids = dict.fromkeys(p.id_producto for p in self.periodos_activos(fecha, tipo))
+        productos = []
+        for id_producto in ids:
+            nodo = self.lista_productos._indice.get(id_producto)
+            if nodo:
+                productos.append(nodo.producto)
+        return productos
 
     def verificar_temporada(self, producto_id: int) -> bool | None:
         # Verifica si un producto es de temporada
@@ -52,17 +304,14 @@ class ModuloRotaciones:
         fecha_limite = hoy + timedelta(days=dias_antes)  # Fecha límite para considerar productos próximos a expirar
         nodo_actual = self.lista_productos.raiz  # Nodo actual de la lista doblemente enlazada de productos
         productos_actualizados = 0  # Contador de productos a los que se les aplicó rebaja
+        periodos_nuevos = []  # Periodos de rebaja creados (se registran juntos en Rotaciones al final)
+        fin_lluviosa = date(hoy.year, 11, 30)  # La temporada lluviosa va de mayo a noviembre
+        fin_seca = date(hoy.year + (1 if hoy.month == 12 else 0), 4, 30)  # La temporada seca va de diciembre a abril
         while nodo_actual:
             p = nodo_actual.producto  # Instancia de Producto en el nodo actual
             if p.fecha_expiracion:
                 try:
-                    fecha_exp_str = p.fecha_expiracion  # Fecha de expiración en formato string o date
-                    if isinstance(fecha_exp_str, date):
-                        fecha_exp = fecha_exp_str  # Ya es un objeto date
-                    elif isinstance(fecha_exp_str, str):
-                        fecha_exp = date.fromisoformat(fecha_exp_str)  # Convertir string ISO a date
-                    else:
-                        raise TypeError("Formato de fecha de expiración no válido.")
+                    fecha_exp = p.fecha_expiracion  # Ya es un objeto date (decodificado al cargar)
                     # Rebaja por expiración: si el producto expira entre hoy y la fecha límite y no tiene rebaja activa
                     if hoy <= fecha_exp <= fecha_limite and p.rebaja == 0.0:
                         actualizado = self.lista_productos.actualizar_producto(
@@ -70,10 +319,11 @@ class ModuloRotaciones:
                             {'rebaja': porcentaje_rebaja}
                         )
                         if actualizado:
-                            print(f"💸 Rebaja ({porcentaje_rebaja*100}%) aplicada al producto ID {p.id_producto} ({p.nombre}) por proximidad de expiración.")
+                            bus.emitir("rebaja.expiracion", "💸 Rebaja ({porcentaje}%) aplicada al producto ID {id_producto} ({nombre}) por proximidad de expiración.", porcentaje=porcentaje_rebaja*100, id_producto=p.id_producto, nombre=p.nombre)
+                            periodos_nuevos.append((p.id_producto, hoy, fecha_exp, TIPO_REBAJA_EXPIRACION))
                             productos_actualizados += 1
                         else:
-                            print(f"Error al intentar actualizar la rebaja para el producto ID {p.id_producto}.")
+                            bus.emitir("rebaja.error", "Error al intentar actualizar la rebaja para el producto ID {id_producto}.", ERROR, id_producto=p.id_producto)
                     # Rebaja por temporada lluviosa/seca (ejemplo: meses 5-11 lluviosa, 12-4 seca)
                     mes = hoy.month  # Mes actual (1-12)
                     if p.temporalidad:
@@ -84,7 +334,8 @@ class ModuloRotaciones:
                                 {'rebaja': 0.15}
                             )
                             if actualizado:
-                                print(f"🌧️ Rebaja de temporada lluviosa aplicada a {p.nombre}.")
+                                bus.emitir("rebaja.temporada", "🌧️ Rebaja de temporada lluviosa aplicada a {nombre}.", id_producto=p.id_producto, nombre=p.nombre, rebaja=0.15)
+                                periodos_nuevos.append((p.id_producto, hoy, fin_lluviosa, TIPO_TEMPORADA_LLUVIOSA))
                                 productos_actualizados += 1
                         # Si es temporada seca y no tiene rebaja activa
                         elif (mes < 5 or mes > 11) and p.rebaja == 0.0:
@@ -93,11 +344,14 @@ class ModuloRotaciones:
                                 {'rebaja': 0.10}
                             )
                             if actualizado:
-                                print(f"☀️ Rebaja de temporada seca aplicada a {p.nombre}.")
+                                bus.emitir("rebaja.temporada", "☀️ Rebaja de temporada seca aplicada a {nombre}.", id_producto=p.id_producto, nombre=p.nombre, rebaja=0.10)
+                                periodos_nuevos.append((p.id_producto, hoy, fin_seca, TIPO_TEMPORADA_SECA))
                                 productos_actualizados += 1
                 except (ValueError, TypeError) as e:
-                    print(f"Advertencia: No se pudo procesar fecha de expiración para producto ID {p.id_producto}. Razón: {e}")
+                    bus.emitir("rebaja.fecha_invalida", "Advertencia: No se pudo procesar fecha de expiración para producto ID {id_producto}. Razón: {error}", AVISO, id_producto=p.id_producto, error=str(e))
             nodo_actual = nodo_actual.siguiente
+        if periodos_nuevos:
+            self.registrar_periodos(periodos_nuevos)
         if productos_actualizados == 0:
-            print("No se aplicaron nuevas rebajas por expiración o temporada en esta ejecución.")
+            bus.emitir("rebaja.ninguna", "No se aplicaron nuevas rebajas por expiración o temporada en esta ejecución.")
         return productos_actualizados
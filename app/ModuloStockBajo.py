@@ -0,0 +1,131 @@
+import threading
+from bisect import bisect_left, insort
+try:
+    from .ModuloEventos import bus, AVISO, INFO
+    from .ModuloMetricas import medir
+except ImportError:
+    from ModuloEventos import bus, AVISO, INFO
+    from ModuloMetricas import medir
+
+# Índice de productos en o por debajo de su umbral (umbral_stock del producto o, si no tiene, el global)
+# Por defecto un producto entra al índice con stock <= umbral, como las alertas de stock mínimo del reporte
+# logístico (antes p.stock <= 5); con inclusivo=False entra solo con stock < umbral, la regla de reabastecimiento
+# de las simulaciones. El reporte usa ahora el umbral_stock de cada producto (que el ajuste semanal puede
+# reescribir) en lugar del 5 fijo; los productos sin umbral propio siguen usando 5.
+# El índice se suscribe a los cambios de ListaProductos y solo reevalúa el producto que cambió: su entrada en
+# la lista ordenada por holgura (stock - umbral, la más negativa primero) se ubica por búsqueda binaria,
+# O(log k) comparaciones sobre los k productos del índice. Insertar o quitar en la lista de Python desplaza
+# además hasta k entradas (O(k), un memmove): se acepta porque k es solo la parte del catálogo bajo su umbral y
+# a cambio la lectura de los más comprometidos es un corte directo de la lista, sin heap ni árbol que mantener.
+# Consultar los k productos más comprometidos cuesta O(k), sin recorrer el catálogo.
+# Los suscriptores reciben cada cruce del umbral: funcion(producto, bajo) con bajo=True al caer por debajo
+# y bajo=False al recuperarse (p. ej. tras una orden de compra).
+
+UMBRAL_STOCK_POR_DEFECTO = 5  # Stock mínimo de los productos sin umbral propio
+CAMPOS_UMBRAL = frozenset(("stock", "umbral_stock"))  # Campos que pueden mover un producto dentro o fuera del índice
+
+class IndiceStockBajo:
+    def __init__(self, productos, umbral_por_defecto=UMBRAL_STOCK_POR_DEFECTO, emitir_eventos=True, inclusivo=True):
+        # productos: ListaProductos observada
+        # umbral_por_defecto: stock mínimo de los productos con umbral_stock None
+        # emitir_eventos: si True, cada cruce se emite también como evento "stock.bajo" / "stock.repuesto"
+        # inclusivo: si True un producto con stock igual a su umbral ya está en el índice (stock <= umbral)
+        self.productos = productos
+        self.umbral_por_defecto = umbral_por_defecto
+        self.inclusivo = inclusivo
+        self.emitir_eventos = emitir_eventos
+        self._holguras = {}  # id_producto -> holgura (stock - umbral) de los productos en el índice
+        self._orden = []  # (holgura, id_producto) ordenado: los más comprometidos primero
+        self._suscriptores = []  # Funciones (producto, bajo) avisadas en cada cruce
+        self._cerrojo = threading.Lock()  # Los ajustes de stock pueden llegar desde varias terminales a la vez
+        self._reconstruir()
+        productos.suscribir_cambios(self._al_cambiar)
+
+    def umbral_de(self, producto):
+        return producto.umbral_stock if producto.umbral_stock is not None else self.umbral_por_defecto
+
+    def _bajo(self, holgura):
+        return holgura <= 0 if self.inclusivo else holgura < 0
+
+    def _reconstruir(self):
+        # Recorre el catálogo una vez (al crear el índice o tras una recarga completa de la lista)
+        self._holguras = {}
+        for producto in self.productos:
+            holgura = producto.stock - self.umbral_de(producto)
+            if self._bajo(holgura):
+                self._holguras[producto.id_producto] = holgura
+        self._orden = sorted((h, i) for i, h in self._holguras.items())
+
+    def _quitar(self, id_producto):
+        holgura = self._holguras.pop(id_producto)
+        del self._orden[bisect_left(self._orden, (holgura, id_producto))]
+
+    def _al_cambiar(self, id_producto, campos):
+        # Observador de ListaProductos: reubica solo el producto afectado
+        if id_producto is None:
+            with self._cerrojo:
+                self._reconstruir()
+            return
+        if campos is not None and CAMPOS_UMBRAL.isdisjoint(campos):
+            return
+        with self._cerrojo:
+            estaba = id_producto in self._holguras
+            if estaba:
+                self._quitar(id_producto)
+            nodo = self.productos._indice.get(id_producto) if campos is not None else None
+            if nodo is None:  # Producto eliminado: deja el índice sin avisar un cruce
+                return
+            producto = nodo.producto
+            holgura = producto.stock - self.umbral_de(producto)
+            esta = self._bajo(holgura)
+            if esta:
+                self._holguras[id_producto] = holgura
+                insort(self._orden, (holgura, id_producto))
+        if esta != estaba:
+            self._avisar(producto, esta)
+
+    def _avisar(self, producto, bajo):
+        if self.emitir_eventos:
+            if bajo:
+                bus.emitir("stock.bajo", "📉 Stock bajo en '{nombre}' (ID {id_producto}): {stock} (mínimo {umbral}).", AVISO,
+                           id_producto=producto.id_producto, nombre=producto.nombre, stock=producto.stock, umbral=self.umbral_de(producto))
+            else:
+                bus.emitir("stock.repuesto", "Stock de '{nombre}' (ID {id_producto}) repuesto: {stock} (mínimo {umbral}).", INFO,
+                           id_producto=producto.id_producto, nombre=producto.nombre, stock=producto.stock, umbral=self.umbral_de(producto))
+        for funcion in self._suscriptores:
+            funcion(producto, bajo)
+
+    def suscribir(self, funcion):
+        # Registra funcion(producto, bajo), llamada cada vez que un producto cruza su umbral
+        # Devuelve la función para poder desuscribirla
+        self._suscriptores.append(funcion)
+        return funcion
+
+    def desuscribir(self, funcion):
+        if funcion in self._suscriptores:
+            self._suscriptores.remove(funcion)
+
+    def __len__(self):
+        return len(self._holguras)
+
+    def __contains__(self, id_producto):
+        return id_producto in self._holguras
+
+    @medir("stock_bajo.consultar")
+    def bajo_umbral(self, limite=None):
+        # Productos bajo su umbral, del más comprometido (stock más por debajo del mínimo) al menos
+        # limite: máximo de productos a devolver (O(limite), sin recorrer el catálogo)
+        with self._cerrojo:
+            entradas = self._orden[:] if limite is None else self._orden[:limite]
+        nodos = (self.productos._indice.get(id_producto) for _, id_producto in entradas)
+        return [nodo.producto for nodo in nodos if nodo]
+
+    def alertas(self, limite=None):
+        # Textos de alerta de los productos bajo el umbral (para reportes)
+        return [f"⚠️ Stock mínimo para producto {p.nombre} (ID {p.id_producto}): {p.stock} (mínimo {self.umbral_de(p)})"
+                for p in self.bajo_umbral(limite)]
+
+    def cerrar(self):
+        # Deja de observar la lista de productos
+        self.productos.desuscribir_cambios(self._al_cambiar)
+        self._suscriptores.clear()
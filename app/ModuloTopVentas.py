@@ -0,0 +1,274 @@
+import heapq
+from bisect import bisect_left, insort
+from datetime import timedelta
+from operator import itemgetter
+try:
+    from .ModuloMetricas import medir
+    from .ModuloPronosticos import unidades_por_producto, ventas_por_dia
+except ImportError:
+    from ModuloMetricas import medir
+    from ModuloPronosticos import unidades_por_producto, ventas_por_dia
+from bd.BDSQLite import a_fecha
+
+# Productos más y menos vendidos sobre una ventana deslizante de días, actualizados movimiento a movimiento
+# Cada día de la ventana es una cubeta con contadores exactos por producto y, calculada al consultarla, su
+# lista ordenada acotada a los 'tamano_cubeta' productos con más unidades. Sobre la ventana completa se
+# mantienen además los totales exactos por producto agrupados por nivel (total -> productos con ese total).
+# - Ventana completa: el top/bottom K se lee recorriendo los niveles desde un extremo, sin mirar el resto
+#   del catálogo.
+# - Últimos N días (N menor que la ventana): el top K combina las listas acotadas de las N cubetas con el
+#   algoritmo de umbral (se detiene cuando el K-ésimo total exacto supera la cota de los no vistos), con
+#   costo proporcional a K y N; solo si las listas acotadas no alcanzan se recorren las N cubetas enteras.
+# Los totales no dependen del largo del historial: los días que salen de la ventana se descuentan.
+
+VENTANA_DIAS = 30  # Días que cubre la ventana deslizante
+TAMANO_CUBETA = 64  # Productos conservados en la lista ordenada de cada día
+TIPOS_VENTA = ("venta",)  # Tipos de movimiento que cuentan como ventas
+
+class CubetaDia:
+    # Unidades por producto de un día de la ventana
+    __slots__ = ("fecha", "conteos", "_orden")
+
+    def __init__(self, fecha):
+        self.fecha = fecha
+        self.conteos = {}  # id_producto -> unidades del día (exacto)
+        self._orden = None  # [(id_producto, unidades)] descendente y acotada; None = por recalcular
+
+    def sumar(self, id_producto, unidades):
+        total = self.conteos.get(id_producto, 0) + unidades
+        if total > 0:
+            self.conteos[id_producto] = total
+        else:
+            self.conteos.pop(id_producto, None)
+        self._orden = None
+
+    def orden(self, tamano):
+        # Lista acotada de los productos del día con más unidades (se recalcula solo si la cubeta cambió)
+        if self._orden is None:
+            self._orden = heapq.nlargest(tamano, self.conteos.items(), key=itemgetter(1))
+        return self._orden
+
+class TopVentas:
+    def __init__(self, ventana_dias=VENTANA_DIAS, tamano_cubeta=TAMANO_CUBETA, tipos=TIPOS_VENTA):
+        # ventana_dias: días de historia que se conservan; tamano_cubeta: largo de la lista ordenada por día
+        # tipos: tipos de movimiento que se cuentan
+        self.ventana_dias = ventana_dias
+        self.tamano_cubeta = tamano_cubeta
+        self.tipos = tuple(t.lower() for t in tipos)
+        self.hoy = None  # Fecha más reciente vista (fin de la ventana)
+        self._cubetas = {}  # fecha -> CubetaDia (solo fechas dentro de la ventana)
+        self._totales = {}  # id_producto -> unidades en la ventana completa (exacto)
+        self._por_total = {}  # total -> set de id_producto con ese total
+        self._niveles = []  # Totales presentes en _por_total, ordenados
+        self._transacciones = None  # ListaTransacciones observada (para resolver los productos de un movimiento)
+        self._movimientos = None  # ListaMovimientos observada
+
+    # --- Actualización ---
+
+    def _mover(self, id_producto, unidades):
+        # Ajusta el total de la ventana de un producto y lo cambia de nivel
+        anterior = self._totales.get(id_producto, 0)
+        nuevo = anterior + unidades
+        if anterior:
+            grupo = self._por_total[anterior]
+            grupo.discard(id_producto)
+            if not grupo:
+                del self._por_total[anterior]
+                del self._niveles[bisect_left(self._niveles, anterior)]
+        if nuevo > 0:
+            self._totales[id_producto] = nuevo
+            grupo = self._por_total.get(nuevo)
+            if grupo is None:
+                grupo = self._por_total[nuevo] = set()
+                insort(self._niveles, nuevo)
+            grupo.add(id_producto)
+        else:
+            self._totales.pop(id_producto, None)
+
+    def _avanzar(self, fecha):
+        # Mueve el fin de la ventana hasta 'fecha' y descuenta los días que salen de ella
+        if self.hoy is not None and fecha <= self.hoy:
+            return
+        self.hoy = fecha
+        limite = fecha - timedelta(days=self.ventana_dias - 1)
+        for vieja in [f for f in self._cubetas if f < limite]:
+            for id_producto, unidades in self._cubetas.pop(vieja).conteos.items():
+                self._mover(id_producto, -unidades)
+
+    def registrar(self, fecha, productos, signo=1):
+        # Suma (signo 1) o resta (signo -1) las unidades de una venta del día 'fecha'
+        # productos: productos de la transacción (IDs, dicts {"id", "cantidad"} o su texto JSON)
+        # Devuelve False si la fecha no es válida o ya salió de la ventana
+        fecha = a_fecha(fecha)
+        if fecha is None:
+            return False
+        self._avanzar(fecha)
+        if fecha <= self.hoy - timedelta(days=self.ventana_dias):
+            return False
+        cubeta = self._cubetas.get(fecha)
+        if cubeta is None:
+            cubeta = self._cubetas[fecha] = CubetaDia(fecha)
+        for id_producto, unidades in unidades_por_producto(productos).items():
+            if id_producto is None or not unidades:
+                continue
+            unidades *= signo
+            unidades = max(unidades, -cubeta.conteos.get(id_producto, 0))  # Nunca por debajo de cero
+            cubeta.sumar(id_producto, unidades)
+            self._mover(id_producto, unidades)
+        return True
+
+    def reiniciar(self):
+        self.hoy = None
+        self._cubetas.clear()
+        self._totales.clear()
+        self._por_total.clear()
+        self._niveles.clear()
+
+    @medir("top_ventas.cargar")
+    def cargar(self, transacciones, movimientos, hasta=None):
+        # Reconstruye la ventana desde el historial (una pasada por movimientos y otra por transacciones)
+        # hasta: fin de la ventana (por defecto, la venta más reciente)
+        self.reiniciar()
+        hasta = a_fecha(hasta)
+        desde = hasta - timedelta(days=self.ventana_dias - 1) if hasta else None
+        dias = ventas_por_dia(transacciones, movimientos, desde, hasta)
+        if hasta:
+            self._avanzar(hasta)
+        for fecha in sorted(dias):
+            self.registrar(fecha, [{"id": i, "cantidad": u} for i, u in dias[fecha].items()])
+
+    # --- Observación incremental ---
+
+    def observar(self, transacciones, movimientos):
+        # Carga el historial y se suscribe a los movimientos: cada venta registrada o eliminada actualiza la ventana
+        self._transacciones = transacciones
+        self._movimientos = movimientos
+        self.cargar(transacciones, movimientos)
+        movimientos.suscribir_movimientos(self._al_movimiento)
+        return self
+
+    def _buscar_transaccion(self, id_transaccion):
+        # Las ventas se registran justo después de su transacción: se busca desde la cola
+        nodo = self._transacciones.cola
+        while nodo:
+            if nodo.transaccion.id_transaccion == id_transaccion:
+                return nodo.transaccion
+            nodo = nodo.anterior
+        return None
+
+    def _al_movimiento(self, movimiento, signo):
+        if movimiento is None:  # La lista de movimientos se recargó
+            self.cargar(self._transacciones, self._movimientos)
+            return
+        if (movimiento.tipo or "").lower() not in self.tipos:
+            return
+        t = self._buscar_transaccion(movimiento.id_transaccion)
+        if t is not None:
+            self.registrar(movimiento.fecha, t.productos, signo)
+
+    def cerrar(self):
+        # Deja de observar la lista de movimientos
+        if self._movimientos is not None:
+            self._movimientos.desuscribir_movimientos(self._al_movimiento)
+        self._transacciones = self._movimientos = None
+
+    # --- Consultas ---
+
+    def _cubetas_de(self, dias, hoy):
+        # Cubetas de los últimos 'dias' días hasta 'hoy'; None si coinciden con la ventana completa
+        hoy = a_fecha(hoy) if hoy is not None else self.hoy
+        if hoy is None:
+            return []
+        dias = self.ventana_dias if dias is None else max(0, dias)
+        if hoy == self.hoy and dias >= self.ventana_dias:
+            return None
+        desde = hoy - timedelta(days=dias - 1)
+        return [c for f, c in self._cubetas.items() if desde <= f <= hoy]
+
+    def _desde_niveles(self, k, mayores):
+        # K productos recorriendo los niveles de la ventana completa desde un extremo
+        resultado = []
+        niveles = reversed(self._niveles) if mayores else iter(self._niveles)
+        for total in niveles:
+            faltan = k - len(resultado)
+            if faltan <= 0:
+                break
+            for id_producto in heapq.nsmallest(faltan, self._por_total[total]):
+                resultado.append((id_producto, total))
+        return resultado
+
+    @medir("top_ventas.mas_vendidos")
+    def mas_vendidos(self, k=10, dias=None, hoy=None):
+        # Los k productos con más unidades vendidas en los últimos 'dias' días (por defecto, toda la ventana)
+        # Devuelve [(id_producto, unidades)] de mayor a menor
+        if k <= 0:
+            return []
+        cubetas = self._cubetas_de(dias, hoy)
+        if cubetas is None:
+            return self._desde_niveles(k, True)
+        if not cubetas:
+            return []
+        return self._umbral(k, cubetas)
+
+    def _umbral(self, k, cubetas):
+        # Algoritmo de umbral sobre las listas ordenadas de las cubetas: tras recorrer la profundidad d, ningún
+        # producto no visto puede superar la suma de los valores en d de cada lista (cota de los no vistos)
+        listas = [c.orden(self.tamano_cubeta) for c in cubetas]
+        completas = [len(l) == len(c.conteos) for l, c in zip(listas, cubetas)]
+        mejores = []  # Montículo de mínimos (unidades, -id_producto) con los k mejores vistos
+        vistos = set()
+        profundidad = 0
+        while True:
+            cota = 0
+            avanzo = False
+            for lista, completa in zip(listas, completas):
+                if profundidad < len(lista):
+                    id_producto, unidades = lista[profundidad]
+                    cota += unidades
+                    avanzo = True
+                    if id_producto not in vistos:
+                        vistos.add(id_producto)
+                        total = sum(c.conteos.get(id_producto, 0) for c in cubetas)  # Total exacto
+                        entrada = (total, -id_producto)
+                        if len(mejores) < k:
+                            heapq.heappush(mejores, entrada)
+                        elif entrada > mejores[0]:
+                            heapq.heapreplace(mejores, entrada)
+                elif not completa and lista:
+                    cota += lista[-1][1]  # Lo que quedó fuera de la lista acotada no supera su último valor
+            if len(mejores) >= k and mejores[0][0] >= cota:
+                break
+            if not avanzo:
+                if any(not completa for completa in completas):
+                    return self._recorrido_completo(k, cubetas, True)
+                break
+            profundidad += 1
+        return [(-menos_id, total) for total, menos_id in sorted(mejores, reverse=True)]
+
+    def _recorrido_completo(self, k, cubetas, mayores):
+        # Totales exactos de todos los productos de las cubetas (respaldo del algoritmo de umbral y bottom K)
+        totales = {}
+        for c in cubetas:
+            for id_producto, unidades in c.conteos.items():
+                totales[id_producto] = totales.get(id_producto, 0) + unidades
+        if mayores:
+            return heapq.nsmallest(k, totales.items(), key=lambda par: (-par[1], par[0]))
+        return heapq.nsmallest(k, totales.items(), key=lambda par: (par[1], par[0]))
+
+    @medir("top_ventas.menos_vendidos")
+    def menos_vendidos(self, k=10, dias=None, hoy=None):
+        # Los k productos con menos unidades vendidas (entre los que vendieron algo) en los últimos 'dias' días
+        # Devuelve [(id_producto, unidades)] de menor a mayor
+        if k <= 0:
+            return []
+        cubetas = self._cubetas_de(dias, hoy)
+        if cubetas is None:
+            return self._desde_niveles(k, False)
+        return self._recorrido_completo(k, cubetas, False) if cubetas else []
+
+    def unidades(self, id_producto, dias=None, hoy=None):
+        # Unidades vendidas de un producto en los últimos 'dias' días
+        cubetas = self._cubetas_de(dias, hoy)
+        if cubetas is None:
+            return self._totales.get(id_producto, 0)
+        return sum(c.conteos.get(id_producto, 0) for c in cubetas)
@@ -2,13 +2,16 @@ import sqlite3
 import json
 import os
 try:
-    from bd.BDSQLite import conectar_db
+    from bd.BDSQLite import conectar_db, a_fecha
 except ImportError:
     import sys
     current_dir = os.path.dirname(os.path.abspath(__file__))
     parent_dir = os.path.dirname(current_dir)
     sys.path.append(parent_dir)
-    from bd.BDSQLite import conectar_db
+    from bd.BDSQLite import conectar_db, a_fecha
+from app.ModuloConsultas import BackendSQL, elegir_backend, BACKEND_SQL
+from app.ModuloEventos import bus
+from app.ModuloMetricas import metricas, medir
 
 class NodoTransaccion:
     # Nodo de lista doblemente enlazada para transacciones
@@ -25,64 +28,109 @@ class Transaccion:
         self.id_proveedor = id_proveedor
         self.productos = productos
         self.total = total
-        self.fecha = fecha
+        self.fecha = fecha  # Fecha de la transacción (datetime.date)
         self.tipo_pago = tipo_pago
         self.estado = estado
 
 class ListaTransacciones:
     # Lista doblemente enlazada de transacciones con sincronización a BD
-    def __init__(self):
+    def __init__(self, cargar=True, contexto=None):
+        # cargar: si False, la lista se crea vacía (p. ej. para poblarla desde una instantánea)
+        # contexto: ContextoBD opcional (ruta, URI o ":memory:"); sin él se usa la BD configurada
+        self.contexto = contexto
         self.raiz = None
-        self._cargar_desde_db()
+        self.cola = None  # Último nodo de la lista (inserción O(1) al final)
+        self._largo = 0  # Número de nodos (len() en O(1))
+        self.consultas_sql = BackendSQL(self.contexto)  # Backend para consultas empujadas a SQLite
+        self.diario = None  # DiarioEscritura opcional (modo de escritura diferida)
+        if cargar:
+            self._cargar_desde_db()
 
+    @medir("transacciones.cargar")
     def _cargar_desde_db(self):
         # Carga transacciones desde la base de datos
-        self.raiz = None
-        conexion = conectar_db()
+        if self.diario:
+            self.diario.flush()  # La BD debe reflejar lo pendiente antes de recargar
+        conexion = conectar_db(self.contexto)
         if not conexion: return
         try:
             cursor = conexion.cursor()
             cursor.execute("SELECT * FROM Transacciones")
-            filas = cursor.fetchall()
-            for fila in filas:
-                try:
-                    productos_lista = json.loads(fila[3]) if fila[3] else []
-                except json.JSONDecodeError:
-                    productos_lista = []
-                # Asegurarse de que el total sea float
-                total_val = float(fila[4]) if fila[4] is not None else 0.0
-                transaccion = Transaccion(
-                    id_transaccion=fila[0],
-                    id_cliente=fila[1],
-                    id_proveedor=fila[2],
-                    productos=productos_lista,
-                    total=total_val,
-                    fecha=fila[5],
-                    tipo_pago=fila[6],
-                    estado=fila[7]
-                )
-                self._agregar_nodo(transaccion)
+            self._cargar_filas(cursor.fetchall())
         except sqlite3.Error as e:
             pass
         finally:
             if conexion: conexion.close()
 
+    def _cargar_filas(self, filas, reiniciar=True):
+        # Construye la lista a partir de filas de la tabla Transacciones (BD o instantánea)
+        # reiniciar: si False, las filas se anexan a la lista existente (carga incremental)
+        if reiniciar:
+            self.raiz = None
+            self.cola = None
+            self._largo = 0
+        metricas.filas_cargadas("Transacciones", len(filas))
+        for fila in filas:
+            if isinstance(fila[3], list):
+                productos_lista = fila[3]  # Ya decodificado (instantánea)
+            else:
+                try:
+                    productos_lista = json.loads(fila[3]) if fila[3] else []
+                except json.JSONDecodeError:
+                    productos_lista = []
+            # Asegurarse de que el total sea float
+            total_val = float(fila[4]) if fila[4] is not None else 0.0
+            transaccion = Transaccion(
+                id_transaccion=fila[0],
+                id_cliente=fila[1],
+                id_proveedor=fila[2],
+                productos=productos_lista,
+                total=total_val,
+                fecha=fila[5],
+                tipo_pago=fila[6],
+                estado=fila[7]
+            )
+            self._agregar_nodo(transaccion)
+
     def _agregar_nodo(self, transaccion):
         # Agrega un nodo a la lista
         nuevo_nodo = NodoTransaccion(transaccion)
         if self.raiz is None:
             self.raiz = nuevo_nodo
         else:
-            nodo_actual = self.raiz
-            while nodo_actual.siguiente is not None:
-                nodo_actual = nodo_actual.siguiente
-            nodo_actual.siguiente = nuevo_nodo
-            nuevo_nodo.anterior = nodo_actual
+            self.cola.siguiente = nuevo_nodo
+            nuevo_nodo.anterior = self.cola
+        self.cola = nuevo_nodo
+        self._largo += 1
         return nuevo_nodo
 
+    def __len__(self):
+        return self._largo
+
+    def __iter__(self):
+        # Recorre las transacciones en orden de inserción sin construir listas intermedias
+        nodo_actual = self.raiz
+        while nodo_actual:
+            yield nodo_actual.transaccion
+            nodo_actual = nodo_actual.siguiente
+
+    @medir("transacciones.registrar_transaccion")
     def registrar_transaccion(self, id_cliente=None, productos=None, total=0.0, fecha=None, tipo_pago=None, estado=None, id_proveedor=None):
         # Registra una transacción en la BD y la lista
-        conexion = conectar_db()
+        # fecha: date o texto ISO (en memoria se guarda como date)
+        fecha = a_fecha(fecha)
+        if self.diario:
+            id_transaccion = self.diario.siguiente_id("Transacciones", "id_transaccion")
+            self.diario.insertar("Transacciones", {
+                "id_transaccion": id_transaccion, "id_cliente": id_cliente, "id_proveedor": id_proveedor,
+                "productos": json.dumps(productos) if productos is not None else "[]", "total": total,
+                "fecha": fecha, "tipo_pago": tipo_pago, "estado": estado
+            })
+            transaccion = Transaccion(id_transaccion, id_cliente, id_proveedor, productos, total, fecha, tipo_pago, estado)
+            nuevo_nodo = self._agregar_nodo(transaccion)
+            bus.emitir("transaccion.registrada", "Transacción registrada con ID: {id_transaccion}", id_transaccion=id_transaccion)
+            return nuevo_nodo.transaccion
+        conexion = conectar_db(self.contexto)
         if not conexion: return None
         try:
             productos_json = json.dumps(productos) if productos is not None else "[]"
@@ -95,7 +143,7 @@ class ListaTransacciones:
             conexion.commit()
             transaccion = Transaccion(id_transaccion, id_cliente, id_proveedor, productos, total, fecha, tipo_pago, estado)
             nuevo_nodo = self._agregar_nodo(transaccion)
-            print(f"Transacción registrada con ID: {id_transaccion}")
+            bus.emitir("transaccion.registrada", "Transacción registrada con ID: {id_transaccion}", id_transaccion=id_transaccion)
             return nuevo_nodo.transaccion
         except sqlite3.Error as e:
             if conexion: conexion.rollback()
@@ -106,8 +154,15 @@ class ListaTransacciones:
         finally:
             if conexion: conexion.close()
 
+    def aplicar_transaccion_confirmada(self, transaccion):
+        # Agrega a la lista una transacción que otro módulo ya escribió en la BD (p. ej. una orden de compra)
+        return self._agregar_nodo(transaccion).transaccion
+
+    @medir("transacciones.actualizar_transaccion")
     def actualizar_transaccion(self, id_transaccion, nuevos_datos):
         # Actualiza una transacción en la lista y la BD
+        if "fecha" in nuevos_datos:
+            nuevos_datos = dict(nuevos_datos, fecha=a_fecha(nuevos_datos["fecha"]))
         nodo_actual = self.raiz
         transaccion_encontrada = None
         while nodo_actual:
@@ -122,7 +177,15 @@ class ListaTransacciones:
             self._cargar_desde_db()
             return False
 
-        conexion = conectar_db()
+        if self.diario:
+            datos_actualizar = nuevos_datos.copy()
+            if 'productos' in datos_actualizar:
+                datos_actualizar['productos'] = json.dumps(datos_actualizar['productos'])
+            self.diario.actualizar("Transacciones", "id_transaccion", id_transaccion, datos_actualizar)
+            bus.emitir("transaccion.actualizada", "Transacción ID {id_transaccion} actualizada (escritura diferida).", id_transaccion=id_transaccion)
+            return True
+
+        conexion = conectar_db(self.contexto)
         if not conexion: return False
         try:
             cursor = conexion.cursor()
@@ -136,7 +199,7 @@ class ListaTransacciones:
             if cursor.rowcount == 0:
                 return False
             conexion.commit()
-            print(f"Transacción ID {id_transaccion} actualizada en la BD.")
+            bus.emitir("transaccion.actualizada", "Transacción ID {id_transaccion} actualizada en la BD.", id_transaccion=id_transaccion)
             return True
         except sqlite3.Error as e:
             if conexion: conexion.rollback()
@@ -147,24 +210,29 @@ class ListaTransacciones:
         finally:
             if conexion: conexion.close()
 
+    @medir("transacciones.eliminar_transaccion")
     def eliminar_transaccion(self, id_transaccion):
         # Elimina una transacción de la BD y la lista
-        conexion = conectar_db()
-        if not conexion: return False
         eliminado_db = False
-        try:
-            cursor = conexion.cursor()
-            cursor.execute("PRAGMA foreign_keys = ON")
-            cursor.execute("DELETE FROM Transacciones WHERE id_transaccion = ?", (id_transaccion,))
-            if cursor.rowcount > 0:
-                conexion.commit()
-                eliminado_db = True
-                print(f"Transacción ID {id_transaccion} eliminada de la BD (y movimientos asociados).")
-        except sqlite3.Error as e:
-            if conexion: conexion.rollback()
-            return False
-        finally:
-            if conexion: conexion.close()
+        if self.diario:
+            self.diario.eliminar("Transacciones", "id_transaccion", id_transaccion)
+            # En modo diferido la lista en memoria decide si había algo que eliminar
+        else:
+            conexion = conectar_db(self.contexto)
+            if not conexion: return False
+            try:
+                cursor = conexion.cursor()
+                cursor.execute("PRAGMA foreign_keys = ON")
+                cursor.execute("DELETE FROM Transacciones WHERE id_transaccion = ?", (id_transaccion,))
+                if cursor.rowcount > 0:
+                    conexion.commit()
+                    eliminado_db = True
+                    bus.emitir("transaccion.eliminada", "Transacción ID {id_transaccion} eliminada de la BD (y movimientos asociados).", id_transaccion=id_transaccion)
+            except sqlite3.Error as e:
+                if conexion: conexion.rollback()
+                return False
+            finally:
+                if conexion: conexion.close()
 
         nodo_actual = self.raiz
         while nodo_actual:
@@ -175,7 +243,10 @@ class ListaTransacciones:
                     self.raiz = nodo_actual.siguiente
                 if nodo_actual.siguiente:
                     nodo_actual.siguiente.anterior = nodo_actual.anterior
-                print(f"Transacción ID {id_transaccion} eliminada de la lista.")
+                if nodo_actual is self.cola:
+                    self.cola = nodo_actual.anterior
+                self._largo -= 1
+                bus.emitir("transaccion.eliminada", "Transacción ID {id_transaccion} eliminada de la lista.", id_transaccion=id_transaccion)
                 return True
             nodo_actual = nodo_actual.siguiente
 
@@ -185,38 +256,83 @@ class ListaTransacciones:
         else:
             return False
 
-    def consultar_transacciones(self, id_cliente=None, fecha=None, id_proveedor=None):
-        # Consulta transacciones por ID de cliente, proveedor o fecha
-        nodo_actual = self.raiz
-        resultados = []
-        while nodo_actual:
-            t = nodo_actual.transaccion
-            if (id_cliente is None or t.id_cliente == id_cliente) and \
-               (id_proveedor is None or t.id_proveedor == id_proveedor) and \
-               (fecha is None or t.fecha == fecha):
-                resultados.append(t)
-            nodo_actual = nodo_actual.siguiente
-        return resultados
+    @medir("transacciones.consultar_transacciones")
+    def consultar_transacciones(self, id_cliente=None, fecha=None, id_proveedor=None, fecha_inicio=None, fecha_fin=None, backend=None, limite=None, descendente=False):
+        # Consulta transacciones por ID de cliente, proveedor, fecha exacta o rango de fechas
+        # backend: "memoria" (por defecto), "sql" o "auto"; la ruta SQL devuelve filas ligeras
+        # limite: número máximo de resultados; descendente: si True, las más recientes primero
+        if elegir_backend(backend, self.consultas_sql, "Transacciones") == BACKEND_SQL:
+            if self.diario:
+                self.diario.flush()  # La consulta SQL debe ver las escrituras diferidas
+            filtros = {}
+            if id_cliente is not None: filtros["id_cliente"] = id_cliente
+            if id_proveedor is not None: filtros["id_proveedor"] = id_proveedor
+            if fecha is not None: filtros["fecha"] = a_fecha(fecha)
+            return self.consultas_sql.consultar(
+                "Transacciones", filtros=filtros, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+                descendente=descendente, limite=limite
+            )
+        return list(self.iterar_transacciones(
+            id_cliente, fecha, id_proveedor, fecha_inicio, fecha_fin, limite=limite, descendente=descendente
+        ))
+
+    def iterar_transacciones(self, id_cliente=None, fecha=None, id_proveedor=None, fecha_inicio=None, fecha_fin=None, desde=0, limite=None, descendente=False):
+        # Generador de transacciones con los mismos filtros que consultar_transacciones (en memoria)
+        # desde: coincidencias a omitir al inicio (paginación); limite: máximo de coincidencias a entregar
+        # descendente: si True, recorre desde la cola (las más recientes primero)
+        # El recorrido se detiene en cuanto se entrega la última coincidencia pedida o el llamador deja de iterar
+        limites = [fecha, fecha_inicio, fecha_fin]
+        for i, valor in enumerate(limites):
+            if valor is not None:
+                limites[i] = a_fecha(valor)
+                if limites[i] is None:
+                    return  # Fecha no válida: no hay coincidencias
+        fecha, fecha_inicio, fecha_fin = limites
+        nodo_actual = self.cola if descendente else self.raiz
+        coincidencias = 0
+        entregados = 0
+        recorridos = 0  # Nodos visitados (métrica)
+        try:
+            while nodo_actual and (limite is None or entregados < limite):
+                recorridos += 1
+                t = nodo_actual.transaccion
+                if (id_cliente is None or t.id_cliente == id_cliente) and \
+                   (id_proveedor is None or t.id_proveedor == id_proveedor) and \
+                   (fecha is None or t.fecha == fecha) and \
+                   (fecha_inicio is None or t.fecha >= fecha_inicio) and \
+                   (fecha_fin is None or t.fecha <= fecha_fin):
+                    coincidencias += 1
+                    if coincidencias > desde:
+                        entregados += 1
+                        yield t
+                nodo_actual = nodo_actual.anterior if descendente else nodo_actual.siguiente
+        finally:
+            metricas.nodos_recorridos(recorridos)
 
+    @medir("transacciones.resumen_movimientos_por_rango")
     def resumen_movimientos_por_rango(self, movimientos_lista, fecha_inicio, fecha_fin, tipo=None):
         # Resumen de movimientos relacionados a las transacciones
-        if not movimientos_lista:
+        if movimientos_lista is None:
             return None
         return movimientos_lista.resumen_movimientos_por_rango(fecha_inicio, fecha_fin, tipo)
 
+    @medir("transacciones.reporte_transaccional_final")
     def reporte_transaccional_final(self, movimientos_lista, fecha_inicio=None, fecha_fin=None, id_cliente=None, id_proveedor=None):
         """
         Reporte transaccional avanzado: muestra todas las transacciones financieras (compras, ventas, pagos, deudas, utilidades),
         agrupadas por rango de fechas, cliente o proveedor.
         Incluye totales de compra, venta, utilidad bruta y neta, pagos realizados y saldos pendientes.
         """
+        filtrar_fechas = bool(fecha_inicio and fecha_fin)
+        if filtrar_fechas:
+            desde, hasta = a_fecha(fecha_inicio), a_fecha(fecha_fin)  # Comparación entre fechas, no entre textos
         nodo = self.raiz
         transacciones_filtradas = []
         while nodo:
             t = nodo.transaccion
             cumple_fecha = True
-            if fecha_inicio and fecha_fin:
-                cumple_fecha = (t.fecha >= fecha_inicio and t.fecha <= fecha_fin)
+            if filtrar_fechas:
+                cumple_fecha = desde is not None and hasta is not None and t.fecha is not None and desde <= t.fecha <= hasta
             if (id_cliente is None or t.id_cliente == id_cliente) and \
                (id_proveedor is None or t.id_proveedor == id_proveedor) and cumple_fecha:
                 transacciones_filtradas.append(t)
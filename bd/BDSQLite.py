@@ -1,27 +1,169 @@
 import os
 import sqlite3
+from datetime import date, datetime
+try:
+    from app.ModuloEventos import bus, AVISO, ERROR
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app.ModuloEventos import bus, AVISO, ERROR
 
 BASE_DIR = os.path.dirname(__file__)  # Ruta base del directorio actual del archivo
 nombre_db = os.path.join(BASE_DIR, 'Abarrotería.db')  # Ruta completa al archivo de la base de datos SQLite
+sincronia = None  # Nivel de PRAGMA synchronous aplicado a cada conexión (None = valor por defecto de SQLite)
+ganchos_conexion = []  # Funciones llamadas con cada conexión nueva (p. ej. instrumentación de métricas)
+
+# Decodificación tipada de filas: las columnas declaradas DATE se leen como datetime.date y las BOOLEAN como bool
+# una sola vez, al salir de SQLite (sqlite3.PARSE_DECLTYPES); las fechas se siguen guardando como texto ISO.
+# Las columnas calculadas (MIN(fecha), expresiones) no tienen tipo declarado y llegan sin convertir.
+TIPOS_DECLARADOS = sqlite3.PARSE_DECLTYPES
+
+def a_fecha(valor):
+    # Normaliza una fecha (date, datetime, texto ISO u ordinal) a datetime.date; None o inválida -> None
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    if isinstance(valor, int):
+        return date.fromordinal(valor)
+    try:
+        return date.fromisoformat(str(valor)[:10])
+    except ValueError:
+        return None
+
+def _convertir_fecha(texto):
+    return a_fecha(texto.decode("utf-8", "replace"))
+
+def _convertir_booleano(texto):
+    return texto not in (b"0", b"", b"False", b"false")
+
+sqlite3.register_converter("DATE", _convertir_fecha)
+sqlite3.register_converter("BOOLEAN", _convertir_booleano)
+sqlite3.register_adapter(date, date.isoformat)  # Parámetros date -> texto ISO (mismo formato que antes)
+
+class ContextoBD:
+    # Destino de la base de datos inyectable en las listas y módulos del sistema
+    # destino: ruta de archivo, URI "file:..." (p. ej. "file:tienda?mode=memory&cache=shared") o ":memory:"
+    # Con ":memory:" se crea una BD en memoria compartida (cache=shared) con nombre único: todas las
+    # conexiones del contexto ven los mismos datos y una conexión ancla la mantiene viva hasta cerrar()
+    _contador_memoria = 0  # Para nombrar de forma única las BD en memoria del proceso
+
+    def __init__(self, destino=None, sincronia=None):
+        self.destino = destino or nombre_db  # Ruta o URI de la BD
+        self.sincronia = sincronia  # Nivel de PRAGMA synchronous propio del contexto (None = global)
+        self.uri = self.destino.startswith("file:")  # Indica si el destino se abre como URI
+        self._ancla = None  # Conexión que mantiene viva una BD en memoria compartida
+        if self.destino == ":memory:":
+            ContextoBD._contador_memoria += 1
+            self.destino = f"file:memoria_{os.getpid()}_{ContextoBD._contador_memoria}?mode=memory&cache=shared"
+            self.uri = True
+        if self.en_memoria:
+            self._ancla = sqlite3.connect(self.destino, uri=True, check_same_thread=False)
+
+    @property
+    def en_memoria(self):
+        return self.uri and "mode=memory" in self.destino
+
+    @property
+    def ruta(self):
+        # Ruta de archivo asociada (para diarios e instantáneas); None si la BD vive en memoria
+        if self.en_memoria:
+            return None
+        if self.uri:
+            return self.destino[len("file:"):].split("?", 1)[0]
+        return self.destino
+
+    def conectar(self, compartida=False):
+        # compartida: si True, la conexión puede usarse desde varios hilos (el llamador serializa su uso)
+        conexion = sqlite3.connect(self.destino, uri=self.uri, detect_types=TIPOS_DECLARADOS, check_same_thread=not compartida)
+        nivel = self.sincronia or sincronia
+        if nivel:
+            conexion.execute(f"PRAGMA synchronous = {nivel}")
+        for gancho in ganchos_conexion:
+            gancho(conexion)
+        return conexion
+
+    def cargar_desde(self, ruta_origen):
+        # Copia una BD de archivo dentro de este contexto (API de backup de SQLite)
+        origen = sqlite3.connect(ruta_origen)
+        destino = self.conectar()
+        try:
+            origen.backup(destino)
+        finally:
+            destino.close()
+            origen.close()
+
+    def cerrar(self):
+        # Libera la BD en memoria (se pierde su contenido); no afecta a las BD de archivo
+        if self._ancla:
+            self._ancla.close()
+            self._ancla = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+    def __repr__(self):
+        return f"ContextoBD({self.destino!r})"
 
 # Función para conectar a la base de datos SQLite y devolver la conexión
-def conectar_db():
+# contexto: ContextoBD opcional; sin él se usa la BD configurada en nombre_db
+# compartida: si True, la conexión puede pasarse entre hilos (p. ej. la conexión de lectura del registro de listas)
+def conectar_db(contexto=None, compartida=False):
     try:
-        conexion = sqlite3.connect(nombre_db)  # Objeto de conexión a la base de datos
+        if contexto:
+            return contexto.conectar(compartida)
+        conexion = sqlite3.connect(nombre_db, detect_types=TIPOS_DECLARADOS, check_same_thread=not compartida)  # Objeto de conexión a la base de datos
+        if sincronia:
+            conexion.execute(f"PRAGMA synchronous = {sincronia}")
+        for gancho in ganchos_conexion:
+            gancho(conexion)
         return conexion
     except sqlite3.Error as e:
-        print(f"No se puede conectar a la BD: {e}")
+        bus.emitir("bd.error", "No se puede conectar a la BD: {error}", ERROR, error=str(e))
         return None
 
+# Función para activar el modo WAL: los lectores no bloquean al escritor y, con synchronous=NORMAL,
+# los commits no esperan un fsync (solo los checkpoints lo hacen)
+# contexto: ContextoBD opcional; el nivel de sincronía se guarda en el contexto en vez de globalmente
+def activar_wal(nivel_sincronia="NORMAL", contexto=None):
+    global sincronia
+    if nivel_sincronia not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+        raise ValueError(f"Nivel de sincronía no válido: {nivel_sincronia}")
+    conexion = conectar_db(contexto)
+    if not conexion:
+        return False
+    try:
+        modo = conexion.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if contexto:
+            contexto.sincronia = nivel_sincronia
+        else:
+            sincronia = nivel_sincronia
+        return modo.lower() == "wal"
+    except sqlite3.Error as e:
+        bus.emitir("bd.error", "No se pudo activar el modo WAL: {error}", AVISO, error=str(e))
+        return False
+    finally:
+        conexion.close()
+
 # Función para crear las tablas necesarias en la base de datos
-def crear_tablas():
-    conexion = conectar_db()  # Conexión activa a la base de datos
+# conexion: conexión ya abierta (opcional); si no se pasa, se usa la BD configurada y se cierra al terminar
+# contexto: ContextoBD opcional donde crear las tablas cuando no se pasa una conexión
+def crear_tablas(conexion=None, contexto=None):
+    conexion_propia = conexion is None  # Indica si la conexión se abrió aquí
+    if conexion_propia:
+        conexion = conectar_db(contexto)  # Conexión activa a la base de datos
     if conexion:
         cursor = conexion.cursor()  # Cursor para ejecutar sentencias SQL
 
         cursor.execute("PRAGMA foreign_keys = ON")  # Habilita claves foráneas en SQLite
         
         # Elimina tablas si existen para reiniciar la estructura (orden importante por dependencias)
+        cursor.execute("DROP TABLE IF EXISTS VersionesTablas")
         cursor.execute("DROP TABLE IF EXISTS Rotaciones")
         cursor.execute("DROP TABLE IF EXISTS Movimientos")
         cursor.execute("DROP TABLE IF EXISTS Transacciones")
@@ -41,6 +183,8 @@ def crear_tablas():
                 temporalidad BOOLEAN NOT NULL DEFAULT 0,
                 rebaja REAL NOT NULL DEFAULT 0,
                 id_proveedor INTEGER,
+                stock_objetivo INTEGER,
+                umbral_stock INTEGER,
                 FOREIGN KEY (id_proveedor) REFERENCES Proveedores(id_proveedor) ON DELETE SET NULL
             )
         """)
@@ -100,9 +244,96 @@ def crear_tablas():
             )
         """)
 
+        asegurar_indices(conexion)
+        asegurar_versiones(conexion)
+
         conexion.commit()
         print("Tablas creadas exitosamente.")
-        conexion.close()
+        if conexion_propia:
+            conexion.close()
+
+# Índices secundarios para las consultas empujadas a SQL (filtros, rangos de fechas y orden)
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_productos_nombre ON Productos(nombre COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_productos_categoria ON Productos(categoria)",
+    "CREATE INDEX IF NOT EXISTS idx_clientes_nombre ON Clientes(nombre COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_transacciones_fecha ON Transacciones(fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_transacciones_cliente ON Transacciones(id_cliente, fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_transacciones_proveedor ON Transacciones(id_proveedor, fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON Movimientos(fecha, tipo)",
+    "CREATE INDEX IF NOT EXISTS idx_movimientos_transaccion ON Movimientos(id_transaccion)",
+]
+
+# Función para crear (si no existen) los índices secundarios sobre una conexión abierta
+def asegurar_indices(conexion):
+    try:
+        cursor = conexion.cursor()
+        for sentencia in INDICES:
+            cursor.execute(sentencia)
+        conexion.commit()
+        return True
+    except sqlite3.Error as e:
+        bus.emitir("bd.error", "No se pudieron crear los índices: {error}", AVISO, error=str(e))
+        return False
+
+# Columnas de política de inventario por producto (NULL = usar el valor global de la simulación)
+COLUMNAS_POLITICA = (
+    ("stock_objetivo", "INTEGER"),  # Nivel de stock deseado tras reabastecer
+    ("umbral_stock", "INTEGER"),  # Stock mínimo antes de reabastecer
+)
+
+# Función para migrar BD creadas antes de las columnas de política: las agrega si faltan
+def asegurar_columnas_politica(conexion):
+    try:
+        cursor = conexion.cursor()
+        existentes = {fila[1] for fila in cursor.execute("PRAGMA table_info(Productos)").fetchall()}
+        for columna, tipo in COLUMNAS_POLITICA:
+            if columna not in existentes:
+                cursor.execute(f"ALTER TABLE Productos ADD COLUMN {columna} {tipo}")
+        conexion.commit()
+        return True
+    except sqlite3.Error as e:
+        bus.emitir("bd.error", "No se pudieron agregar las columnas de política: {error}", ERROR, error=str(e))
+        return False
+
+# Tablas cuyas modificaciones (UPDATE/DELETE) se cuentan en VersionesTablas
+TABLAS_VERSIONADAS = ("Productos", "Proveedores", "Clientes", "Transacciones", "Movimientos")
+
+# Función para crear la tabla de versiones y sus triggers
+# La versión de una tabla sube con el primer UPDATE o DELETE posterior a la última instantánea; las inserciones
+# se detectan por conteo y MAX(rowid). Así una instantánea puede saber si una tabla solo creció (se carga el
+# delta) o si cambió (se recarga). PRAGMA data_version no sirve para esto: solo ve cambios de otras conexiones
+# mientras la conexión sigue abierta, no entre un arranque y el siguiente.
+# Costo: el trigger marca la tabla como "sucia" y solo escribe la primera vez; mientras está marcada, cada
+# UPDATE/DELETE solo lee la fila de control (sin escritura adicional). guardar_instantanea() limpia las marcas.
+def asegurar_versiones(conexion):
+    try:
+        cursor = conexion.cursor()
+        cursor.execute("CREATE TABLE IF NOT EXISTS VersionesTablas (tabla TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0, sucia INTEGER NOT NULL DEFAULT 0)")
+        columnas = {fila[1] for fila in cursor.execute("PRAGMA table_info(VersionesTablas)").fetchall()}
+        if "sucia" not in columnas:  # BD anteriores a la marca: sus triggers escriben en cada fila modificada
+            cursor.execute("ALTER TABLE VersionesTablas ADD COLUMN sucia INTEGER NOT NULL DEFAULT 0")
+        triggers = dict(cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall())
+        for tabla in TABLAS_VERSIONADAS:
+            cursor.execute("INSERT OR IGNORE INTO VersionesTablas (tabla, version) VALUES (?, 0)", (tabla,))
+            for evento in ("UPDATE", "DELETE"):
+                nombre = f"version_{tabla.lower()}_{evento.lower()}"
+                if "sucia" in (triggers.get(nombre) or ""):
+                    continue
+                cursor.execute(f"DROP TRIGGER IF EXISTS {nombre}")
+                cursor.execute(f"""
+                    CREATE TRIGGER {nombre}
+                    AFTER {evento} ON {tabla}
+                    WHEN (SELECT sucia FROM VersionesTablas WHERE tabla = '{tabla}') = 0
+                    BEGIN
+                        UPDATE VersionesTablas SET version = version + 1, sucia = 1 WHERE tabla = '{tabla}';
+                    END
+                """)
+        conexion.commit()
+        return True
+    except sqlite3.Error as e:
+        bus.emitir("bd.error", "No se pudieron crear los triggers de versión: {error}", ERROR, error=str(e))
+        return False
 
 if __name__ == "__main__":
     crear_tablas()
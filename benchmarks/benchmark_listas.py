@@ -0,0 +1,337 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, timedelta
+
+from bd.BDSQLite import ContextoBD
+from app.ModuloProductos import ListaProductos
+from app.ModuloProveedores import ListaProveedores
+from app.ModuloClientes import ListaClientes
+from app.ModuloTransacciones import ListaTransacciones
+from app.ModuloMovimientos import ListaMovimientos
+from app.ModuloRotaciones import ModuloRotaciones
+from app.ModuloTopVentas import TopVentas
+from app.ModuloStockBajo import IndiceStockBajo
+from app.ModuloBusqueda import BuscadorProductos, MOTOR_FTS5, MOTOR_MEMORIA
+from app.ModuloMetricas import percentil
+from simulaciones.generador_datos import generar_tienda, CATEGORIAS
+
+# Micro-benchmarks de cada operación de las Lista* y de ModuloRotaciones a distintos tamaños de datos.
+# Cada tamaño se genera en una BD temporal con el generador de tiendas sintéticas; la BD principal no se toca.
+# Los resultados se guardan en JSON y --comparar marca las regresiones entre dos ejecuciones (p. ej. dos commits).
+
+TAMANOS_POR_DEFECTO = [1000, 10000, 100000]  # 10⁶ se pide explícitamente con --tamanos
+UMBRAL_REGRESION = 0.25  # Una operación es regresión si su mediana empeora más de un 25%
+
+@contextlib.contextmanager
+def silencio():
+    # Las operaciones imprimen mensajes de estado; se descartan para no medir la consola
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+class Contexto:
+    # Estado compartido por los casos de un mismo tamaño: listas cargadas, IDs existentes y fechas
+    def __init__(self, n, semilla, contexto_bd=None):
+        self.n = n
+        self.rng = random.Random(semilla)
+        with silencio():
+            self.productos = ListaProductos(contexto=contexto_bd)
+            self.proveedores = ListaProveedores(contexto=contexto_bd)
+            self.clientes = ListaClientes(contexto=contexto_bd)
+            self.transacciones = ListaTransacciones(contexto=contexto_bd)
+            self.movimientos = ListaMovimientos(contexto=contexto_bd)
+            self.rotaciones = ModuloRotaciones(self.productos)
+        self.hoy = date.today()
+        self.registrados = {}  # Caso -> IDs creados por los casos de registro, para actualizarlos y eliminarlos
+
+    def id_al_azar(self, maximo):
+        return self.rng.randint(1, maximo)
+
+    def nombre_producto_al_azar(self):
+        # Nombre exacto de un producto existente (el generador los termina en su ID)
+        nodo = self.productos._indice.get(self.id_al_azar(self.n))
+        return nodo.producto.nombre if nodo else "Inexistente"
+
+    def rango_fechas(self, dias=30):
+        inicio = self.hoy - timedelta(days=self.rng.randint(dias, 364))
+        return inicio.isoformat(), (inicio + timedelta(days=dias)).isoformat()
+
+    def guardar_registrado(self, caso, objeto_id):
+        self.registrados.setdefault(caso, []).append(objeto_id)
+
+    def tomar_registrado(self, caso):
+        pendientes = self.registrados.get(caso)
+        return pendientes.pop() if pendientes else None
+
+# --- Casos ---
+# Cada caso recibe el Contexto y ejecuta UNA operación; se mide cada llamada por separado.
+# Los casos lentos se cortan por presupuesto de tiempo: se omiten en los tamaños mayores.
+
+def _registrar_producto(ctx):
+    categoria = ctx.rng.choice(list(CATEGORIAS))
+    p = ctx.productos.registrar_producto("Benchmark", "Producto de prueba", categoria, 1.0, 100,
+                                         (ctx.hoy + timedelta(days=30)).isoformat(), False, 0.0, None)
+    if p: ctx.guardar_registrado("productos", p.id_producto)
+
+def _actualizar_producto(ctx):
+    ctx.productos.actualizar_producto(ctx.id_al_azar(ctx.n), {"precio": round(ctx.rng.uniform(0.5, 9.5), 2)})
+
+def _eliminar_producto(ctx):
+    id_producto = ctx.tomar_registrado("productos")
+    if id_producto: ctx.productos.eliminar_producto(id_producto)
+
+def _registrar_cliente(ctx):
+    c = ctx.clientes.registrar_cliente("Benchmark", "N/A", "N/A", "minorista")
+    if c: ctx.guardar_registrado("clientes", c.id_cliente)
+
+def _eliminar_cliente(ctx):
+    id_cliente = ctx.tomar_registrado("clientes")
+    if id_cliente: ctx.clientes.eliminar_cliente(id_cliente)
+
+def _registrar_proveedor(ctx):
+    p = ctx.proveedores.registrar_proveedor("Benchmark", "N/A", "N/A")
+    if p: ctx.guardar_registrado("proveedores", p.id_proveedor)
+
+def _eliminar_proveedor(ctx):
+    id_proveedor = ctx.tomar_registrado("proveedores")
+    if id_proveedor: ctx.proveedores.eliminar_proveedor(id_proveedor)
+
+def _registrar_transaccion(ctx):
+    t = ctx.transacciones.registrar_transaccion(
+        id_cliente=ctx.id_al_azar(ctx.n), productos=[ctx.id_al_azar(ctx.n)], total=1.0,
+        fecha=ctx.hoy.isoformat(), tipo_pago="efectivo", estado="completada"
+    )
+    if t: ctx.guardar_registrado("transacciones", t.id_transaccion)
+
+def _eliminar_transaccion(ctx):
+    id_transaccion = ctx.tomar_registrado("transacciones")
+    if id_transaccion: ctx.transacciones.eliminar_transaccion(id_transaccion)
+
+def _registrar_movimiento(ctx):
+    m = ctx.movimientos.registrar_movimiento(ctx.id_al_azar(ctx.n), ctx.hoy.isoformat(), "venta")
+    if m: ctx.guardar_registrado("movimientos", m.id_transaccion)
+
+def _eliminar_movimiento(ctx):
+    id_transaccion = ctx.tomar_registrado("movimientos")
+    if id_transaccion: ctx.movimientos.eliminar_movimiento_por_id_transaccion(id_transaccion)
+
+def _consultar_transacciones_rango(ctx):
+    inicio, fin = ctx.rango_fechas()
+    ctx.transacciones.consultar_transacciones(fecha_inicio=inicio, fecha_fin=fin)
+
+def _reporte_transaccional(ctx):
+    inicio, fin = ctx.rango_fechas()
+    ctx.transacciones.reporte_transaccional_final(ctx.movimientos, inicio, fin)
+
+def _reporte_logistico(ctx):
+    inicio, fin = ctx.rango_fechas(7)
+    ctx.movimientos.reporte_logistico_final(ctx.productos, inicio, fin)
+
+def _top_ventas(ctx, dias=None):
+    # La ventana se construye en la primera llamada (descartada como calentamiento) y luego solo se consulta
+    if not hasattr(ctx, "top_ventas"):
+        ctx.top_ventas = TopVentas().observar(ctx.transacciones, ctx.movimientos)
+    ctx.top_ventas.mas_vendidos(10, dias)
+    ctx.top_ventas.menos_vendidos(10, dias)
+
+def _stock_bajo(ctx):
+    # El índice se construye en la primera llamada (descartada como calentamiento) y luego solo se consulta
+    if not hasattr(ctx, "stock_bajo"):
+        ctx.stock_bajo = IndiceStockBajo(ctx.productos, emitir_eventos=False)
+    ctx.stock_bajo.bajo_umbral(20)
+
+def _buscar_texto(ctx, motor):
+    # Cada motor se construye en su primera llamada (descartada como calentamiento) y luego solo se consulta
+    if not hasattr(ctx, "buscadores"):
+        ctx.buscadores = {}
+    if motor not in ctx.buscadores:
+        ctx.buscadores[motor] = BuscadorProductos(ctx.productos, motor)
+    ctx.buscadores[motor].buscar(ctx.nombre_producto_al_azar().split()[0][:4], limite=20)
+
+# (nombre, función, repeticiones)
+# El orden importa: cada "eliminar" borra lo que creó su "registrar"
+CASOS = [
+    ("ListaProductos.registrar", _registrar_producto, 20),
+    ("ListaProductos.consultar_id", lambda ctx: ctx.productos.consultar_producto(id_producto=ctx.id_al_azar(ctx.n)), 20),
+    ("ListaProductos.consultar_nombre", lambda ctx: ctx.productos.consultar_producto(nombre=ctx.nombre_producto_al_azar()), 10),
+    ("ListaProductos.actualizar", _actualizar_producto, 20),
+    ("ListaProductos.eliminar", _eliminar_producto, 20),
+    ("ListaProductos.consultar_categoria", lambda ctx: ctx.productos.consultar_productos_por_categoria(ctx.rng.choice(list(CATEGORIAS)), 50), 20),
+    ("ListaProductos.consultar_rebaja", lambda ctx: ctx.productos.consultar_producto(solo_rebaja=True), 5),
+    ("ListaProveedores.registrar", _registrar_proveedor, 20),
+    ("ListaProveedores.consultar_id", lambda ctx: ctx.proveedores.consultar_proveedor(ctx.id_al_azar(len(CATEGORIAS) * 2)), 20),
+    ("ListaProveedores.actualizar", lambda ctx: ctx.proveedores.actualizar_proveedor(ctx.id_al_azar(len(CATEGORIAS) * 2), {"contacto": "benchmark@correo.com"}), 20),
+    ("ListaProveedores.eliminar", _eliminar_proveedor, 20),
+    ("ListaClientes.registrar", _registrar_cliente, 20),
+    ("ListaClientes.consultar_id", lambda ctx: ctx.clientes.consultar_cliente(id_cliente=ctx.id_al_azar(ctx.n)), 20),
+    ("ListaClientes.consultar_nombre", lambda ctx: ctx.clientes.consultar_cliente(nombre=f"Cliente {ctx.id_al_azar(ctx.n)}"), 10),
+    ("ListaClientes.actualizar", lambda ctx: ctx.clientes.actualizar_cliente(ctx.id_al_azar(ctx.n), {"credito": 10.0}), 20),
+    ("ListaClientes.eliminar", _eliminar_cliente, 20),
+    ("ListaTransacciones.registrar", _registrar_transaccion, 20),
+    ("ListaTransacciones.consultar_cliente", lambda ctx: ctx.transacciones.consultar_transacciones(id_cliente=ctx.id_al_azar(ctx.n)), 10),
+    ("ListaTransacciones.consultar_rango", _consultar_transacciones_rango, 10),
+    ("ListaTransacciones.actualizar", lambda ctx: ctx.transacciones.actualizar_transaccion(ctx.id_al_azar(ctx.n), {"estado": "completada"}), 20),
+    ("ListaTransacciones.eliminar", _eliminar_transaccion, 20),
+    ("ListaTransacciones.reporte_transaccional_final", _reporte_transaccional, 5),
+    ("ListaMovimientos.registrar", _registrar_movimiento, 20),
+    ("ListaMovimientos.consultar_id_transaccion", lambda ctx: ctx.movimientos.consultar_movimiento_por_id_transaccion(ctx.id_al_azar(ctx.n)), 20),
+    ("ListaMovimientos.consultar_fecha", lambda ctx: ctx.movimientos.consultar_movimientos(fecha_consulta=ctx.rango_fechas(0)[0]), 10),
+    ("ListaMovimientos.consultar_rango", lambda ctx: ctx.movimientos.resumen_movimientos_por_rango(*ctx.rango_fechas()), 10),
+    ("ListaMovimientos.eliminar", _eliminar_movimiento, 20),
+    ("ListaMovimientos.reporte_logistico_final", _reporte_logistico, 3),
+    ("TopVentas.ventana", _top_ventas, 20),
+    ("TopVentas.ultimos_7_dias", lambda ctx: _top_ventas(ctx, 7), 20),
+    ("IndiceStockBajo.bajo_umbral", _stock_bajo, 20),
+    ("BuscadorProductos.fts5", lambda ctx: _buscar_texto(ctx, MOTOR_FTS5), 20),
+    ("BuscadorProductos.memoria", lambda ctx: _buscar_texto(ctx, MOTOR_MEMORIA), 20),
+    ("ModuloRotaciones.verificar_rebaja", lambda ctx: ctx.rotaciones.verificar_rebaja(ctx.id_al_azar(ctx.n)), 20),
+    ("ModuloRotaciones.productos_temporada", lambda ctx: ctx.rotaciones.obtener_productos_temporada(), 5),
+    ("ModuloRotaciones.productos_rebajados", lambda ctx: ctx.rotaciones.obtener_productos_rebajados(), 5),
+    ("ModuloRotaciones.aplicar_rebajas_expiracion", lambda ctx: ctx.rotaciones.aplicar_rebajas_expiracion(), 3),
+]
+
+def medir(funcion, ctx, repeticiones, presupuesto_s=None):
+    # Tiempos (s) de cada llamada; la primera se descarta como calentamiento si hay más de una
+    # Si una llamada supera presupuesto_s no se repite más: con una medición basta para ver el precipicio
+    tiempos = []
+    for i in range(repeticiones + (1 if repeticiones > 1 else 0)):
+        with silencio():
+            inicio = time.perf_counter()
+            funcion(ctx)
+            duracion = time.perf_counter() - inicio
+        if repeticiones == 1 or i > 0 or (presupuesto_s and duracion > presupuesto_s):
+            tiempos.append(duracion)
+        if presupuesto_s and duracion > presupuesto_s:
+            break
+    return tiempos
+
+def _resumir(tiempos):
+    ordenados = sorted(tiempos)
+    return {
+        "mediana_ms": round(statistics.median(ordenados) * 1000, 4),
+        "min_ms": round(ordenados[0] * 1000, 4),
+        "p90_ms": round(percentil(ordenados, 90) * 1000, 4),
+        "repeticiones": len(ordenados),
+    }
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def ejecutar_suite(tamanos=None, filtro=None, semilla=42, presupuesto_s=5.0, progreso=True, en_memoria=False):
+    # Ejecuta todos los casos (o los que contengan 'filtro') a cada tamaño
+    # presupuesto_s: si la mediana de un caso supera este tiempo, se omite en los tamaños mayores
+    # en_memoria: copia cada tienda generada a una BD en memoria y mide sin E/S de disco
+    # Devuelve el diccionario de resultados que se guarda como JSON
+    tamanos = sorted(tamanos or TAMANOS_POR_DEFECTO)
+    casos = [c for c in CASOS if not filtro or filtro.lower() in c[0].lower()]
+    resultados = {nombre: {} for nombre, _, _ in casos}
+    cargas = {}
+    omitidos = set()
+    with tempfile.TemporaryDirectory() as directorio:
+        for n in tamanos:
+            ruta = os.path.join(directorio, f"tienda_{n}.db")
+            with silencio():
+                generar_tienda(ruta, n_productos=n, n_clientes=n, n_transacciones=n, semilla=semilla, progreso=False)
+            with ContextoBD(":memory:" if en_memoria else ruta) as contexto_bd:
+                if en_memoria:
+                    contexto_bd.cargar_desde(ruta)
+                inicio = time.perf_counter()
+                ctx = Contexto(n, semilla, contexto_bd)
+                cargas[str(n)] = round((time.perf_counter() - inicio) * 1000, 2)
+                if progreso:
+                    print(f"[{n} filas] listas cargadas en {cargas[str(n)]:.0f} ms")
+                for nombre, funcion, repeticiones in casos:
+                    if nombre in omitidos:
+                        resultados[nombre][str(n)] = None
+                        continue
+                    resumen = _resumir(medir(funcion, ctx, repeticiones, presupuesto_s))
+                    resultados[nombre][str(n)] = resumen
+                    if resumen["mediana_ms"] / 1000 > presupuesto_s:
+                        omitidos.add(nombre)
+                    if progreso:
+                        print(f"  {nombre:<48} {resumen['mediana_ms']:>12.3f} ms")
+                del ctx
+    return {
+        "meta": {
+            "commit": _commit_actual(),
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "semilla": semilla,
+            "tamanos": tamanos,
+            "en_memoria": en_memoria,
+        },
+        "carga_ms": cargas,
+        "resultados": resultados,
+    }
+
+def comparar(base, nuevo, umbral=UMBRAL_REGRESION):
+    # Compara dos resultados caso por caso y tamaño por tamaño
+    # Devuelve (regresiones, mejoras) como listas de (caso, tamaño, mediana_base, mediana_nueva, razón)
+    regresiones, mejoras = [], []
+    for caso, por_tamano in nuevo["resultados"].items():
+        for tamano, medicion in por_tamano.items():
+            previa = base["resultados"].get(caso, {}).get(tamano)
+            if not medicion or not previa or previa["mediana_ms"] <= 0:
+                continue
+            razon = medicion["mediana_ms"] / previa["mediana_ms"]
+            fila = (caso, tamano, previa["mediana_ms"], medicion["mediana_ms"], razon)
+            if razon > 1 + umbral:
+                regresiones.append(fila)
+            elif razon < 1 / (1 + umbral):
+                mejoras.append(fila)
+    return regresiones, mejoras
+
+def imprimir_comparacion(base, nuevo, umbral=UMBRAL_REGRESION):
+    regresiones, mejoras = comparar(base, nuevo, umbral)
+    print(f"Base: {base['meta'].get('commit')}  Nuevo: {nuevo['meta'].get('commit')}  Umbral: {umbral:.0%}")
+    for titulo, filas in (("REGRESIONES", regresiones), ("MEJORAS", mejoras)):
+        print(f"\n{titulo} ({len(filas)})")
+        for caso, tamano, antes, despues, razon in sorted(filas, key=lambda f: -abs(f[4] - 1)):
+            print(f"  {caso:<48} n={tamano:<8} {antes:>10.3f} ms -> {despues:>10.3f} ms  (x{razon:.2f})")
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de las listas del sistema")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=None, help="Filas por tabla (por defecto 1000 10000 100000)")
+    parser.add_argument("--filtro", default=None, help="Solo casos cuyo nombre contenga este texto")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--presupuesto", type=float, default=5.0, help="Segundos por llamada antes de omitir tamaños mayores")
+    parser.add_argument("--memoria", action="store_true", help="Mide sobre BD en memoria (sin fsync)")
+    parser.add_argument("--salida", default=None, help="Archivo JSON de resultados (por defecto benchmarks/resultados/<commit>.json)")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="Compara dos archivos de resultados")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION, help="Empeoramiento relativo que cuenta como regresión")
+    args = parser.parse_args()
+
+    if args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as archivo:
+            base = json.load(archivo)
+        with open(args.comparar[1], encoding="utf-8") as archivo:
+            nuevo = json.load(archivo)
+        sys.exit(1 if imprimir_comparacion(base, nuevo, args.umbral) else 0)
+
+    resultados = ejecutar_suite(args.tamanos, args.filtro, args.semilla, args.presupuesto, en_memoria=args.memoria)
+    salida = args.salida or os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados",
+                                         f"{resultados['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as archivo:
+        json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {salida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import itertools
+import json
+import math
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import bd.BDSQLite as BDSQLite
+
+# Generador de tiendas sintéticas para pruebas de carga.
+# Escribe directamente en SQLite con inserciones masivas (executemany por lotes, una sola transacción),
+# con distribuciones realistas de categorías, precios, vencimientos y popularidad, y semilla reproducible.
+
+# Categoría -> peso en el surtido, precio mediano, dispersión (lognormal), vida útil en días (mín, máx),
+# probabilidad de ser de temporada y nombres base
+CATEGORIAS = {
+    "Fruta": {"peso": 0.16, "precio": 1.5, "sigma": 0.45, "vida": (5, 20), "temporada": 0.45,
+              "nombres": ["Mango", "Piña", "Guayaba", "Maracuyá", "Naranja", "Plátano", "Sandía", "Fresa", "Manzana", "Uva"]},
+    "Verdura": {"peso": 0.14, "precio": 1.0, "sigma": 0.40, "vida": (4, 15), "temporada": 0.20,
+                "nombres": ["Lechuga", "Tomate", "Zanahoria", "Cebolla", "Papa", "Brócoli", "Pepino", "Pimentón"]},
+    "Menestra": {"peso": 0.07, "precio": 1.2, "sigma": 0.30, "vida": (180, 540), "temporada": 0.0,
+                 "nombres": ["Lenteja", "Frijol", "Garbanzo", "Arveja"]},
+    "Cereal": {"peso": 0.10, "precio": 1.1, "sigma": 0.35, "vida": (120, 365), "temporada": 0.0,
+               "nombres": ["Arroz", "Maíz", "Avena", "Trigo", "Granola"]},
+    "Carne": {"peso": 0.09, "precio": 4.5, "sigma": 0.35, "vida": (3, 10), "temporada": 0.0,
+              "nombres": ["Pollo", "Res", "Cerdo", "Pavo"]},
+    "Lacteo": {"peso": 0.10, "precio": 1.8, "sigma": 0.35, "vida": (7, 30), "temporada": 0.0,
+               "nombres": ["Leche", "Queso", "Yogur", "Mantequilla"]},
+    "Panaderia": {"peso": 0.08, "precio": 1.3, "sigma": 0.40, "vida": (2, 7), "temporada": 0.05,
+                  "nombres": ["Pan", "Bollo", "Galleta", "Pastel"]},
+    "Bebida": {"peso": 0.12, "precio": 1.4, "sigma": 0.50, "vida": (90, 365), "temporada": 0.10,
+               "nombres": ["Agua", "Jugo", "Refresco", "Café", "Té"]},
+    "Limpieza": {"peso": 0.08, "precio": 2.5, "sigma": 0.45, "vida": (365, 1095), "temporada": 0.0,
+                 "nombres": ["Jabón", "Detergente", "Cloro", "Esponja"]},
+    "Snack": {"peso": 0.06, "precio": 0.9, "sigma": 0.40, "vida": (60, 240), "temporada": 0.05,
+              "nombres": ["Papitas", "Maní", "Chocolate", "Caramelo"]},
+}
+VARIANTES = ["Dulce", "Orgánico", "Grande", "Pequeño", "Fresco", "Premium", "Económico", "Natural", "Entero", "Light"]
+TIPOS_PAGO = ["efectivo", "tarjeta", "crédito"]
+
+def _lotes(iterable, tam_lote):
+    # Parte un iterable en listas de tam_lote elementos sin materializarlo entero
+    iterador = iter(iterable)
+    while True:
+        lote = list(itertools.islice(iterador, tam_lote))
+        if not lote:
+            return
+        yield lote
+
+def _insertar(cursor, sql, filas, tam_lote, nombre, progreso):
+    total = 0
+    for lote in _lotes(filas, tam_lote):
+        cursor.executemany(sql, lote)
+        total += len(lote)
+        if progreso and total % (tam_lote * 10) == 0:
+            print(f"  {nombre}: {total} filas...")
+    return total
+
+def generar_tienda(ruta_db, n_productos=1000, n_clientes=100, n_transacciones=10000, n_proveedores=None,
+                   dias=365, fraccion_compras=0.1, semilla=None, tam_lote=10000, reemplazar=True, progreso=True):
+    # Genera una tienda completa en ruta_db y devuelve un resumen con conteos y duración
+    # n_proveedores: por defecto, 2 por categoría (o más, proporcional al surtido)
+    # dias: las transacciones se reparten en los últimos 'dias' días hasta hoy
+    # fraccion_compras: fracción de transacciones que son compras a proveedor (reabastecimiento)
+    rng = random.Random(semilla)  # Generador propio: la misma semilla produce la misma tienda
+    inicio = time.perf_counter()
+    if reemplazar and os.path.exists(ruta_db):
+        os.remove(ruta_db)
+    conexion = sqlite3.connect(ruta_db)
+    try:
+        cursor = conexion.cursor()
+        cursor.execute("PRAGMA journal_mode = OFF")  # Carga inicial: sin diario de rollback
+        cursor.execute("PRAGMA synchronous = OFF")  # Sin fsync hasta el final
+        BDSQLite.crear_tablas(conexion)
+
+        categorias = list(CATEGORIAS)
+        pesos_categorias = [CATEGORIAS[c]["peso"] for c in categorias]
+        hoy = date.today()
+
+        # Proveedores: varios por categoría, nombrados con la categoría para poder asociarlos
+        n_proveedores = n_proveedores or max(len(categorias) * 2, n_productos // 500)
+        proveedores_por_categoria = {c: [] for c in categorias}
+        filas_proveedores = []
+        for i in range(1, n_proveedores + 1):
+            categoria = categorias[(i - 1) % len(categorias)]
+            proveedores_por_categoria[categoria].append(i)
+            filas_proveedores.append((i, f"{categoria} Proveedor {i}", f"proveedor{i}@correo.com", f"Zona {rng.randint(1, 50)}"))
+        _insertar(cursor, "INSERT INTO Proveedores (id_proveedor, nombre, contacto, direccion) VALUES (?, ?, ?, ?)",
+                  filas_proveedores, tam_lote, "Proveedores", progreso)
+
+        # Productos: categoría ponderada, precio lognormal alrededor de la mediana de su categoría
+        precios = [0.0] * (n_productos + 1)  # id_producto -> precio, para calcular totales de transacciones
+        categoria_de = [None] * (n_productos + 1)  # id_producto -> categoría
+        def filas_productos():
+            for id_producto in range(1, n_productos + 1):
+                categoria = rng.choices(categorias, weights=pesos_categorias)[0]
+                info = CATEGORIAS[categoria]
+                precio = round(max(0.1, rng.lognormvariate(math.log(info["precio"]), info["sigma"])), 2)
+                precios[id_producto] = precio
+                categoria_de[id_producto] = categoria
+                vida_min, vida_max = info["vida"]
+                fecha_expiracion = (hoy + timedelta(days=rng.randint(vida_min, vida_max))).isoformat()
+                temporada = rng.random() < info["temporada"]
+                rebaja = rng.choice([0.1, 0.15, 0.2]) if rng.random() < 0.05 else 0.0
+                nombre = f"{rng.choice(info['nombres'])} {rng.choice(VARIANTES)} {id_producto}"
+                yield (id_producto, nombre, f"{categoria} {rng.choice(VARIANTES).lower()}", categoria, precio,
+                       rng.randint(0, 200), fecha_expiracion, int(temporada), rebaja,
+                       rng.choice(proveedores_por_categoria[categoria]))
+        _insertar(cursor, """
+            INSERT INTO Productos (id_producto, nombre, descripcion, categoria, precio, stock, fecha_expiracion, temporalidad, rebaja, id_proveedor)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, filas_productos(), tam_lote, "Productos", progreso)
+
+        # Clientes: mayoría minoristas; el cliente 1 es el "Inventario" interno usado para las compras
+        def filas_clientes():
+            yield (1, "Inventario", "N/A", "N/A", "interno", 0)
+            for id_cliente in range(2, n_clientes + 2):
+                tipo = "mayorista" if rng.random() < 0.15 else "minorista"
+                yield (id_cliente, f"Cliente {id_cliente}", f"cliente{id_cliente}@correo.com",
+                       f"Zona {rng.randint(1, 50)}", tipo, round(rng.uniform(0, 500 if tipo == "mayorista" else 100), 2))
+        _insertar(cursor, """
+            INSERT INTO Clientes (id_cliente, nombre, contacto, direccion, tipo_cliente, credito)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, filas_clientes(), tam_lote, "Clientes", progreso)
+
+        # Popularidad tipo Zipf: pocos productos concentran la mayoría de las ventas
+        ranking = list(range(1, n_productos + 1))
+        rng.shuffle(ranking)
+        acumulados = list(itertools.accumulate(1.0 / (rango ** 1.1) for rango in range(1, n_productos + 1)))
+        # Fechas ordenadas para que los IDs de transacción sigan el orden cronológico
+        desplazamientos = sorted(rng.randrange(dias) for _ in range(n_transacciones))
+        primer_dia = hoy - timedelta(days=dias - 1)
+        fechas_iso = [(primer_dia + timedelta(days=d)).isoformat() for d in range(dias)]
+        tipos_movimiento = []  # id_transaccion - 1 -> "venta" / "compra"
+
+        def filas_transacciones():
+            for indice, desplazamiento in enumerate(desplazamientos, start=1):
+                fecha = fechas_iso[desplazamiento]
+                if rng.random() < fraccion_compras:
+                    id_producto = ranking[rng.choices(range(n_productos), cum_weights=acumulados)[0]]
+                    cantidad = rng.randint(10, 100)
+                    id_proveedor = rng.choice(proveedores_por_categoria[categoria_de[id_producto]])
+                    tipos_movimiento.append("compra")
+                    yield (indice, 1, id_proveedor, json.dumps([{"id": id_producto, "cantidad": cantidad}]),
+                           round(precios[id_producto] * cantidad * 0.7, 2), fecha,
+                           f"compra a proveedor {id_proveedor}", "completada")
+                else:
+                    tamano_canasta = min(n_productos, 1 + int(rng.expovariate(1 / 2.5)))
+                    canasta = [ranking[i] for i in rng.choices(range(n_productos), cum_weights=acumulados, k=tamano_canasta)]
+                    tipos_movimiento.append("venta")
+                    yield (indice, rng.randint(2, n_clientes + 1), None, json.dumps(canasta),
+                           round(sum(precios[p] for p in canasta), 2), fecha, rng.choice(TIPOS_PAGO),
+                           "completada" if rng.random() < 0.85 else "pendiente")
+        _insertar(cursor, """
+            INSERT INTO Transacciones (id_transaccion, id_cliente, id_proveedor, productos, total, fecha, tipo_pago, estado)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, filas_transacciones(), tam_lote, "Transacciones", progreso)
+
+        # Un movimiento por transacción, con la misma fecha y tipo
+        _insertar(cursor, "INSERT INTO Movimientos (id_estado, id_transaccion, fecha, tipo) VALUES (?, ?, ?, ?)",
+                  ((i, i, fechas_iso[desplazamientos[i - 1]], tipos_movimiento[i - 1]) for i in range(1, n_transacciones + 1)),
+                  tam_lote, "Movimientos", progreso)
+        conexion.commit()
+    finally:
+        conexion.close()
+    duracion = time.perf_counter() - inicio
+    resumen = {
+        "ruta": ruta_db, "productos": n_productos, "clientes": n_clientes + 1, "proveedores": n_proveedores,
+        "transacciones": n_transacciones, "movimientos": n_transacciones, "semilla": semilla, "segundos": round(duracion, 3)
+    }
+    if progreso:
+        filas = n_productos + n_clientes + 1 + n_proveedores + 2 * n_transacciones
+        print(f"Tienda generada en {duracion:.2f}s ({filas / duracion if duracion else 0:.0f} filas/s): {ruta_db}")
+    return resumen
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de tiendas sintéticas para pruebas de carga")
+    parser.add_argument("salida", help="Ruta del archivo SQLite a generar")
+    parser.add_argument("--productos", type=int, default=1000)
+    parser.add_argument("--clientes", type=int, default=100)
+    parser.add_argument("--proveedores", type=int, default=None)
+    parser.add_argument("--transacciones", type=int, default=10000)
+    parser.add_argument("--dias", type=int, default=365, help="Horizonte histórico en días")
+    parser.add_argument("--compras", type=float, default=0.1, help="Fracción de transacciones que son compras")
+    parser.add_argument("--semilla", type=int, default=None)
+    parser.add_argument("--lote", type=int, default=10000, help="Filas por executemany")
+    parser.add_argument("--forzar", action="store_true", help="Permite sobrescribir la BD principal del sistema")
+    args = parser.parse_args()
+    if os.path.abspath(args.salida) == os.path.abspath(BDSQLite.nombre_db) and not args.forzar:
+        print("La salida es la BD principal del sistema; use --forzar para sobrescribirla.")
+        return
+    generar_tienda(args.salida, args.productos, args.clientes, args.transacciones, args.proveedores,
+                   args.dias, args.compras, args.semilla, args.lote)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bd.BDSQLite import ContextoBD, crear_tablas
+from app.ModuloMetricas import percentil
+from simulaciones import simulacion_semana
+
+# Ejecutor Monte-Carlo: réplicas independientes de la simulación semanal en procesos paralelos.
+# Cada réplica usa su propia BD en memoria o temporal (la BD principal no se toca) y devuelve sus KPIs;
+# el proceso principal agrupa las réplicas por política y calcula estadísticas resumen.
+
+KPIS = ["ingresos", "costo_compras", "margen", "ventas", "unidades_vendidas", "quiebres_stock", "reabastecimientos", "rebajas", "ajustes"]
+PARAMETROS_POLITICA = ["dias", "umbral_stock", "stock_objetivo", "margen_objetivo", "ventas_por_dia", "pronostico", "ventana_reabastecimiento"]
+
+def ejecutar_replica(parametros, en_memoria=True):
+    # Punto de entrada de cada proceso trabajador: crea una BD propia, corre una réplica y la descarta
+    # parametros: diccionario con "semilla" y los argumentos de simulacion_semana.ejecutar_simulacion
+    # en_memoria: si True la BD vive en RAM (sin fsync); si False, en un archivo temporal
+    with tempfile.TemporaryDirectory() as directorio:
+        destino = ":memory:" if en_memoria else os.path.join(directorio, "replica.db")
+        with ContextoBD(destino) as contexto:
+            inicio = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                crear_tablas(contexto=contexto)
+                kpis = simulacion_semana.ejecutar_simulacion(reportes=False, contexto=contexto, **parametros)
+            kpis["segundos"] = time.perf_counter() - inicio
+    return parametros, kpis
+
+def generar_replicas(replicas, semilla_base=0, **rejilla):
+    # Producto cartesiano de los valores de cada parámetro de política × réplicas con semillas distintas
+    # rejilla: parámetro -> lista de valores (p. ej. umbral_stock=[20, 40])
+    nombres = [n for n in PARAMETROS_POLITICA if n in rejilla]
+    configuraciones = []
+    semilla = semilla_base
+    for valores in itertools.product(*(rejilla[n] for n in nombres)):
+        politica = dict(zip(nombres, valores))
+        for _ in range(replicas):
+            configuraciones.append({**politica, "semilla": semilla})
+            semilla += 1
+    return configuraciones
+
+def _estadisticas(valores):
+    return {
+        "media": statistics.fmean(valores),
+        "desv": statistics.stdev(valores) if len(valores) > 1 else 0.0,
+        "p5": percentil(valores, 5),
+        "p50": statistics.median(valores),
+        "p95": percentil(valores, 95),
+    }
+
+def resumir(resultados):
+    # Agrupa los KPIs por política (parámetros sin la semilla) y calcula media, desviación y percentiles
+    # Devuelve una lista de {"politica": {...}, "replicas": n, "kpis": {kpi: {media, desv, p5, p50, p95}}}
+    grupos = {}
+    for parametros, kpis in resultados:
+        clave = tuple(sorted((k, v) for k, v in parametros.items() if k != "semilla"))
+        grupos.setdefault(clave, []).append(kpis)
+    resumen = []
+    for clave, lista in grupos.items():
+        resumen.append({
+            "politica": dict(clave),
+            "replicas": len(lista),
+            "kpis": {kpi: _estadisticas([k[kpi] for k in lista]) for kpi in KPIS},
+        })
+    resumen.sort(key=lambda r: -r["kpis"]["ingresos"]["media"])
+    return resumen
+
+def ejecutar_montecarlo(configuraciones, procesos=None, progreso=True, en_memoria=True):
+    # Reparte las réplicas entre 'procesos' trabajadores (por defecto, uno por núcleo)
+    # Devuelve la lista de (parametros, kpis) en el orden en que terminan
+    resultados = []
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        futuros = [ejecutor.submit(ejecutar_replica, c, en_memoria) for c in configuraciones]
+        for i, futuro in enumerate(as_completed(futuros), start=1):
+            try:
+                resultados.append(futuro.result())
+            except Exception as e:
+                print(f"Réplica fallida: {e}")
+            if progreso and (i % max(1, len(futuros) // 10) == 0 or i == len(futuros)):
+                print(f"  {i}/{len(futuros)} réplicas completadas")
+    return resultados
+
+def imprimir_resumen(resumen):
+    print("\n" + "=" * 100)
+    print("RESUMEN MONTE-CARLO".center(100))
+    print("=" * 100)
+    for grupo in resumen:
+        politica = ", ".join(f"{k}={v}" for k, v in grupo["politica"].items())
+        print(f"\nPolítica: {politica}  (réplicas: {grupo['replicas']})")
+        for kpi in KPIS:
+            e = grupo["kpis"][kpi]
+            print(f"  {kpi:<18} media={e['media']:>10.2f}  desv={e['desv']:>9.2f}  p5={e['p5']:>10.2f}  p50={e['p50']:>10.2f}  p95={e['p95']:>10.2f}")
+    print("=" * 100 + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Réplicas Monte-Carlo de la simulación semanal en paralelo")
+    parser.add_argument("--replicas", type=int, default=20, help="Réplicas por política")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos trabajadores (por defecto, uno por núcleo)")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de la primera réplica")
+    parser.add_argument("--dias", type=int, nargs="+", default=[7], help="Horizontes a evaluar")
+    parser.add_argument("--umbral-stock", type=int, nargs="+", default=[simulacion_semana.UMBRAL_STOCK])
+    parser.add_argument("--stock-objetivo", type=int, nargs="+", default=[simulacion_semana.STOCK_OBJETIVO])
+    parser.add_argument("--margen-objetivo", type=float, nargs="+", default=[simulacion_semana.MARGEN_OBJETIVO])
+    parser.add_argument("--ventas-por-dia", type=int, nargs="+", default=[1])
+    parser.add_argument("--pronostico", type=int, nargs="+", choices=[0, 1], default=[0], help="1 = reabastecer según pronóstico de demanda")
+    parser.add_argument("--ventana-reabastecimiento", type=int, nargs="+", default=[0], help="Días que se agrupan las compras de cada proveedor")
+    parser.add_argument("--disco", action="store_true", help="Usa una BD temporal en disco por réplica en vez de memoria")
+    parser.add_argument("--salida", default=None, help="Archivo JSON donde guardar el resumen")
+    args = parser.parse_args()
+
+    configuraciones = generar_replicas(
+        args.replicas, args.semilla, dias=args.dias, umbral_stock=args.umbral_stock,
+        stock_objetivo=args.stock_objetivo, margen_objetivo=args.margen_objetivo, ventas_por_dia=args.ventas_por_dia,
+        pronostico=[bool(v) for v in args.pronostico], ventana_reabastecimiento=args.ventana_reabastecimiento
+    )
+    print(f"Ejecutando {len(configuraciones)} réplicas con {args.procesos or os.cpu_count()} procesos...")
+    inicio = time.perf_counter()
+    resultados = ejecutar_montecarlo(configuraciones, args.procesos, en_memoria=not args.disco)
+    print(f"Completado en {time.perf_counter() - inicio:.2f}s")
+    resumen = resumir(resultados)
+    imprimir_resumen(resumen)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resumen, archivo, indent=2, ensure_ascii=False)
+        print(f"Resumen guardado en {args.salida}")
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import argparse
 import simpy
 import random
 from datetime import date, timedelta
@@ -13,6 +14,13 @@ from app.ModuloTransacciones import ListaTransacciones
 from app.ModuloMovimientos import ListaMovimientos
 from app.ModuloRotaciones import ModuloRotaciones
 from app.ModuloProveedores import ListaProveedores
+from app.ModuloEventos import bus, SumideroConsola
+from app.ModuloAjustes import ajustar_precios_stock
+from app.ModuloPronosticos import PronosticoDemanda
+from app.ModuloReabastecimiento import PlanificadorReabastecimiento
+from app.ModuloPrecios import MotorPrecios
+from app.ModuloStockBajo import IndiceStockBajo
+from bd.BDSQLite import ContextoBD, crear_tablas
 
 UMBRAL_STOCK = 40  # Stock mínimo antes de activar reabastecimiento automático
 STOCK_OBJETIVO = 30  # Nivel de stock deseado tras reabastecimiento
@@ -51,12 +59,13 @@ def limpiar_cache_pycache(root_dir):
                 except Exception as e:
                     print(f"Error al eliminar {pyc_path}: {e}")
 
-def resetear_bd(db_path=DB_PATH, tablas=TABLAS):
+def resetear_bd(db_path=DB_PATH, tablas=TABLAS, contexto=None):
     # Limpia todas las tablas de la base de datos y reinicia los autoincrementos.
-    if not os.path.exists(db_path):
+    # contexto: ContextoBD opcional; si se pasa, se limpia esa BD en lugar de db_path
+    if contexto is None and not os.path.exists(db_path):
         print("No existe la base de datos:", db_path)
         return
-    conexion = sqlite3.connect(db_path)
+    conexion = contexto.conectar() if contexto else sqlite3.connect(db_path)
     try:
         cursor = conexion.cursor()
         cursor.execute("PRAGMA foreign_keys = OFF")
@@ -168,27 +177,28 @@ def llegada_proveedores(env, proveedores):
         )
     yield env.timeout(0)
 
+def _texto_venta(cliente, productos_venta, total):
+    lineas = ["", "="*50, "VENTA REALIZADA", "="*50, f"🛒 Cliente: '{cliente.nombre}' (ID: {cliente.id_cliente})", "Productos vendidos:"]
+    lineas += [f"  - {p.nombre} (ID: {p.id_producto})" for p in productos_venta]
+    lineas += [f"Total venta: ${total:.2f}", "="*50 + "\n"]
+    return "\n".join(lineas)
+
+def _texto_compra(proveedor, lineas, total, productos):
+    textos = ["", "="*50, "COMPRA/REABASTECIMIENTO", "="*50]
+    for linea in lineas:
+        nodo = productos._indice.get(linea["id"])
+        nombre = nodo.producto.nombre if nodo else linea["id"]
+        textos.append(f"🚚 Se compraron {linea['cantidad']} unidades de '{nombre}' (ID: {linea['id']})")
+    textos += [f"Proveedor: '{proveedor.nombre}' (ID: {proveedor.id_proveedor})", f"Total gastado: ${total:.2f}", "="*50 + "\n"]
+    return "\n".join(textos)
+
 def aviso_venta(cliente, productos_venta, total):
-    # Imprime un aviso de venta realizada.
-    print("\n" + "="*50)
-    print("VENTA REALIZADA")
-    print("="*50)
-    print(f"🛒 Cliente: '{cliente.nombre}' (ID: {cliente.id_cliente})")
-    print("Productos vendidos:")
-    for p in productos_venta:
-        print(f"  - {p.nombre} (ID: {p.id_producto})")
-    print(f"Total venta: ${total:.2f}")
-    print("="*50 + "\n")
+    # Emite el aviso de venta realizada (se formatea solo si hay suscriptores).
+    bus.emitir("simulacion.venta", _texto_venta, cliente=cliente, productos_venta=productos_venta, total=total)
 
-def aviso_compra(proveedor, producto, cantidad, total):
-    # Imprime un aviso de compra o reabastecimiento realizado.
-    print("\n" + "="*50)
-    print("COMPRA/REABASTECIMIENTO")
-    print("="*50)
-    print(f"🚚 Se compraron {cantidad} unidades de '{producto.nombre}' (ID: {producto.id_producto})")
-    print(f"Proveedor: '{proveedor.nombre}' (ID: {proveedor.id_proveedor})")
-    print(f"Total gastado: ${total:.2f}")
-    print("="*50 + "\n")
+def aviso_compra(proveedor, lineas, total, productos):
+    # Emite el aviso de una orden de compra (una o varias líneas de un mismo proveedor).
+    bus.emitir("simulacion.compra", _texto_compra, proveedor=proveedor, lineas=lineas, total=total, productos=productos)
 
 def caso_temporada(env, productos):
     # Marca productos como de temporada si corresponde.
@@ -200,85 +210,26 @@ def caso_temporada(env, productos):
         if any(nombre in p.nombre.lower() for nombre in productos_panamenos_temporada):
             productos.actualizar_producto(p.id_producto, {"temporalidad": True})
 
-def caso_rebajas(env, rotaciones):
+def caso_rebajas(env, rotaciones, dias=7, kpis=None):
     # Aplica rebajas a productos próximos a expirar durante la semana.
-    for dia in range(7):
+    for dia in range(dias):
         yield env.timeout(1)
         n_rebajas = rotaciones.aplicar_rebajas_expiracion(dias_antes=2, porcentaje_rebaja=0.5)
+        if kpis is not None:
+            kpis["rebajas"] += n_rebajas
         if n_rebajas > 0:
-            print(f"💸 Día {dia+1}: Se aplicaron {n_rebajas} rebaja(s) a productos próximos a expirar.")
+            bus.emitir("simulacion.rebajas", "💸 Día {dia}: Se aplicaron {rebajas} rebaja(s) a productos próximos a expirar.", dia=dia + 1, rebajas=n_rebajas)
         else:
-            print(f"💸 Día {dia+1}: No se aplicaron rebajas por expiración.")
+            bus.emitir("simulacion.rebajas", "💸 Día {dia}: No se aplicaron rebajas por expiración.", dia=dia + 1, rebajas=0)
 
-def ajuste_inteligente_precios_stock(productos, transacciones, movimientos, semana_inicio, semana_fin, margen_objetivo=MARGEN_OBJETIVO, rotacion_minima=ROTACION_MINIMA):
+def ajuste_inteligente_precios_stock(productos, transacciones, movimientos, semana_inicio, semana_fin, margen_objetivo=MARGEN_OBJETIVO, rotacion_minima=ROTACION_MINIMA, stock_objetivo=STOCK_OBJETIVO, umbral_stock=UMBRAL_STOCK):
     # Ajusta precios y stock de productos según margen y rotación semanal.
-    ajustes_realizados = []
-    for p in productos.consultar_producto():
-        ventas = []
-        compras = []
-        nodo_t = transacciones.raiz
-        while nodo_t:
-            t = nodo_t.transaccion
-            if t.fecha >= semana_inicio and t.fecha <= semana_fin:
-                mov = movimientos.consultar_movimiento_por_id_transaccion(t.id_transaccion)
-                if mov and mov.tipo == "venta":
-                    if isinstance(t.productos, list):
-                        if any(
-                            (isinstance(x, dict) and x.get("id") == p.id_producto) or
-                            (isinstance(x, int) and x == p.id_producto)
-                            for x in t.productos
-                        ):
-                            ventas.append(t)
-                    elif str(p.id_producto) in str(t.productos):
-                        ventas.append(t)
-                if mov and mov.tipo == "compra":
-                    if isinstance(t.productos, list):
-                        if any(
-                            (isinstance(x, dict) and x.get("id") == p.id_producto) or
-                            (isinstance(x, int) and x == p.id_producto)
-                            for x in t.productos
-                        ):
-                            compras.append(t)
-                    elif str(p.id_producto) in str(t.productos):
-                        compras.append(t)
-            nodo_t = nodo_t.siguiente
-
-        total_ventas = sum(t.total for t in ventas)
-        total_compras = sum(t.total for t in compras)
-        num_ventas = len(ventas)
-
-        if total_ventas > 0 and total_compras > 0:
-            margen_real = (total_ventas - total_compras) / total_ventas
-        else:
-            margen_real = 0
-
-        rotacion = num_ventas
-
-        precio_anterior = p.precio
-        if margen_real < margen_objetivo:
-            nuevo_precio = round(precio_anterior * 1.10, 2)
-            productos.actualizar_producto(p.id_producto, {"precio": nuevo_precio})
-            ajustes_realizados.append(f"[Ajuste] Producto {p.nombre} (ID {p.id_producto}): Precio subido de {precio_anterior} a {nuevo_precio} por margen bajo ({margen_real:.2f})")
-        elif margen_real > margen_objetivo + 0.15:
-            nuevo_precio = round(precio_anterior * 0.95, 2)
-            productos.actualizar_producto(p.id_producto, {"precio": nuevo_precio})
-            ajustes_realizados.append(f"[Ajuste] Producto {p.nombre} (ID {p.id_producto}): Precio bajado de {precio_anterior} a {nuevo_precio} por margen alto ({margen_real:.2f})")
-
-        if p.stock > STOCK_OBJETIVO + 20 and rotacion < rotacion_minima:
-            nuevo_stock_obj = max(10, STOCK_OBJETIVO - 10)
-            productos.actualizar_producto(p.id_producto, {"stock_objetivo": nuevo_stock_obj})
-            ajustes_realizados.append(f"[Ajuste] Producto {p.nombre} (ID {p.id_producto}): Stock objetivo ajustado a {nuevo_stock_obj} por sobrestock y baja rotación")
-        elif p.stock < UMBRAL_STOCK and rotacion >= rotacion_minima:
-            nuevo_umbral = max(5, UMBRAL_STOCK - 5)
-            productos.actualizar_producto(p.id_producto, {"umbral_stock": nuevo_umbral})
-            ajustes_realizados.append(f"[Ajuste] Producto {p.nombre} (ID {p.id_producto}): Umbral stock ajustado a {nuevo_umbral} por substock y alta rotación")
-
-        if rotacion < rotacion_minima or (hasattr(p, "fecha_expiracion") and (date.fromisoformat(p.fecha_expiracion) - date.today()).days <= 2):
-            precio_rebaja_anterior = p.precio
-            nuevo_precio_rebaja = round(precio_rebaja_anterior * 0.8, 2)
-            productos.actualizar_producto(p.id_producto, {"precio": nuevo_precio_rebaja, "rebaja": 0.2})
-            ajustes_realizados.append(f"[Ajuste] Producto {p.nombre} (ID {p.id_producto}): Rebaja aplicada, nuevo precio {nuevo_precio_rebaja}")
-    return ajustes_realizados
+    # Una sola pasada por las ventas de la semana, reglas evaluadas por columnas y una única escritura en lote;
+    # stock_objetivo y umbral_stock se guardan por producto y se usan como valores por defecto.
+    return ajustar_precios_stock(
+        productos, transacciones, movimientos, semana_inicio, semana_fin,
+        margen_objetivo, rotacion_minima, stock_objetivo, umbral_stock
+    )
 
 def reporte_ajustes(ajustes_realizados):
     # Imprime un reporte de los ajustes realizados en precios y stock.
@@ -293,14 +244,14 @@ def reporte_ajustes(ajustes_realizados):
         print()
     print("="*60 + "\n")
 
-def reporte_final(productos, movimientos, rotaciones, transacciones):
+def reporte_final(productos, movimientos, rotaciones, transacciones, dias=7):
     # Imprime el reporte final de la semana con información relevante.
     print("\n" + "="*60)
     print("REPORTE FINAL DE LA SEMANA".center(60))
     print("="*60 + "\n")
     print(">>> [REPORTE TRANSACCIONAL FINAL]:\n")
     fecha_ini = date.today().isoformat()
-    fecha_fin = (date.today() + timedelta(days=6)).isoformat()
+    fecha_fin = (date.today() + timedelta(days=dias - 1)).isoformat()
     transacciones.reporte_transaccional_final(
         movimientos_lista=movimientos,
         fecha_inicio=fecha_ini,
@@ -332,97 +283,149 @@ def reporte_final(productos, movimientos, rotaciones, transacciones):
         print("No hay productos rebajados.\n")
     print("="*60 + "\n")
 
-def main():
-    # Función principal que ejecuta la simulación semanal.
-    resetear_bd()
+def ejecutar_simulacion(semilla=None, dias=7, umbral_stock=UMBRAL_STOCK, stock_objetivo=STOCK_OBJETIVO, margen_objetivo=MARGEN_OBJETIVO, rotacion_minima=ROTACION_MINIMA, ventas_por_dia=1, pronostico=False, ventana_reabastecimiento=0, reportes=True, contexto=None):
+    # Ejecuta una réplica de la simulación sobre la BD del contexto (o bd.BDSQLite.nombre_db), que debe estar vacía.
+    # semilla: semilla aleatoria de la réplica (None = no reproducible)
+    # dias: horizonte de la simulación; ventas_por_dia: ventas simuladas por día
+    # umbral_stock, stock_objetivo, margen_objetivo, rotacion_minima: parámetros de la política a evaluar
+    # pronostico: si True, al cierre de cada día se recalculan los puntos de reorden por producto a partir de la
+    #   demanda pronosticada (app.ModuloPronosticos) y reemplazan a umbral_stock/stock_objetivo globales
+    # ventana_reabastecimiento: días que se acumulan las necesidades de un proveedor antes de emitir su orden
+    # reportes: si False, omite el reporte de ajustes y el reporte final (réplicas masivas)
+    # contexto: ContextoBD opcional (p. ej. ContextoBD(":memory:") para correr sin tocar el disco)
+    # Devuelve un diccionario con los KPIs de la réplica
+    if semilla is not None:
+        random.seed(semilla)
+    kpis = {
+        "ingresos": 0.0,  # Total vendido (ventas registradas)
+        "costo_compras": 0.0,  # Total gastado en reabastecimiento
+        "ventas": 0,  # Número de ventas registradas
+        "unidades_vendidas": 0,  # Unidades descontadas del stock
+        "quiebres_stock": 0,  # Unidades que no se pudieron vender por falta de stock
+        "reabastecimientos": 0,  # Compras a proveedor realizadas
+        "rebajas": 0,  # Rebajas aplicadas por expiración o temporada
+        "ajustes": 0,  # Ajustes de precio/stock al cierre del horizonte
+    }
     env = simpy.Environment()
-    productos = ListaProductos()
-    clientes = ListaClientes()
-    transacciones = ListaTransacciones()
-    movimientos = ListaMovimientos()
+    productos = ListaProductos(contexto=contexto)
+    clientes = ListaClientes(contexto=contexto)
+    transacciones = ListaTransacciones(contexto=contexto)
+    movimientos = ListaMovimientos(contexto=contexto)
     rotaciones = ModuloRotaciones(productos)
-    proveedores = ListaProveedores()
+    proveedores = ListaProveedores(contexto=contexto)
     cliente_inventario = clientes.registrar_cliente(
         nombre="Inventario", contacto="N/A", direccion="N/A", tipo_cliente="interno", credito=0
     )
     id_cliente_inventario = cliente_inventario.id_cliente if cliente_inventario else 1
+    precios = MotorPrecios(productos)  # Precios efectivos (con rebaja) de las ventas
+    stock_bajo = IndiceStockBajo(productos, umbral_stock, emitir_eventos=False, inclusivo=False)  # Productos bajo su umbral
+    pronosticos = PronosticoDemanda() if pronostico else None
+    ventas_hoy = {}  # id_producto -> unidades vendidas en el día en curso (para el pronóstico)
+    reabastecimiento = PlanificadorReabastecimiento(
+        productos, proveedores, transacciones, movimientos, id_cliente_inventario, ventana_dias=ventana_reabastecimiento
+    )
 
     def caso_movimientos(env, productos, clientes, transacciones, movimientos, proveedores):
         # Simula ventas diarias y reabastecimientos automáticos durante la semana.
-        for dia in range(7):
+        for dia in range(dias):
             yield env.timeout(1)
-            productos_lista = productos.consultar_producto()
-            clientes_lista = clientes.consultar_cliente()
-            if not productos_lista or not clientes_lista:
-                continue
-            clientes_real = [c for c in clientes_lista if c.tipo_cliente not in ("proveedor", "interno")]
-            if not clientes_real:
-                continue
-            cliente = random.choice(clientes_real)
-            productos_venta = random.sample(productos_lista, min(2, len(productos_lista)))
-            total = sum(p.precio for p in productos_venta)
-            aviso_venta(cliente, productos_venta, total)
-            for p in productos_venta:
-                nuevo_stock = max(0, p.stock - 1)
-                productos.actualizar_producto(p.id_producto, {"stock": nuevo_stock})
-                if nuevo_stock < UMBRAL_STOCK:
-                    proveedores_lista = []
-                    nodo = proveedores.raiz
-                    while nodo:
-                        proveedores_lista.append(nodo.proveedor)
-                        nodo = nodo.siguiente
-                    if proveedores_lista:
-                        proveedor = random.choice(proveedores_lista)
-                        cantidad_restock = max(0, STOCK_OBJETIVO - nuevo_stock)
-                        if cantidad_restock == 0:
-                            continue
-                        productos.actualizar_producto(p.id_producto, {"stock": nuevo_stock + cantidad_restock})
-                        precio_compra = p.precio
-                        total_compra = precio_compra * cantidad_restock
-                        aviso_compra(proveedor, p, cantidad_restock, total_compra)
-                        compra = transacciones.registrar_transaccion(
-                            id_cliente=id_cliente_inventario,
-                            id_proveedor=proveedor.id_proveedor,
-                            productos=[{"id": p.id_producto, "cantidad": cantidad_restock}],
-                            total=total_compra,
-                            fecha=(date.today() + timedelta(days=dia)).isoformat(),
-                            tipo_pago=f"compra a proveedor {proveedor.nombre}",
-                            estado="completada"
-                        )
-                        if compra:
-                            movimientos.registrar_movimiento(
-                                id_transaccion=compra.id_transaccion,
-                                fecha=(date.today() + timedelta(days=dia)).isoformat(),
-                                tipo="compra"
-                            )
-            venta = transacciones.registrar_transaccion(
-                id_cliente=cliente.id_cliente,
-                id_proveedor=None,
-                productos=[p.id_producto for p in productos_venta],
-                total=total,
+            for _ in range(ventas_por_dia):
+                venta_del_dia(dia)
+            # Órdenes de compra del ciclo: una por proveedor, en una sola transacción de la BD
+            for orden in reabastecimiento.ciclo(dia, (date.today() + timedelta(days=dia)).isoformat()):
+                kpis["reabastecimientos"] += 1
+                kpis["costo_compras"] += orden["total"]
+                aviso_compra(orden["proveedor"], orden["lineas"], orden["total"], productos)
+            if pronosticos:
+                # Cierre del día: la demanda observada actualiza la política de reabastecimiento de cada producto
+                pronosticos.cerrar_dia(ventas_hoy, date.today() + timedelta(days=dia))
+                pronosticos.guardar_politica(productos)
+                ventas_hoy.clear()
+
+    def venta_del_dia(dia):
+        productos_lista = productos.consultar_producto()
+        clientes_lista = clientes.consultar_cliente()
+        if not productos_lista or not clientes_lista:
+            return
+        clientes_real = [c for c in clientes_lista if c.tipo_cliente not in ("proveedor", "interno")]
+        if not clientes_real:
+            return
+        cliente = random.choice(clientes_real)
+        productos_venta = random.sample(productos_lista, min(2, len(productos_lista)))
+        _, total = precios.precio_cesta(p.id_producto for p in productos_venta)
+        aviso_venta(cliente, productos_venta, total)
+        for p in productos_venta:
+            nuevo_stock = productos.ajustar_stock(p.id_producto, -1)
+            if nuevo_stock is None:
+                nuevo_stock = p.stock  # Sin stock suficiente: la venta de este producto no descuenta
+                kpis["quiebres_stock"] += 1
+            else:
+                kpis["unidades_vendidas"] += 1
+                ventas_hoy[p.id_producto] = ventas_hoy.get(p.id_producto, 0) + 1
+            # Política propia del producto (ajustada en semanas anteriores) o la global de la réplica
+            objetivo_producto = p.stock_objetivo if p.stock_objetivo is not None else stock_objetivo
+            if p.id_producto in stock_bajo and objetivo_producto > nuevo_stock:
+                # La necesidad se encola; las compras se emiten agrupadas por proveedor al cierre del ciclo
+                reabastecimiento.solicitar(p.id_producto, objetivo_producto, dia)
+        venta = transacciones.registrar_transaccion(
+            id_cliente=cliente.id_cliente,
+            id_proveedor=None,
+            productos=[p.id_producto for p in productos_venta],
+            total=total,
+            fecha=(date.today() + timedelta(days=dia)).isoformat(),
+            tipo_pago=random.choice(["efectivo", "tarjeta", "crédito"]),
+            estado=random.choice(["completada", "pendiente"])
+        )
+        if venta:
+            kpis["ventas"] += 1
+            kpis["ingresos"] += total
+            movimientos.registrar_movimiento(
+                id_transaccion=venta.id_transaccion,
                 fecha=(date.today() + timedelta(days=dia)).isoformat(),
-                tipo_pago=random.choice(["efectivo", "tarjeta", "crédito"]),
-                estado=random.choice(["completada", "pendiente"])
+                tipo="venta"
             )
-            if venta:
-                movimientos.registrar_movimiento(
-                    id_transaccion=venta.id_transaccion,
-                    fecha=(date.today() + timedelta(days=dia)).isoformat(),
-                    tipo="venta"
-                )
 
     env.process(llegada_proveedores(env, proveedores))
     env.process(llegada_productos(env, productos, proveedores))
     env.process(llegada_clientes(env, clientes))
     env.process(caso_temporada(env, productos))
-    env.process(caso_rebajas(env, rotaciones))
+    env.process(caso_rebajas(env, rotaciones, dias, kpis))
     env.process(caso_movimientos(env, productos, clientes, transacciones, movimientos, proveedores))
-    env.run(until=8)
+    env.run(until=dias + 1)
     semana_inicio = date.today().isoformat()
-    semana_fin = (date.today() + timedelta(days=6)).isoformat()
-    ajustes_realizados = ajuste_inteligente_precios_stock(productos, transacciones, movimientos, semana_inicio, semana_fin)
-    reporte_ajustes(ajustes_realizados)
-    reporte_final(productos, movimientos, rotaciones, transacciones)
+    semana_fin = (date.today() + timedelta(days=dias - 1)).isoformat()
+    ajustes_realizados = ajuste_inteligente_precios_stock(
+        productos, transacciones, movimientos, semana_inicio, semana_fin,
+        margen_objetivo=margen_objetivo, rotacion_minima=rotacion_minima,
+        stock_objetivo=stock_objetivo, umbral_stock=umbral_stock
+    )
+    kpis["ajustes"] = len(ajustes_realizados)
+    if reportes:
+        reporte_ajustes(ajustes_realizados)
+        reporte_final(productos, movimientos, rotaciones, transacciones, dias)
+    # Margen bruto del horizonte: (ingresos - compras) / ingresos
+    kpis["margen"] = (kpis["ingresos"] - kpis["costo_compras"]) / kpis["ingresos"] if kpis["ingresos"] > 0 else 0.0
+    kpis["ingresos"] = round(kpis["ingresos"], 2)
+    kpis["costo_compras"] = round(kpis["costo_compras"], 2)
+    return kpis
+
+def main():
+    # Función principal que ejecuta la simulación semanal.
+    parser = argparse.ArgumentParser(description="Simulación semanal de la abarrotería")
+    parser.add_argument("--memoria", action="store_true", help="Simula sobre una BD en memoria sin tocar bd/Abarrotería.db")
+    parser.add_argument("--semilla", type=int, default=None)
+    parser.add_argument("--dias", type=int, default=7)
+    parser.add_argument("--pronostico", action="store_true", help="Reabastece según puntos de reorden pronosticados por producto")
+    parser.add_argument("--ventana-reabastecimiento", type=int, default=0, help="Días que se agrupan las compras de cada proveedor")
+    args = parser.parse_args()
+    bus.suscribir(SumideroConsola())  # Los avisos de la simulación y de las listas van a la consola
+    if args.memoria:
+        with ContextoBD(":memory:") as contexto:
+            crear_tablas(contexto=contexto)
+            ejecutar_simulacion(semilla=args.semilla, dias=args.dias, pronostico=args.pronostico, ventana_reabastecimiento=args.ventana_reabastecimiento, contexto=contexto)
+    else:
+        resetear_bd()
+        ejecutar_simulacion(semilla=args.semilla, dias=args.dias, pronostico=args.pronostico, ventana_reabastecimiento=args.ventana_reabastecimiento)
 
 if __name__ == "__main__":
     main()
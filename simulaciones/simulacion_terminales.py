@@ -0,0 +1,150 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+import statistics
+import tempfile
+import time
+from datetime import date
+
+import bd.BDSQLite as BDSQLite
+from app.ModuloProductos import ListaProductos
+from app.ModuloClientes import ListaClientes
+from app.ModuloTransacciones import ListaTransacciones
+from app.ModuloMovimientos import ListaMovimientos
+from app.ModuloAsincrono import ServicioAsincrono
+from app.ModuloMetricas import percentil
+
+# Benchmark local: varias terminales POS simuladas registrando ventas contra una BD temporal.
+# Compara la ejecución secuencial síncrona con la capa asíncrona (ejecutor dedicado + WAL).
+
+def preparar_bd(ruta, n_productos=50, n_clientes=10):
+    # Crea las tablas en una BD temporal y registra productos y clientes de prueba
+    BDSQLite.nombre_db = ruta
+    with contextlib.redirect_stdout(io.StringIO()):
+        BDSQLite.crear_tablas()
+        productos = ListaProductos()
+        clientes = ListaClientes()
+        for i in range(n_productos):
+            productos.registrar_producto(f"Producto{i}", "Prueba", "General", round(random.uniform(0.5, 5.0), 2), 10**6)
+        for i in range(n_clientes):
+            clientes.registrar_cliente(f"Cliente{i}", "N/A", "N/A", "minorista")
+
+def venta_sincrona(productos, transacciones, movimientos, id_cliente, productos_venta):
+    # Una venta completa: transacción, movimiento y actualización de stock
+    fecha = date.today().isoformat()
+    total = sum(p.precio for p in productos_venta)
+    venta = transacciones.registrar_transaccion(
+        id_cliente=id_cliente, productos=[p.id_producto for p in productos_venta], total=total,
+        fecha=fecha, tipo_pago="efectivo", estado="completada"
+    )
+    if venta:
+        movimientos.registrar_movimiento(venta.id_transaccion, fecha, "venta")
+    for p in productos_venta:
+        productos.ajustar_stock(p.id_producto, -1)
+
+def medir_secuencial(n_terminales, ventas_por_terminal):
+    # Todas las ventas de todas las terminales, una tras otra, en el hilo principal
+    with contextlib.redirect_stdout(io.StringIO()):
+        productos = ListaProductos()
+        clientes = ListaClientes()
+        transacciones = ListaTransacciones()
+        movimientos = ListaMovimientos()
+    catalogo = _catalogo(productos)
+    ids_clientes = [c.id_cliente for c in clientes.consultar_cliente()]
+    latencias = []
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(n_terminales * ventas_por_terminal):
+            t0 = time.perf_counter()
+            venta_sincrona(productos, transacciones, movimientos, random.choice(ids_clientes), random.sample(catalogo, 2))
+            latencias.append(time.perf_counter() - t0)
+    return time.perf_counter() - inicio, latencias
+
+async def terminal(servicio, catalogo, ids_clientes, ventas, latencias):
+    # Una terminal POS: registra sus ventas de forma asíncrona
+    for _ in range(ventas):
+        t0 = time.perf_counter()
+        productos_venta = random.sample(catalogo, 2)
+        fecha = date.today().isoformat()
+        venta = await servicio.transacciones.registrar_transaccion(
+            id_cliente=random.choice(ids_clientes), productos=[p.id_producto for p in productos_venta],
+            total=sum(p.precio for p in productos_venta), fecha=fecha, tipo_pago="tarjeta", estado="completada"
+        )
+        if venta:
+            await servicio.movimientos.registrar_movimiento(venta.id_transaccion, fecha, "venta")
+        for p in productos_venta:
+            await servicio.productos.ajustar_stock(p.id_producto, -1)
+        latencias.append(time.perf_counter() - t0)
+
+async def medir_asincrono(n_terminales, ventas_por_terminal, max_hilos, max_pendientes):
+    # Todas las terminales concurrentes sobre la capa asíncrona
+    BDSQLite.activar_wal("NORMAL")
+    with contextlib.redirect_stdout(io.StringIO()):
+        productos = ListaProductos()
+        clientes = ListaClientes()
+        transacciones = ListaTransacciones()
+        movimientos = ListaMovimientos()
+    servicio = ServicioAsincrono(productos=productos, clientes=clientes, transacciones=transacciones,
+                                 movimientos=movimientos, max_hilos=max_hilos, max_pendientes=max_pendientes)
+    catalogo = _catalogo(productos)
+    ids_clientes = [c.id_cliente for c in clientes.consultar_cliente()]
+    latencias = []
+    inicio = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(
+                terminal(servicio, catalogo, ids_clientes, ventas_por_terminal, latencias)
+                for _ in range(n_terminales)
+            ))
+    finally:
+        servicio.cerrar()
+    return time.perf_counter() - inicio, latencias
+
+def _catalogo(productos):
+    # Recorre la lista de productos sin disparar los mensajes de estado
+    catalogo = []
+    nodo = productos.raiz
+    while nodo:
+        catalogo.append(nodo.producto)
+        nodo = nodo.siguiente
+    return catalogo
+
+def imprimir_resultado(nombre, duracion, latencias):
+    ventas = len(latencias)
+    p95 = percentil(latencias, 95)
+    print(f"{nombre:<12} ventas={ventas:<6} tiempo={duracion:8.3f}s  "
+          f"ventas/s={ventas / duracion if duracion else 0:9.1f}  "
+          f"latencia media={statistics.mean(latencias) * 1000 if ventas else 0:7.2f}ms  p95={p95 * 1000:7.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de terminales POS concurrentes")
+    parser.add_argument("--terminales", type=int, default=16, help="Número de terminales simuladas")
+    parser.add_argument("--ventas", type=int, default=25, help="Ventas por terminal")
+    parser.add_argument("--hilos", type=int, default=4, help="Hilos del ejecutor de BD")
+    parser.add_argument("--pendientes", type=int, default=64, help="Tamaño de la cola acotada del ejecutor")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla aleatoria")
+    args = parser.parse_args()
+
+    random.seed(args.semilla)
+    ruta_original = BDSQLite.nombre_db
+    with tempfile.TemporaryDirectory() as directorio:
+        try:
+            preparar_bd(os.path.join(directorio, "secuencial.db"))
+            duracion, latencias = medir_secuencial(args.terminales, args.ventas)
+            imprimir_resultado("secuencial", duracion, latencias)
+
+            preparar_bd(os.path.join(directorio, "asincrono.db"))
+            duracion, latencias = asyncio.run(medir_asincrono(args.terminales, args.ventas, args.hilos, args.pendientes))
+            imprimir_resultado("asíncrono", duracion, latencias)
+        finally:
+            BDSQLite.nombre_db = ruta_original
+            BDSQLite.sincronia = None
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+import simpy
+
+from bd.BDSQLite import ContextoBD, activar_wal
+from app.ModuloProductos import ListaProductos
+from app.ModuloClientes import ListaClientes
+from app.ModuloProveedores import ListaProveedores
+from app.ModuloTransacciones import ListaTransacciones
+from app.ModuloMovimientos import ListaMovimientos
+from app.ModuloReabastecimiento import PlanificadorReabastecimiento
+from app.ModuloPrecios import MotorPrecios
+from app.ModuloStockBajo import IndiceStockBajo
+from app.ModuloMetricas import metricas, percentil
+from simulaciones.generador_datos import generar_tienda
+
+# Simulación de alto volumen de la tienda con eventos discretos (simpy), en minutos simulados
+# - Clientes con llegadas Poisson durante el horario de apertura de cada día
+# - Varias cajas (recurso simpy con capacidad = cajeros); tiempo de atención según el tamaño de la cesta
+# - Cestas de tamaño 1 + Poisson(cesta_media - 1), productos elegidos con popularidad tipo Zipf
+# - Cada venta pasa por la capa de datos real (ajustar_stock, registrar_transaccion, registrar_movimiento)
+#   y las compras a proveedor se agrupan con el planificador de reabastecimiento al cierre de cada día
+# Por día se reportan ventas por segundo de reloj, colas, esperas y latencias de las operaciones de BD,
+# por lo que también sirve como prueba de carga de punta a punta.
+
+MINUTOS_DIA = 24 * 60
+UMBRAL_STOCK = 20  # Stock mínimo por defecto antes de reabastecer
+STOCK_OBJETIVO = 120  # Stock por defecto tras reabastecer
+OPERACIONES_BD = ("productos.ajustar_stock", "transacciones.registrar_transaccion", "movimientos.registrar_movimiento", "reabastecimiento.ciclo")
+TIPOS_PAGO = ["efectivo", "tarjeta", "crédito"]
+
+def _poisson(rng, media):
+    # Muestra de una Poisson (método de Knuth; adecuado para medias pequeñas como el tamaño de una cesta)
+    if media <= 0:
+        return 0
+    limite = math.exp(-media)
+    k, p = 0, rng.random()
+    while p > limite:
+        k += 1
+        p *= rng.random()
+    return k
+
+class Tienda:
+    # Estado de la simulación: listas del sistema, cajas y acumulados del día en curso
+    def __init__(self, env, contexto, cajeros, cesta_media, minutos_base, minutos_por_articulo, umbral_stock, stock_objetivo, ventana_reabastecimiento, rng):
+        self.env = env
+        self.rng = rng
+        self.cajas = simpy.Resource(env, capacity=cajeros)
+        self.cesta_media = cesta_media
+        self.minutos_base = minutos_base  # Tiempo fijo de atención por cliente
+        self.minutos_por_articulo = minutos_por_articulo  # Tiempo medio de atención por artículo
+        self.umbral_stock = umbral_stock
+        self.stock_objetivo = stock_objetivo
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.productos = ListaProductos(contexto=contexto)
+            self.clientes = ListaClientes(contexto=contexto)
+            self.proveedores = ListaProveedores(contexto=contexto)
+            self.transacciones = ListaTransacciones(contexto=contexto)
+            self.movimientos = ListaMovimientos(contexto=contexto)
+        self.stock_bajo = IndiceStockBajo(self.productos, umbral_stock, emitir_eventos=False, inclusivo=False)  # Productos a reabastecer
+        clientes = self.clientes.consultar_cliente()
+        interno = next((c for c in clientes if c.tipo_cliente == "interno"), None)
+        self.ids_clientes = [c.id_cliente for c in clientes if c.tipo_cliente != "interno"]
+        self.reabastecimiento = PlanificadorReabastecimiento(
+            self.productos, self.proveedores, self.transacciones, self.movimientos,
+            interno.id_cliente if interno else None, ventana_dias=ventana_reabastecimiento
+        )
+        self.precios = MotorPrecios(self.productos)  # Precios efectivos (con rebaja) para cobrar las cestas
+        # Popularidad tipo Zipf sobre un orden aleatorio del catálogo
+        self.catalogo = [p.id_producto for p in self.productos.consultar_producto()]
+        rng.shuffle(self.catalogo)
+        self.acumulados = list(itertools.accumulate(1.0 / (rango ** 1.1) for rango in range(1, len(self.catalogo) + 1)))
+        self.dia = 0
+        self.reiniciar_dia()
+
+    def reiniciar_dia(self):
+        self.estadisticas = {"clientes": 0, "ventas": 0, "unidades": 0, "quiebres": 0, "ingresos": 0.0, "colas": [], "esperas": []}
+
+    def cesta(self):
+        # Diccionario id_producto -> unidades de la cesta de un cliente
+        tamano = min(len(self.catalogo), 1 + _poisson(self.rng, self.cesta_media - 1))
+        cesta = {}
+        for id_producto in self.rng.choices(self.catalogo, cum_weights=self.acumulados, k=tamano):
+            cesta[id_producto] = cesta.get(id_producto, 0) + 1
+        return cesta
+
+    def llegadas(self, horas_apertura, clientes_por_hora):
+        # Proceso de llegadas Poisson durante el horario de apertura del día en curso
+        cierre = self.env.now + horas_apertura * 60
+        tasa = clientes_por_hora / 60  # Clientes por minuto
+        while True:
+            espera = self.rng.expovariate(tasa)
+            if self.env.now + espera >= cierre:
+                return
+            yield self.env.timeout(espera)
+            self.env.process(self.cliente())
+
+    def cliente(self):
+        llegada = self.env.now
+        self.estadisticas["clientes"] += 1
+        self.estadisticas["colas"].append(len(self.cajas.queue))
+        cesta = self.cesta()
+        with self.cajas.request() as turno:
+            yield turno
+            self.estadisticas["esperas"].append(self.env.now - llegada)
+            articulos = sum(cesta.values())
+            yield self.env.timeout(self.minutos_base + self.rng.expovariate(1 / (self.minutos_por_articulo * articulos)))
+            self.vender(cesta)
+
+    def vender(self, cesta):
+        # Registra la venta en la capa de datos: descuenta stock, registra transacción y movimiento
+        fecha = date.today() + timedelta(days=self.dia)
+        vendidos = {}
+        for id_producto, cantidad in cesta.items():
+            nuevo_stock = self.productos.ajustar_stock(id_producto, -cantidad)
+            if nuevo_stock is None:
+                self.estadisticas["quiebres"] += cantidad
+                continue
+            producto = self.productos._indice[id_producto].producto
+            vendidos[id_producto] = cantidad
+            self.estadisticas["unidades"] += cantidad
+            if id_producto in self.stock_bajo:  # El índice ya reubicó el producto al ajustar su stock
+                objetivo = producto.stock_objetivo if producto.stock_objetivo is not None else self.stock_objetivo
+                self.reabastecimiento.solicitar(id_producto, objetivo, self.dia)
+        if not vendidos:
+            return
+        lineas, total = self.precios.precio_cesta(vendidos)
+        venta = self.transacciones.registrar_transaccion(
+            id_cliente=self.rng.choice(self.ids_clientes), productos=lineas, total=total,
+            fecha=fecha, tipo_pago=self.rng.choice(TIPOS_PAGO), estado="completada"
+        )
+        if venta:
+            self.movimientos.registrar_movimiento(venta.id_transaccion, fecha, "venta")
+            self.estadisticas["ventas"] += 1
+            self.estadisticas["ingresos"] += total
+
+def simular(contexto, dias=30, horas_apertura=12, clientes_por_hora=60, cajeros=3, cesta_media=3.0, minutos_base=1.0,
+            minutos_por_articulo=0.3, umbral_stock=UMBRAL_STOCK, stock_objetivo=STOCK_OBJETIVO, ventana_reabastecimiento=0,
+            semilla=None, progreso=True):
+    # Corre la simulación sobre la tienda del contexto y devuelve {"parametros", "dias": [...], "resumen"}
+    # Las latencias de BD salen del registro de métricas, que se reinicia al comenzar cada día
+    rng = random.Random(semilla)
+    env = simpy.Environment()
+    tienda = Tienda(env, contexto, cajeros, cesta_media, minutos_base, minutos_por_articulo, umbral_stock, stock_objetivo, ventana_reabastecimiento, rng)
+    metricas_activas = metricas.activo
+    metricas.activar()
+    resultados = []
+    inicio_total = time.perf_counter()
+    try:
+        for dia in range(dias):
+            tienda.dia = dia
+            tienda.reiniciar_dia()
+            metricas.reiniciar()
+            inicio = time.perf_counter()
+            env.process(tienda.llegadas(horas_apertura, clientes_por_hora))
+            env.run(until=(dia + 1) * MINUTOS_DIA)
+            ordenes = tienda.reabastecimiento.ciclo(dia, (date.today() + timedelta(days=dia)).isoformat())
+            segundos = time.perf_counter() - inicio
+            e = tienda.estadisticas
+            operaciones = metricas.instantanea()["operaciones"]
+            resultados.append({
+                "dia": dia + 1, "clientes": e["clientes"], "ventas": e["ventas"], "unidades": e["unidades"],
+                "quiebres": e["quiebres"], "ingresos": round(e["ingresos"], 2), "ordenes_compra": len(ordenes),
+                "cola_media": round(statistics.fmean(e["colas"]), 2) if e["colas"] else 0.0,
+                "cola_max": max(e["colas"], default=0),
+                "espera_media_min": round(statistics.fmean(e["esperas"]), 2) if e["esperas"] else 0.0,
+                "espera_p95_min": round(percentil(e["esperas"], 95), 2),
+                "segundos": round(segundos, 3),
+                "ventas_por_segundo": round(e["ventas"] / segundos, 1) if segundos else 0.0,
+                "latencias_bd": {op: {k: operaciones[op][k] for k in ("llamadas", "media_ms", "p95_ms", "max_ms")}
+                                 for op in OPERACIONES_BD if op in operaciones},
+            })
+            if progreso:
+                imprimir_dia(resultados[-1])
+    finally:
+        if not metricas_activas:
+            metricas.desactivar()
+    duracion = time.perf_counter() - inicio_total
+    ventas = sum(r["ventas"] for r in resultados)
+    return {
+        "parametros": {
+            "dias": dias, "horas_apertura": horas_apertura, "clientes_por_hora": clientes_por_hora, "cajeros": cajeros,
+            "cesta_media": cesta_media, "umbral_stock": umbral_stock, "stock_objetivo": stock_objetivo,
+            "ventana_reabastecimiento": ventana_reabastecimiento, "semilla": semilla,
+        },
+        "dias": resultados,
+        "resumen": {
+            "clientes": sum(r["clientes"] for r in resultados), "ventas": ventas,
+            "unidades": sum(r["unidades"] for r in resultados), "quiebres": sum(r["quiebres"] for r in resultados),
+            "ingresos": round(sum(r["ingresos"] for r in resultados), 2),
+            "ordenes_compra": sum(r["ordenes_compra"] for r in resultados),
+            "cola_max": max((r["cola_max"] for r in resultados), default=0),
+            "segundos": round(duracion, 2), "ventas_por_segundo": round(ventas / duracion, 1) if duracion else 0.0,
+        },
+    }
+
+def imprimir_encabezado():
+    print(f"{'día':>4}{'clientes':>9}{'ventas':>8}{'uds':>7}{'quiebres':>9}{'órdenes':>8}{'cola':>7}{'máx':>5}"
+          f"{'espera':>8}{'ventas/s':>10}{'stock ms':>10}{'trans ms':>10}")
+
+def imprimir_dia(r):
+    lat = r["latencias_bd"]
+    media = lambda op: lat[op]["media_ms"] if op in lat else 0.0  # Latencia media por operación de BD
+    print(f"{r['dia']:>4}{r['clientes']:>9}{r['ventas']:>8}{r['unidades']:>7}{r['quiebres']:>9}{r['ordenes_compra']:>8}"
+          f"{r['cola_media']:>7.2f}{r['cola_max']:>5}{r['espera_media_min']:>8.2f}{r['ventas_por_segundo']:>10.1f}"
+          f"{media('productos.ajustar_stock'):>10.3f}{media('transacciones.registrar_transaccion'):>10.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulación de alto volumen de la tienda (prueba de carga de punta a punta)")
+    parser.add_argument("--dias", type=int, default=30, help="Horizonte en días simulados")
+    parser.add_argument("--horas", type=float, default=12, help="Horas de apertura por día")
+    parser.add_argument("--clientes-hora", type=float, default=60, help="Tasa media de llegada de clientes por hora")
+    parser.add_argument("--cajeros", type=int, default=3)
+    parser.add_argument("--cesta", type=float, default=3.0, help="Tamaño medio de la cesta (artículos)")
+    parser.add_argument("--productos", type=int, default=2000, help="Productos de la tienda generada")
+    parser.add_argument("--clientes", type=int, default=500, help="Clientes de la tienda generada")
+    parser.add_argument("--historial", type=int, default=0, help="Transacciones históricas de la tienda generada")
+    parser.add_argument("--umbral-stock", type=int, default=UMBRAL_STOCK)
+    parser.add_argument("--stock-objetivo", type=int, default=STOCK_OBJETIVO)
+    parser.add_argument("--ventana-reabastecimiento", type=int, default=0)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--disco", action="store_true", help="Simula sobre la BD temporal en disco (WAL) en vez de memoria")
+    parser.add_argument("--salida", default=None, help="Archivo JSON donde guardar los resultados por día")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "tienda.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generar_tienda(ruta, n_productos=args.productos, n_clientes=args.clientes, n_transacciones=args.historial,
+                           semilla=args.semilla, progreso=False)
+        with ContextoBD(ruta if args.disco else ":memory:") as contexto:
+            if args.disco:
+                activar_wal("NORMAL", contexto)
+            else:
+                contexto.cargar_desde(ruta)
+            print(f"Tienda: {args.productos} productos, {args.clientes} clientes, {'disco (WAL)' if args.disco else 'memoria'}")
+            imprimir_encabezado()
+            resultado = simular(
+                contexto, args.dias, args.horas, args.clientes_hora, args.cajeros, args.cesta,
+                umbral_stock=args.umbral_stock, stock_objetivo=args.stock_objetivo,
+                ventana_reabastecimiento=args.ventana_reabastecimiento, semilla=args.semilla
+            )
+    r = resultado["resumen"]
+    print(f"\nTotal: {r['ventas']} ventas ({r['unidades']} unidades, {r['quiebres']} quiebres), {r['ordenes_compra']} órdenes de compra, "
+          f"cola máxima {r['cola_max']}; {r['segundos']}s de reloj, {r['ventas_por_segundo']} ventas/s")
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.salida}")
+
+if __name__ == "__main__":
+    main()
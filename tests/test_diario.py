@@ -0,0 +1,149 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import atexit
+import contextlib
+import io
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import app.ModuloDiario as ModuloDiario
+from app.ModuloDiario import DiarioEscritura
+from app.ModuloEventos import bus, SumideroAnillo, ERROR
+from bd.BDSQLite import ContextoBD, crear_tablas
+
+# Recuperación y pérdida de datos del diario de escritura diferida: volcados fallidos, rechazos de SQLite
+# y reaplicación tras una caída. Cada prueba usa una BD de archivo temporal.
+
+INSERTAR = "INSERT INTO Productos (id_producto, nombre, categoria, precio, stock) VALUES (?, ?, 'Abarrotes', 1.0, ?)"
+
+def simular_caida(diario):
+    # Detiene el diario como si el proceso hubiera caído: sin volcar lo pendiente ni borrar el archivo
+    with diario._cerrojo:
+        diario._activo = False
+        diario._despertador.notify_all()
+        if diario._archivo:
+            diario._archivo.close()
+            diario._archivo = None
+    diario._hilo.join(timeout=1)
+    atexit.unregister(diario.cerrar)
+
+class PruebasDiario(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.ruta_db = os.path.join(self._tmp.name, "tienda.db")
+        self.contexto = ContextoBD(self.ruta_db)
+        with contextlib.redirect_stdout(io.StringIO()):
+            crear_tablas(contexto=self.contexto)
+        self.eventos = bus.suscribir(SumideroAnillo(), nivel=ERROR, tipos=["diario"])
+        self.diarios = []
+
+    def tearDown(self):
+        bus.desuscribir(self.eventos)
+        for diario in self.diarios:
+            simular_caida(diario)
+        self._tmp.cleanup()
+
+    def nuevo_diario(self):
+        # max_ms alto: el hilo de fondo no vuelca por su cuenta durante la prueba
+        diario = DiarioEscritura(max_ms=60_000, contexto=self.contexto)
+        self.diarios.append(diario)
+        return diario
+
+    def filas(self):
+        conexion = sqlite3.connect(self.ruta_db)
+        try:
+            return conexion.execute("SELECT id_producto, stock FROM Productos ORDER BY id_producto").fetchall()
+        finally:
+            conexion.close()
+
+    def lineas_diario(self, diario):
+        with open(diario.ruta_diario, encoding="utf-8") as archivo:
+            return archivo.read().splitlines()
+
+    def test_volcado_sin_conexion_conserva_operaciones(self):
+        diario = self.nuevo_diario()
+        diario.encolar(INSERTAR, (1, "Arroz", 5))
+        diario.encolar(INSERTAR, (2, "Frijol", 3))
+        with mock.patch.object(ModuloDiario, "conectar_db", return_value=None):
+            self.assertEqual(diario.flush(), 0)
+        self.assertEqual(diario.pendientes, 2)
+        self.assertEqual(len(self.lineas_diario(diario)), 2)
+        self.assertTrue(self.eventos.eventos("diario.volcado_fallido"))
+        self.assertEqual(diario.flush(), 2)
+        self.assertEqual(self.filas(), [(1, 5), (2, 3)])
+        self.assertEqual(self.lineas_diario(diario), [])
+
+    def test_volcado_con_bd_bloqueada_conserva_operaciones(self):
+        diario = self.nuevo_diario()
+        diario.encolar(INSERTAR, (1, "Arroz", 5))
+        bloqueo = sqlite3.connect(self.ruta_db)
+        bloqueo.execute("BEGIN EXCLUSIVE")
+        sin_espera = lambda contexto=None: sqlite3.connect(self.ruta_db, timeout=0)
+        try:
+            with mock.patch.object(ModuloDiario, "conectar_db", side_effect=sin_espera):
+                self.assertEqual(diario.flush(), 0)
+        finally:
+            bloqueo.rollback()
+            bloqueo.close()
+        self.assertEqual(diario.pendientes, 1)
+        self.assertEqual(len(self.lineas_diario(diario)), 1)
+        self.assertEqual(diario.flush(), 1)
+        self.assertEqual(self.filas(), [(1, 5)])
+
+    def test_operacion_rechazada_queda_registrada(self):
+        diario = self.nuevo_diario()
+        diario.encolar(INSERTAR, (1, "Arroz", 5))
+        seq = diario.encolar("UPDATE Productos SET stock = stock + ? WHERE id_producto = ?", (-9, 1))
+        diario.encolar(INSERTAR, (2, "Frijol", 3))
+        self.assertEqual(diario.flush(), 3)
+        self.assertEqual(self.filas(), [(1, 5), (2, 3)])
+        self.assertEqual([d["seq"] for d in diario.descartadas], [seq])
+        self.assertEqual([e.datos["seq"] for e in self.eventos.eventos("diario.descartada")], [seq])
+        self.assertEqual(diario.seq_aplicado, 3)
+
+    def test_recuperacion_tras_caida(self):
+        diario = self.nuevo_diario()
+        diario.encolar(INSERTAR, (1, "Arroz", 5))
+        diario.flush()
+        diario.encolar(INSERTAR, (2, "Frijol", 3))
+        diario.encolar("UPDATE Productos SET stock = ? WHERE id_producto = ?", (8, 1))
+        simular_caida(diario)
+        self.diarios.remove(diario)
+        self.assertEqual(self.filas(), [(1, 5)])
+
+        recuperado = self.nuevo_diario()
+        self.assertEqual(self.filas(), [(1, 8), (2, 3)])
+        self.assertEqual(recuperado.seq_aplicado, 3)
+        self.assertFalse(os.path.exists(recuperado.ruta_diario) and self.lineas_diario(recuperado))
+        self.assertEqual(recuperado.encolar(INSERTAR, (3, "Sal", 1)), 4)
+
+    def test_recuperacion_fallida_conserva_el_diario(self):
+        diario = self.nuevo_diario()
+        diario.encolar(INSERTAR, (1, "Arroz", 5))
+        diario.encolar(INSERTAR, (2, "Frijol", 3))
+        simular_caida(diario)
+        self.diarios.remove(diario)
+
+        conectar = ModuloDiario.conectar_db
+        llamadas = []
+        def falla_al_volcar(contexto=None):
+            llamadas.append(contexto)
+            return conectar(contexto) if len(llamadas) == 1 else None  # Lee el estado; el volcado no conecta
+        with mock.patch.object(ModuloDiario, "conectar_db", side_effect=falla_al_volcar):
+            recuperado = self.nuevo_diario()
+        self.assertEqual(self.filas(), [])
+        self.assertEqual(recuperado.pendientes, 2)
+        self.assertEqual(len(self.lineas_diario(recuperado)), 2)
+        self.assertTrue(self.eventos.eventos("diario.recuperacion_incompleta"))
+
+        simular_caida(recuperado)
+        self.diarios.remove(recuperado)
+        self.nuevo_diario()
+        self.assertEqual(self.filas(), [(1, 5), (2, 3)])
+
+if __name__ == "__main__":
+    unittest.main()